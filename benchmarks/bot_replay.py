@@ -0,0 +1,325 @@
+"""Сквозная нагрузка без Telegram: сгенерированные обновления проходят через настоящее приложение и хендлеры.
+
+Приложение собирается как в bot.main (все списки handlers, UserOrderedUpdateProcessor, писатель с групповым commit,
+индекс inline-режима), но HTTP-слой бота заменён на RecordingRequest: вызовы Bot API (reply_text,
+edit_message_text, answer, ...) только записываются, а последнее сообщение каждого чата с его клавиатурой
+запоминается. Симулированные пользователи нажимают кнопки из этих клавиатур: /start -> категория -> ▶️ -> товар ->
+«В корзину» (несколько раз) -> корзина -> серия ➖/➕ -> оформление заказа. Меряется задержка от постановки
+обновления в очередь до конца хендлера (по видам обновлений), обновлений в секунду и запросов к БД на обновление.
+
+Запуск из корня репозитория (БД — временный файл; DB_PROFILE, GROUP_COMMIT и прочие переменные окружения учитываются):
+    python -m benchmarks.bot_replay --users 2000 --concurrency 64
+"""
+from __future__ import annotations  # Отложенная оценка аннотаций
+
+import argparse  # Параметры запуска
+import asyncio  # Пользователи и приложение
+import contextvars  # Вид текущего обновления для подсчёта запросов
+import itertools  # Счётчики ID
+import json  # Ответы поддельного Bot API и машиночитаемый вывод
+import os  # Окружение до импорта бота
+import random  # Поведение пользователей
+import shutil  # Удаление временной БД
+import statistics  # Перцентили
+import tempfile  # Временная БД
+import time  # Замер времени
+from collections import Counter, defaultdict  # Счётчики вызовов и запросов
+
+WORKDIR = tempfile.mkdtemp(prefix="bot-replay-")  # Настройки бота читаются при импорте — задаём окружение заранее
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{WORKDIR}/replay.db")
+os.environ.setdefault("DB_PROFILE", "sqlite-wal")
+os.environ.setdefault("BOT_TOKEN", "123456:REPLAY")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from sqlalchemy import event, func, insert, select  # noqa: E402  # Наполнение, подсчёт заказов и запросов
+from telegram import Update  # noqa: E402  # Тип обновления
+from telegram.ext import Application, ApplicationBuilder, TypeHandler  # noqa: E402  # Приложение и замер
+from telegram.request import BaseRequest, RequestData  # noqa: E402  # HTTP-слой бота
+
+from bot.config import settings  # noqa: E402  # Настройки (из окружения выше)
+from bot.database import ReadSessionLocal, SessionLocal, engine, init_models, read_engine  # noqa: E402  # БД бота
+from bot.handlers import admin as admin_h, cart as cart_h, catalog as catalog_h  # noqa: E402  # Хендлеры
+from bot.handlers import checkout as checkout_h, help as help_h, inline as inline_h  # noqa: E402
+from bot.models import Category, Order, Product  # noqa: E402  # Модели для наполнения
+from bot.services.catalog_service import rebuild_category_stats  # noqa: E402  # Счётчики категорий
+from bot.services.inline_index import product_index  # noqa: E402  # Индекс inline-режима
+from bot.services.write_queue import write_queue  # noqa: E402  # Писатель с групповым commit
+from bot.update_processor import UserOrderedUpdateProcessor  # noqa: E402  # Обработка как в bot.main
+
+BOT_USER = {"id": 123456, "is_bot": True, "first_name": "Replay", "username": "replay_bot"}  # Ответ getMe
+PHONE = "+79161234567"  # Валидный номер для шага оформления
+current_kind: contextvars.ContextVar[str | None] = contextvars.ContextVar("current_kind", default=None)  # Вид обрабатываемого обновления
+
+
+class RecordingRequest(BaseRequest):  # Bot API в памяти: вызовы считаются, последнее сообщение каждого чата запоминается
+    def __init__(self):
+        self.calls: Counter[str] = Counter()  # Метод -> число вызовов
+        self.messages: dict[int, dict] = {}  # Чат -> последнее сообщение бота (с inline-клавиатурой)
+        self._ids = itertools.count(1)  # ID сообщений бота
+
+    @property
+    def read_timeout(self) -> float | None:
+        return None
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    async def do_request(self, url: str, method: str, request_data: RequestData | None = None, *args, **kwargs) -> tuple[int, bytes]:
+        name = url.rsplit("/", 1)[-1]
+        self.calls[name] += 1
+        params = request_data.parameters if request_data else {}
+        current = self.messages.get(int(params.get("chat_id", 0)))
+        if name == "editMessageText" and current and current["message_id"] == params.get("message_id") and "text" not in current:  # Как Telegram: у фото подпись, а не текст
+            return 400, json.dumps({"ok": False, "error_code": 400, "description": "Bad Request: there is no text in the message to edit"}).encode()
+        result = self._call(name, params)
+        return 200, json.dumps({"ok": True, "result": result}).encode()
+
+    def _call(self, name: str, params: dict):  # Ответ метода
+        if name == "getMe":
+            return BOT_USER
+        if name in ("sendMessage", "sendPhoto"):  # Новое сообщение становится текущим в чате
+            chat_id = int(params["chat_id"])
+            message = {"message_id": next(self._ids), "date": int(time.time()), "chat": {"id": chat_id, "type": "private"}, "from": BOT_USER}
+            message["text" if name == "sendMessage" else "caption"] = params.get("text") or params.get("caption") or ""
+            if "inline_keyboard" in params.get("reply_markup", {}):  # Reply-клавиатура к сообщению не прикрепляется
+                message["reply_markup"] = params["reply_markup"]
+            self.messages[chat_id] = message
+            return message
+        if name in ("editMessageText", "editMessageReplyMarkup", "editMessageMedia", "editMessageCaption"):
+            message = self.messages.get(int(params.get("chat_id", 0)))
+            if message is None or message["message_id"] != params.get("message_id"):  # Сообщение уже не текущее
+                return True
+            if name == "editMessageText":
+                message["text"] = params["text"]
+            if name == "editMessageMedia":  # Текст списка становится фото с подписью
+                media = params["media"] if isinstance(params["media"], dict) else json.loads(params["media"])
+                message.pop("text", None)
+                message["caption"] = media.get("caption", "")
+                message["photo"] = [{"file_id": media["media"], "file_unique_id": media["media"], "width": 800, "height": 800}]
+            message.pop("reply_markup", None)  # Без reply_markup Telegram убирает клавиатуру
+            if params.get("reply_markup"):
+                message["reply_markup"] = params["reply_markup"]
+            return message
+        return True  # answerCallbackQuery, answerInlineQuery и прочее
+
+
+class Replay:  # Отправка обновлений от имени пользователей и замер их обработки
+    def __init__(self, app: Application, api: RecordingRequest):
+        self.app = app
+        self.api = api
+        self.pending: dict[int, tuple[str, float, asyncio.Future]] = {}  # update_id -> (вид, момент постановки, завершение)
+        self.latencies: dict[str, list[float]] = defaultdict(list)  # Вид -> задержки (сек)
+        self.reads: Counter[str] = Counter()  # Вид -> запросов к БД в самом хендлере
+        self.errors: Counter[str] = Counter()  # Вид -> исключений в хендлерах
+        self.unhandled: Counter[str] = Counter()  # Вид -> обновлений, которые не подошли ни одному хендлеру
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+
+    async def begin(self, update: Update, context) -> None:  # Группа -1: вид обновления для подсчёта запросов
+        current_kind.set(self.pending[update.update_id][0])
+
+    async def finish(self, update: Update, context) -> None:  # Группа 1: все хендлеры обновления отработали
+        kind, queued_at, done = self.pending.pop(update.update_id)
+        self.latencies[kind].append(time.perf_counter() - queued_at)
+        if not any(handler.check_update(update) for handler in self.app.handlers[0]):
+            self.unhandled[kind] += 1
+        done.set_result(None)
+
+    async def on_error(self, update: object, context) -> None:  # Исключение хендлера
+        kind = self.pending[update.update_id][0] if isinstance(update, Update) and update.update_id in self.pending else "other"
+        self.errors[kind] += 1
+
+    async def send(self, kind: str, payload: dict) -> None:  # Поставить обновление в очередь и дождаться обработки
+        update_id = next(self._update_ids)
+        update = Update.de_json({"update_id": update_id, **payload}, self.app.bot)  # Разбор JSON — часть работы бота
+        done = asyncio.get_running_loop().create_future()
+        self.pending[update_id] = (kind, time.perf_counter(), done)
+        await self.app.update_queue.put(update)
+        await done
+
+    async def text(self, tg_id: int, text: str) -> None:  # Сообщение пользователя (команда или ответ на шаге оформления)
+        message = {"message_id": next(self._message_ids), "date": int(time.time()), "text": text, **_parties(tg_id)}
+        if text.startswith("/"):
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        await self.send(text.split()[0] if text.startswith("/") else "text", {"message": message})
+
+    async def click(self, tg_id: int, rnd: random.Random, prefix: str, pick=None) -> bool:  # Нажать кнопку текущего сообщения
+        message = self.api.messages.get(tg_id)
+        buttons = [
+            button["callback_data"] for row in (message or {}).get("reply_markup", {}).get("inline_keyboard", [])
+            for button in row if str(button.get("callback_data", "")).startswith(prefix)
+        ]
+        if pick:
+            buttons = [data for data in buttons if pick(data)]
+        if not buttons:  # Нужной кнопки нет (пустая категория, последняя страница, ...)
+            return False
+        data = rnd.choice(buttons)
+        query = {"id": str(next(self._update_ids)), "chat_instance": str(tg_id), "data": data, "message": message, **_parties(tg_id)}
+        query.pop("chat")
+        await self.send(prefix.split(":")[0], {"callback_query": query})
+        return True
+
+
+def _parties(tg_id: int) -> dict:  # Отправитель и личный чат пользователя
+    return {"from": {"id": tg_id, "is_bot": False, "first_name": f"U{tg_id}", "language_code": "ru"}, "chat": {"id": tg_id, "type": "private"}}
+
+
+async def shopper(replay: Replay, tg_id: int, args, rnd: random.Random) -> None:  # Сценарий одного покупателя
+    async def think(scale: float = 1.0) -> None:  # Пауза пользователя между действиями
+        if args.think > 0:
+            await asyncio.sleep(rnd.expovariate(1 / (args.think * scale)))
+
+    await asyncio.sleep(rnd.uniform(0, args.ramp))  # Пользователи приходят постепенно
+    await replay.text(tg_id, "/start")
+    for step in range(args.browse):
+        if step:
+            await think()
+            await replay.text(tg_id, "/catalog")
+        await think()
+        await replay.click(tg_id, rnd, "cat:")
+        if rnd.random() < 0.5:  # Листает дальше первой страницы
+            await think()
+            await replay.click(tg_id, rnd, "page:cat:", lambda data: ":a" in data)
+        await think()
+        if await replay.click(tg_id, rnd, "prd:"):
+            await think()
+            await replay.click(tg_id, rnd, "add:")
+    await think()
+    await replay.click(tg_id, rnd, "cart:view")
+    for _ in range(args.qty_clicks):  # Серия быстрых нажатий ➖/➕
+        await think(0.2)
+        await replay.click(tg_id, rnd, "qty:", lambda data: data.endswith(":1") or rnd.random() < 0.2)
+    await think()
+    if not await replay.click(tg_id, rnd, "checkout:"):  # Корзина пуста
+        return
+    for answer in (f"Покупатель {tg_id}", PHONE, f"Улица {tg_id}, 1", "Курьер"):
+        await think()
+        await replay.text(tg_id, answer)
+
+
+async def seed(categories: int, products: int, rnd: random.Random) -> None:  # Схема миграциями и каталог
+    await init_models()
+    async with SessionLocal() as session:
+        await session.execute(insert(Category), [{"name": f"Категория {c}"} for c in range(1, categories + 1)])
+        await session.execute(
+            insert(Product),
+            [
+                {"title": f"Товар {i}", "description": f"Описание {i}", "price_cents": rnd.randint(100, 100_000), "category_id": i % categories + 1,
+                 **({"photo_url": f"https://example.com/{i}.jpg", "photo_file_id": f"AgAC{i}"} if i % 2 else {})}  # Половина карточек — фото, уже загруженные в Telegram
+                for i in range(products)
+            ],
+        )
+        await rebuild_category_stats(session)
+        await session.commit()
+    async with ReadSessionLocal() as session:
+        await product_index.load(session)
+
+
+def count_queries(counters: Counter[str]) -> None:  # Все запросы к БД: в хендлере — по виду обновления, иначе — фоновые (писатель, сброс корзины)
+    def _count(conn, cursor, statement, parameters, context, executemany) -> None:
+        counters[current_kind.get() or "background"] += 1
+
+    for sync_engine in {engine.sync_engine, read_engine.sync_engine}:
+        event.listen(sync_engine, "before_cursor_execute", _count)
+
+
+def percentile_ms(values: list[float], q: int) -> float:
+    cuts = statistics.quantiles(values, n=100) if len(values) > 1 else values * 99
+    return round(cuts[q - 1] * 1000, 2)
+
+
+async def main_async(args) -> dict:
+    rnd = random.Random(args.seed)
+    await seed(args.categories, args.products, rnd)
+    queries: Counter[str] = Counter()
+    count_queries(queries)
+    if settings.group_commit:
+        await write_queue.start()
+    api = RecordingRequest()
+    app = (
+        ApplicationBuilder().token(settings.bot_token).request(api).get_updates_request(RecordingRequest()).updater(None)
+        .concurrent_updates(UserOrderedUpdateProcessor(args.concurrency)).build()
+    )
+    replay = Replay(app, api)
+    for h in catalog_h.handlers + cart_h.handlers + checkout_h.handlers + admin_h.handlers + help_h.handlers + inline_h.handlers:
+        app.add_handler(h)
+    app.add_handler(TypeHandler(Update, replay.begin), group=-1)
+    app.add_handler(TypeHandler(Update, replay.finish), group=1)
+    app.add_error_handler(replay.on_error)
+    await app.initialize()
+    await app.start()
+    queries.clear()  # Без наполнения и старта
+    api.calls.clear()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(shopper(replay, 1_000_000 + u, args, random.Random(args.seed * 100_000 + u)) for u in range(args.users)))
+    await cart_h.qty_buffer.flush_all()
+    elapsed = time.perf_counter() - started
+    await write_queue.stop()
+    await app.stop()
+    await app.shutdown()
+    async with ReadSessionLocal() as session:
+        orders = await session.scalar(select(func.count(Order.id)))
+
+    updates = sum(len(v) for v in replay.latencies.values())
+    return {
+        "summary": {
+            "users": args.users,
+            "concurrency": args.concurrency,
+            "db_profile": settings.db_profile,
+            "updates": updates,
+            "seconds": round(elapsed, 2),
+            "updates_per_sec": round(updates / elapsed, 1),
+            "orders": orders,
+            "db_queries_per_update": round(sum(queries.values()) / updates, 2),
+            "background_queries_per_update": round(queries["background"] / updates, 2),
+            "errors": sum(replay.errors.values()),
+            "unhandled": sum(replay.unhandled.values()),
+            "api_calls": dict(api.calls.most_common()),
+        },
+        "handlers": [
+            {
+                "kind": kind,
+                "updates": len(values),
+                "p50_ms": percentile_ms(values, 50),
+                "p95_ms": percentile_ms(values, 95),
+                "p99_ms": percentile_ms(values, 99),
+                "queries_per_update": round(queries[kind] / len(values), 2),
+                "errors": replay.errors[kind],
+                "unhandled": replay.unhandled[kind],
+            }
+            for kind, values in sorted(replay.latencies.items(), key=lambda item: -len(item[1]))
+        ],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000, help="симулированных покупателей")
+    parser.add_argument("--concurrency", type=int, default=settings.update_concurrency, help="обновлений в обработке одновременно")
+    parser.add_argument("--browse", type=int, default=3, help="сколько раз покупатель проходит каталог до корзины")
+    parser.add_argument("--qty-clicks", type=int, default=8, help="нажатий ➖/➕ в корзине")
+    parser.add_argument("--think", type=float, default=0.05, help="средняя пауза пользователя между действиями, сек")
+    parser.add_argument("--ramp", type=float, default=2.0, help="за сколько секунд приходят все пользователи")
+    parser.add_argument("--categories", type=int, default=20)
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="печатать результат в JSON")
+    args = parser.parse_args()
+    try:
+        report = asyncio.run(main_async(args))
+    finally:
+        shutil.rmtree(WORKDIR, ignore_errors=True)
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+        return
+    print(" ".join(f"{k}={v}" for k, v in report["summary"].items()))
+    for row in report["handlers"]:
+        print(" ".join(f"{k}={v}" for k, v in row.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Смешанная нагрузка чтение/запись на файловой SQLite: профиль default против sqlite-wal.
+
+Запуск из корня репозитория:
+    python -m benchmarks.engine_profile --seconds 10 --concurrency 32 --write-ratio 0.2
+"""
+from __future__ import annotations  # Отложенная оценка аннотаций
+
+import argparse  # Параметры запуска
+import asyncio  # Конкурентные воркеры
+import json  # Машиночитаемый вывод
+import random  # Случайная нагрузка
+import statistics  # Перцентили
+import tempfile  # Временный файл БД
+import time  # Замер времени
+from pathlib import Path  # Пути
+
+from sqlalchemy.exc import OperationalError  # «database is locked»
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker  # Фабрики сессий
+
+from bot.config import Settings  # Настройки профиля
+from bot.database import Base, create_engines  # Метаданные и фабрика движков
+from bot.keyboards import PAGE_SIZE  # Размер страницы
+from bot.models import Category, Product  # Модели для наполнения
+from bot.services.cart_service import CartService  # Корзина
+from bot.services.catalog_service import CatalogCache, CatalogService  # Каталог
+
+
+class NoCache(CatalogCache):  # Кэш, который ничего не хранит: меряем именно БД
+    def set(self, key, tag, value, version) -> None:
+        return None
+
+
+async def seed(url: str, categories: int, per_category: int, users: int) -> None:  # Наполнение БД
+    writer, _ = create_engines(Settings(database_url=url))
+    async with writer.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    Session = async_sessionmaker(writer, expire_on_commit=False, class_=AsyncSession)
+    async with Session() as session:
+        for c in range(categories):
+            category = Category(name=f"C{c}")
+            session.add(category)
+            await session.flush()
+            session.add_all(
+                Product(title=f"P{c}-{i:05d}", description="D", price_cents=100 + i, category_id=category.id, is_active=True)
+                for i in range(per_category)
+            )
+        await session.commit()
+        cart = CartService(session)
+        for tg_id in range(1, users + 1):
+            await cart.resolve_user_id(tg_id)
+        await session.commit()
+    await writer.dispose()
+
+
+async def run_profile(url: str, profile: str, args) -> dict:  # Нагрузка на один профиль
+    cfg = Settings(database_url=url, db_profile=profile)
+    writer, reader = create_engines(cfg)
+    Write = async_sessionmaker(writer, expire_on_commit=False, class_=AsyncSession)
+    Read = async_sessionmaker(reader, expire_on_commit=False, class_=AsyncSession)
+    cache = NoCache(1)
+    latencies: dict[str, list[float]] = {"read": [], "write": []}
+    errors = 0
+    deadline = time.perf_counter() + args.seconds
+    pages = max(1, args.per_category // PAGE_SIZE)
+
+    async def worker(seed_value: int) -> None:
+        nonlocal errors
+        rnd = random.Random(seed_value)
+        while time.perf_counter() < deadline:
+            user_id = rnd.randint(1, args.users)
+            kind = "write" if rnd.random() < args.write_ratio else "read"
+            started = time.perf_counter()
+            try:
+                if kind == "read":
+                    async with Read() as session:
+                        if rnd.random() < 0.5:
+                            await CatalogService(session, cache).list_products(rnd.randint(1, args.categories), rnd.randint(1, pages))
+                        else:
+                            await CartService(session).get_cart(user_id)
+                else:
+                    async with Write() as session:
+                        await CartService(session).add_to_cart(user_id, rnd.randint(1, args.categories * args.per_category))
+                        await session.commit()
+            except OperationalError:
+                errors += 1
+                continue
+            latencies[kind].append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+    await writer.dispose()
+    if reader is not writer:
+        await reader.dispose()
+
+    def pct(values: list[float], q: int) -> float:
+        return statistics.quantiles(values, n=100)[q - 1] * 1000 if len(values) > 1 else 0.0
+
+    total = sum(len(v) for v in latencies.values())
+    return {
+        "profile": profile,
+        "ops_per_sec": round(total / elapsed, 1),
+        "reads": len(latencies["read"]),
+        "writes": len(latencies["write"]),
+        "errors": errors,
+        "read_p50_ms": round(pct(latencies["read"], 50), 2),
+        "read_p95_ms": round(pct(latencies["read"], 95), 2),
+        "write_p50_ms": round(pct(latencies["write"], 50), 2),
+        "write_p95_ms": round(pct(latencies["write"], 95), 2),
+    }
+
+
+async def main_async(args) -> list[dict]:
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for profile in ("default", "sqlite-wal"):
+            db = Path(tmp) / f"{profile}.db"
+            url = f"sqlite+aiosqlite:///{db}"
+            await seed(url, args.categories, args.per_category, args.users)
+            results.append(await run_profile(url, profile, args))
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    parser.add_argument("--categories", type=int, default=20)
+    parser.add_argument("--per-category", type=int, default=500)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--json", action="store_true", help="печатать результат в JSON")
+    args = parser.parse_args()
+    results = asyncio.run(main_async(args))
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for row in results:
+        print(" ".join(f"{k}={v}" for k, v in row.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,324 @@
+"""Нагрузочный набор для слоя сервисов на синтетическом каталоге.
+
+Генерирует данные (при --scale 1: 200 категорий, 200 000 товаров, 100 000 пользователей, 1 000 000 заказов),
+затем для каждой БД (файловая SQLite в профиле sqlite-wal и SQLite в памяти) и каждого уровня параллелизма
+меряет p50/p95/p99 и оп/с сценариев: страницы каталога на разной глубине, корзина, оформление заказа, список заказов.
+Чтения идут через сессии только для чтения без кэша каталога, записи — через писателя с групповым commit,
+как в хендлерах.
+
+Запуск из корня репозитория:
+    python -m benchmarks.service_suite --scale 0.1 --concurrency 1,16 --output bench.json
+    python -m benchmarks.service_suite --scale 0.1 --concurrency 1,16 --compare bench.json
+"""
+from __future__ import annotations  # Отложенная оценка аннотаций
+
+import argparse  # Параметры запуска
+import asyncio  # Конкурентные воркеры
+import json  # Машиночитаемый вывод
+import platform  # Версия Python в отчёте
+import random  # Случайная нагрузка
+import statistics  # Перцентили
+import subprocess  # Коммит в отчёте
+import tempfile  # Временный файл БД
+import time  # Замер времени
+import uuid  # Имя общей БД в памяти
+from datetime import datetime  # Дата прогона
+from pathlib import Path  # Пути
+from typing import Awaitable, Callable  # Типизация сценариев
+
+import sqlalchemy  # Версия SQLAlchemy в отчёте
+from sqlalchemy import text  # Сырые запросы генерации данных
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine  # Движки и сессии
+from sqlalchemy.pool import AsyncAdaptedQueuePool  # Одно соединение на общую БД в памяти
+
+from bot.config import Settings  # Настройки профиля
+from bot.database import Base, create_engines  # Метаданные и фабрика движков
+from bot.keyboards import PAGE_SIZE  # Размер страницы каталога
+from bot.services.cart_service import CartService  # Корзина
+from bot.services.catalog_service import CatalogService, rebuild_category_stats  # Каталог и счётчики
+from bot.services.order_service import OrderService  # Заказы
+from bot.services.write_queue import WriteQueue  # Писатель с групповым commit
+from benchmarks.engine_profile import NoCache  # Кэш каталога, который ничего не хранит
+
+ADJECTIVES = ["Красный", "Синий", "Зелёный", "Лёгкий", "Тёплый", "Большой", "Малый", "Новый", "Классический", "Спортивный"]
+NOUNS = ["чайник", "свитер", "рюкзак", "кроссовки", "термос", "плед", "фонарь", "зонт", "кружка", "шарф", "куртка", "лампа"]
+STATUSES = ["new"] * 20 + ["paid"] * 30 + ["shipped"] * 45 + ["cancelled"] * 5  # Распределение статусов истории
+
+
+def dataset_size(scale: float) -> dict[str, int]:
+    return {
+        "categories": max(2, round(200 * scale)),
+        "products": max(100, round(200_000 * scale)),
+        "users": max(10, round(100_000 * scale)),
+        "orders": max(100, round(1_000_000 * scale)),
+    }
+
+
+async def seed(engine: AsyncEngine, size: dict[str, int], seed_value: int) -> float:  # Наполнение БД, возвращает секунды
+    started = time.perf_counter()
+    rnd = random.Random(seed_value)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(
+            text("INSERT INTO categories(name) VALUES (:name)"),
+            [{"name": f"Категория {c:03d}"} for c in range(1, size["categories"] + 1)],
+        )
+        await conn.execute(
+            text(
+                "INSERT INTO products(title, description, price_cents, category_id, is_active) "
+                "VALUES (:title, :description, :price, :category, :active)"
+            ),
+            [
+                {
+                    "title": f"{rnd.choice(ADJECTIVES)} {rnd.choice(NOUNS)} {i}",
+                    "description": f"{rnd.choice(ADJECTIVES)} {rnd.choice(NOUNS)}: описание товара {i}",
+                    "price": rnd.randint(100, 500_000),
+                    "category": i % size["categories"] + 1,  # Товары категории c: id ≡ c (mod categories)
+                    "active": rnd.random() > 0.02,
+                }
+                for i in range(size["products"])
+            ],
+        )
+        await conn.execute(
+            text("INSERT INTO users(tg_id, name, created_at) VALUES (:tg, :name, :now)"),
+            [{"tg": 10_000_000 + u, "name": f"U{u}", "now": datetime.utcnow()} for u in range(size["users"])],
+        )
+        await conn.execute(
+            text(
+                "INSERT INTO cart_items(user_id, product_id, quantity) "
+                "SELECT u.id, (u.id * 7919 + k.k * 104729) % :products + 1, 1 + k.k FROM users u, "
+                "(SELECT 0 AS k UNION ALL SELECT 1 UNION ALL SELECT 2) k WHERE u.id % 10 = 0"
+            ),
+            {"products": size["products"]},
+        )  # Корзины у каждого десятого пользователя
+        statuses = " ".join(f"WHEN {i} THEN '{s}'" for i, s in enumerate(STATUSES))
+        await conn.execute(
+            text(
+                "INSERT INTO orders(user_id, total_cents, delivery_method, status, created_at, "
+                "customer_name, customer_phone, customer_address, order_number) "
+                "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < :orders) "
+                f"SELECT abs(random()) % :users + 1, 0, 'Курьер', CASE abs(random()) % {len(STATUSES)} {statuses} END, "
+                "datetime('now', printf('-%d seconds', (:orders - i) * 30)), 'Имя', '+70000000000', 'Адрес', "
+                "printf('B%09d', i) FROM n"
+            ),
+            {"orders": size["orders"], "users": size["users"]},
+        )  # Заказ каждые 30 секунд в прошлое
+        await conn.execute(
+            text(
+                "INSERT INTO order_items(order_id, product_id, quantity, price_cents) "
+                "SELECT o.id, p.id, 1 + (o.id + k.k) % 3, p.price_cents FROM orders o "
+                "JOIN (SELECT 0 AS k UNION ALL SELECT 1 UNION ALL SELECT 2 UNION ALL SELECT 3) k ON k.k <= o.id % 4 "
+                "JOIN products p ON p.id = (o.id * 31 + k.k * 7) % :products + 1"
+            ),
+            {"products": size["products"]},
+        )  # 1–4 позиции на заказ
+        await conn.execute(
+            text(
+                "UPDATE orders SET total_cents = t.total FROM "
+                "(SELECT order_id, sum(quantity * price_cents) AS total FROM order_items GROUP BY order_id) t "
+                "WHERE t.order_id = orders.id"
+            )
+        )
+    Session = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    async with Session() as session:
+        await rebuild_category_stats(session)
+        await session.commit()
+    return time.perf_counter() - started
+
+
+Scenario = Callable[[random.Random], Awaitable[None]]
+
+
+def scenarios(Read: async_sessionmaker, queue: WriteQueue, size: dict[str, int]) -> dict[str, tuple[str, Scenario]]:  # Имя -> (чтение/запись, операция)
+    cache = NoCache(1)
+    categories, products, users, orders = size["categories"], size["products"], size["users"], size["orders"]
+    pages = max(1, products // categories // PAGE_SIZE)
+
+    def catalog_page(depth: int) -> Scenario:
+        async def op(rnd: random.Random) -> None:
+            async with Read() as session:
+                await CatalogService(session, cache).list_products(rnd.randint(1, categories), min(depth, pages))
+        return op
+
+    async def catalog_keyset(rnd: random.Random) -> None:  # Кнопка ▶️: курсор на случайном товаре категории
+        category = rnd.randint(1, categories)
+        anchor = rnd.randrange(category - 1, products, categories) + 1
+        async with Read() as session:
+            await CatalogService(session, cache).list_products(category, 2, after_id=anchor)
+
+    async def cart_get(rnd: random.Random) -> None:
+        async with Read() as session:
+            await CartService(session).get_cart(rnd.randint(1, users // 10) * 10)  # Пользователь с корзиной
+
+    async def cart_add(rnd: random.Random) -> None:
+        user, product = rnd.randint(1, users), rnd.randint(1, products)
+        await queue.submit(lambda session: CartService(session).add_to_cart(user, product))
+
+    async def order_create(rnd: random.Random) -> None:  # Две позиции в корзину и оформление одним заданием писателя
+        user, first, second = rnd.randint(1, users), rnd.randint(1, products), rnd.randint(1, products)
+
+        async def job(session: AsyncSession) -> None:
+            cart = CartService(session)
+            await cart.add_to_cart(user, first)
+            await cart.add_to_cart(user, second, 2)
+            await OrderService(session).create_order(user, "Имя", "+70000000000", "Адрес", "Курьер")
+
+        await queue.submit(job)
+
+    async def orders_first_page(rnd: random.Random) -> None:
+        async with Read() as session:
+            await OrderService(session).list_orders_page(rnd.choice([None, "new", "paid", "shipped"]))
+
+    async def orders_keyset(rnd: random.Random) -> None:  # Листание вглубь истории
+        async with Read() as session:
+            await OrderService(session).list_orders_page(after_id=rnd.randint(1, orders))
+
+    async def orders_list_cancelled(rnd: random.Random) -> None:  # Полный список по редкому статусу (list_orders без страниц)
+        async with Read() as session:
+            await OrderService(session).list_orders("cancelled")
+
+    return {
+        "catalog_page_1": ("read", catalog_page(1)),
+        "catalog_page_10": ("read", catalog_page(10)),
+        "catalog_page_100": ("read", catalog_page(100)),
+        "catalog_keyset": ("read", catalog_keyset),
+        "cart_get": ("read", cart_get),
+        "cart_add": ("write", cart_add),
+        "order_create": ("write", order_create),
+        "orders_first_page": ("read", orders_first_page),
+        "orders_keyset": ("read", orders_keyset),
+        "orders_list_cancelled": ("read", orders_list_cancelled),
+    }
+
+
+async def measure(op: Scenario, concurrency: int, ops: int, seconds: float, seed_value: int) -> dict:  # Прогон одного сценария
+    latencies: list[float] = []
+    errors = 0
+    remaining = ops
+    deadline = time.perf_counter() + seconds
+
+    async def worker(index: int) -> None:
+        nonlocal remaining, errors
+        rnd = random.Random(seed_value * 1000 + index)
+        while remaining > 0 and time.perf_counter() < deadline:
+            remaining -= 1
+            started = time.perf_counter()
+            try:
+                await op(rnd)
+            except Exception:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    cuts = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [latencies[0] if latencies else 0.0] * 99
+    return {
+        "ops": len(latencies),
+        "errors": errors,
+        "ops_per_sec": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(cuts[49] * 1000, 3),
+        "p95_ms": round(cuts[94] * 1000, 3),
+        "p99_ms": round(cuts[98] * 1000, 3),
+    }
+
+
+def open_database(kind: str, tmp: str) -> tuple[AsyncEngine, AsyncEngine]:  # (писатель, читатель)
+    if kind == "file":
+        return create_engines(Settings(database_url=f"sqlite+aiosqlite:///{Path(tmp) / 'bench.db'}", db_profile="sqlite-wal"))
+    url = f"sqlite+aiosqlite:///file:bench-{uuid.uuid4().hex}?mode=memory&cache=shared&uri=true"  # Общая БД в памяти
+    engine = create_async_engine(url, poolclass=AsyncAdaptedQueuePool, pool_size=1, max_overflow=0)  # Одно соединение держит БД
+    return engine, engine
+
+
+async def run_database(kind: str, args, size: dict[str, int]) -> tuple[float, list[dict]]:
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        writer, reader = open_database(kind, tmp)
+        seconds = await seed(writer, size, args.seed)
+        Write = async_sessionmaker(writer, expire_on_commit=False, class_=AsyncSession)
+        Read = async_sessionmaker(reader, expire_on_commit=False, class_=AsyncSession)
+        queue = WriteQueue(Write)
+        await queue.start()
+        selected = scenarios(Read, queue, size)
+        for concurrency in args.concurrency:
+            for name, (kind_rw, op) in selected.items():
+                if args.only and name not in args.only:
+                    continue
+                result = await measure(op, concurrency, args.ops, args.seconds, args.seed)
+                rows.append({"db": kind, "concurrency": concurrency, "scenario": name, "kind": kind_rw, **result})
+                print(f"{kind:6} c={concurrency:<3} {name:24} {result['ops_per_sec']:>9} оп/с  "
+                      f"p50 {result['p50_ms']:>8} мс  p95 {result['p95_ms']:>8} мс  p99 {result['p99_ms']:>8} мс"
+                      + (f"  ошибок {result['errors']}" if result["errors"] else ""), flush=True)
+        await queue.stop()
+        await writer.dispose()
+        if reader is not writer:
+            await reader.dispose()
+    return seconds, rows
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: list[dict], baseline_path: str) -> None:  # Изменение p95 и оп/с относительно прошлого отчёта
+    baseline = {(r["db"], r["concurrency"], r["scenario"]): r for r in json.loads(Path(baseline_path).read_text())["results"]}
+    for row in results:
+        old = baseline.get((row["db"], row["concurrency"], row["scenario"]))
+        if not old or not old["p95_ms"] or not old["ops_per_sec"]:
+            continue
+        p95 = row["p95_ms"] / old["p95_ms"] - 1
+        ops = row["ops_per_sec"] / old["ops_per_sec"] - 1
+        flag = "  <-- регрессия" if p95 > 0.2 or ops < -0.2 else ""
+        print(f"{row['db']:6} c={row['concurrency']:<3} {row['scenario']:24} p95 {p95:+7.1%}  оп/с {ops:+7.1%}{flag}")
+
+
+async def main_async(args) -> dict:
+    size = dataset_size(args.scale)
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "date": datetime.utcnow().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlalchemy": sqlalchemy.__version__,
+            "scale": args.scale,
+            "dataset": size,
+            "ops": args.ops,
+            "seconds": args.seconds,
+            "concurrency": args.concurrency,
+            "seed_seconds": {},
+        },
+        "results": [],
+    }
+    for kind in args.db:
+        seconds, rows = await run_database(kind, args, size)
+        report["meta"]["seed_seconds"][kind] = round(seconds, 1)
+        report["results"] += rows
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=float, default=0.1, help="доля полного набора данных (1 — 200k товаров, 1M заказов)")
+    parser.add_argument("--db", type=lambda v: v.split(","), default=["file", "memory"], help="file,memory")
+    parser.add_argument("--concurrency", type=lambda v: [int(x) for x in v.split(",")], default=[1, 16], help="уровни через запятую")
+    parser.add_argument("--ops", type=int, default=500, help="операций на сценарий и уровень")
+    parser.add_argument("--seconds", type=float, default=10, help="предел времени на сценарий и уровень")
+    parser.add_argument("--only", type=lambda v: v.split(","), default=None, help="только эти сценарии")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="записать отчёт JSON в файл")
+    parser.add_argument("--compare", help="сравнить с отчётом JSON прошлого прогона")
+    args = parser.parse_args()
+    report = asyncio.run(main_async(args))
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.compare:
+        compare(report["results"], args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""Приём обновлений: long polling против вебхука на локальном поддельном Bot API.
+
+Обновления «приходят» в Telegram с постоянной частотой --rate. В режиме polling их забирает getUpdates
+поддельного Bot API (ответ задерживается на --latency, пустой запрос ждёт следующего обновления);
+в режиме вебхука каждое обновление доставляется POST-запросом с той же задержкой по --connections соединениям.
+Меряется задержка от появления обновления до хендлера и итоговая пропускная способность.
+
+Запуск из корня репозитория:
+    python -m benchmarks.update_ingestion --updates 5000 --rate 1000 --latency 0.02 --connections 40
+"""
+from __future__ import annotations  # Отложенная оценка аннотаций
+
+import argparse  # Параметры запуска
+import asyncio  # Сервер, клиенты и приложение
+import json  # Машиночитаемый вывод
+import statistics  # Перцентили
+import time  # Замер времени
+from urllib.parse import parse_qs  # Параметры запросов PTB (form-urlencoded)
+
+from telegram import Update  # Тип обновления
+from telegram.ext import Application, ApplicationBuilder, TypeHandler  # Приложение и счётчик обновлений
+
+from bot.webhook import WebhookServer, read_request, write_response  # Сервер вебхука и разбор HTTP
+
+TOKEN = "123456:BENCH"  # Токен поддельного бота
+SECRET = "bench-secret"  # Секрет вебхука
+
+
+def make_update(update_id: int) -> dict:  # Типичное обновление: текстовое сообщение
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id, "date": 1700000000, "text": f"/search чай {update_id}",
+            "chat": {"id": 1000 + update_id % 500, "type": "private", "first_name": "U"},
+            "from": {"id": 1000 + update_id % 500, "is_bot": False, "first_name": "U", "language_code": "ru"},
+        },
+    }
+
+
+class FakeBotAPI:  # Минимальный Bot API: обновления отдаются через getUpdates по мере появления
+    def __init__(self, updates: list[dict], arrivals: list[float], latency: float):
+        self.updates = updates
+        self.arrivals = arrivals  # Момент появления каждого обновления (perf_counter)
+        self.latency = latency
+        self.calls = 0
+        self.port = 0
+        self._server: asyncio.Server | None = None
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        self._server.close()
+
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/bot"
+
+    async def _handle(self, reader, writer) -> None:
+        try:
+            while (request := await read_request(reader)) is not None:
+                _, target, _, body = request
+                method = target.rsplit("/", 1)[-1]
+                params = {k: v[0] for k, v in parse_qs(body.decode()).items()}
+                result = await self._call(method, params)
+                write_response(writer, 200, json.dumps({"ok": True, "result": result}).encode(), headers={"Content-Type": "application/json"})
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _call(self, method: str, params: dict):
+        self.calls += 1
+        if method == "getMe":
+            return {"id": 123456, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+        if method == "getUpdates":
+            first = max(0, int(params.get("offset", 1)) - 1)  # update_id = индекс + 1
+            limit = int(params.get("limit", 100))
+            deadline = time.perf_counter() + float(params.get("timeout", 0))
+            while first < len(self.updates) and self.arrivals[first] > time.perf_counter() < deadline:  # Long polling: ждём появления
+                await asyncio.sleep(min(self.arrivals[first], deadline) - time.perf_counter())
+            now = time.perf_counter()
+            batch = [u for i, u in enumerate(self.updates[first:first + limit], first) if self.arrivals[i] <= now]
+            await asyncio.sleep(self.latency)  # Ответ идёт по сети
+            return batch
+        return True  # deleteWebhook, setWebhook и прочее
+
+
+async def build_app(base_url: str, total: int, queue_size: int | None) -> tuple[Application, asyncio.Event, dict[int, float]]:
+    builder = ApplicationBuilder().token(TOKEN).base_url(base_url)
+    if queue_size is not None:
+        builder = builder.updater(None).update_queue(asyncio.Queue(maxsize=queue_size))
+    app = builder.build()
+    done = asyncio.Event()
+    seen: dict[int, float] = {}  # update_id -> момент обработки
+
+    async def count(update: Update, context) -> None:
+        seen[update.update_id] = time.perf_counter()
+        if len(seen) == total:
+            done.set()
+
+    app.add_handler(TypeHandler(Update, count))
+    await app.initialize()
+    return app, done, seen
+
+
+def summary(mode: str, arrivals: list[float], seen: dict[int, float], **extra) -> dict:
+    delays = [seen[i + 1] - arrived for i, arrived in enumerate(arrivals)]
+    elapsed = max(seen.values()) - arrivals[0]
+    q = statistics.quantiles(delays, n=100)
+    return {
+        "mode": mode,
+        "updates": len(arrivals),
+        "updates_per_sec": round(len(arrivals) / elapsed, 1),
+        "delay_p50_ms": round(q[49] * 1000, 1),
+        "delay_p95_ms": round(q[94] * 1000, 1),
+        **extra,
+    }
+
+
+def schedule(args) -> list[float]:  # Моменты появления обновлений
+    start = time.perf_counter() + 0.2
+    return [start + i / args.rate for i in range(args.updates)]
+
+
+async def run_polling(args) -> dict:
+    updates = [make_update(i) for i in range(1, args.updates + 1)]
+    api = FakeBotAPI(updates, [], args.latency)
+    await api.start()
+    app, done, seen = await build_app(api.base_url(), args.updates, None)
+    await app.start()
+    api.arrivals = arrivals = schedule(args)
+    await app.updater.start_polling(poll_interval=0, timeout=10)
+    await done.wait()
+    await app.updater.stop()
+    await app.stop()
+    await app.shutdown()
+    await api.stop()
+    return summary("polling", arrivals, seen, api_calls=api.calls)
+
+
+async def run_webhook(args) -> dict:
+    api = FakeBotAPI([], [], args.latency)
+    await api.start()
+    app, done, seen = await build_app(api.base_url(), args.updates, args.queue_size)
+    await app.start()
+    server = WebhookServer(app, "/tg", SECRET, "127.0.0.1", 0)
+    await server.start()
+    bodies = [json.dumps(make_update(i)).encode() for i in range(1, args.updates + 1)]
+    pending = iter(range(args.updates))  # Общая очередь доставки Telegram в порядке появления
+    arrivals = schedule(args)
+    retries = 0
+
+    async def deliver() -> None:  # Одно соединение Telegram: доставки по очереди
+        nonlocal retries
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+        for i in pending:
+            await asyncio.sleep(max(0.0, arrivals[i] - time.perf_counter()) + args.latency)
+            while True:
+                writer.write(
+                    f"POST /tg HTTP/1.1\r\nHost: bench\r\nContent-Type: application/json\r\n"
+                    f"X-Telegram-Bot-Api-Secret-Token: {SECRET}\r\nContent-Length: {len(bodies[i])}\r\n\r\n".encode() + bodies[i]
+                )
+                head = await reader.readuntil(b"\r\n\r\n")
+                if b" 429 " not in head.split(b"\r\n", 1)[0]:
+                    break
+                retries += 1
+                await asyncio.sleep(args.retry_delay + args.latency)
+        writer.close()
+
+    await asyncio.gather(*(deliver() for _ in range(args.connections)))
+    await done.wait()
+    await server.stop()
+    await app.stop()
+    await app.shutdown()
+    await api.stop()
+    return summary("webhook", arrivals, seen, rejected_429=retries)
+
+
+async def main_async(args) -> list[dict]:
+    return [await run_polling(args), await run_webhook(args)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--updates", type=int, default=5000)
+    parser.add_argument("--rate", type=float, default=1000, help="обновлений в секунду")
+    parser.add_argument("--latency", type=float, default=0.02, help="задержка сети на запрос, сек")
+    parser.add_argument("--connections", type=int, default=40, help="соединений доставки вебхука (max_connections в setWebhook)")
+    parser.add_argument("--queue-size", type=int, default=1000)
+    parser.add_argument("--retry-delay", type=float, default=0.05, help="пауза перед повтором после 429, сек")
+    parser.add_argument("--json", action="store_true", help="печатать результат в JSON")
+    args = parser.parse_args()
+    results = asyncio.run(main_async(args))
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for row in results:
+        print(" ".join(f"{k}={v}" for k, v in row.items()))
+
+
+if __name__ == "__main__":
+    main()
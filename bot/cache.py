@@ -0,0 +1,56 @@
+from __future__ import annotations  # Отложенная оценка аннотаций
+
+from collections import OrderedDict  # Упорядоченный словарь для вытеснения по LRU
+from time import monotonic  # Монотонные часы для TTL
+from typing import Any, Hashable  # Типизация ключей и значений
+
+_MISSING = object()  # Маркер отсутствующей записи
+
+
+class LRUCache:  # Ограниченный in-memory кэш с вытеснением LRU, необязательным TTL и счётчиками
+    def __init__(self, maxsize: int = 1024, ttl: float | None = None):  # Размер и время жизни записи (сек)
+        self.maxsize = max(1, maxsize)  # Не меньше одной записи
+        self.ttl = ttl if ttl and ttl > 0 else None  # 0/None — без TTL
+        self._data: OrderedDict[Hashable, tuple[float | None, Any]] = OrderedDict()  # ключ -> (истекает, значение)
+        self.hits = 0  # Попадания
+        self.misses = 0  # Промахи
+        self.evictions = 0  # Вытеснения по размеру
+
+    def get(self, key: Hashable, default: Any = None) -> Any:  # Получить значение и отметить использование
+        entry = self._data.get(key, _MISSING)  # Ищем запись
+        if entry is _MISSING:  # Нет записи — промах
+            self.misses += 1
+            return default
+        expires, value = entry  # Разбираем запись
+        if expires is not None and expires < monotonic():  # Запись устарела по TTL
+            del self._data[key]  # Удаляем
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)  # Помечаем как недавно использованную
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:  # Положить значение в кэш
+        expires = monotonic() + self.ttl if self.ttl else None  # Срок годности
+        self._data[key] = (expires, value)  # Сохраняем
+        self._data.move_to_end(key)  # Свежая запись в конец
+        while len(self._data) > self.maxsize:  # Превышен лимит — вытесняем самые старые
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:  # Удалить запись
+        entry = self._data.pop(key, _MISSING)
+        return default if entry is _MISSING else entry[1]
+
+    def clear(self) -> None:  # Очистить кэш и сбросить счётчики
+        self._data.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    def __len__(self) -> int:  # Количество записей
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:  # Наличие ключа (без учёта TTL и счётчиков)
+        return key in self._data
+
+    def stats(self) -> dict[str, int]:  # Счётчики для отчётов и метрик
+        return {"size": len(self._data), "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
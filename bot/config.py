@@ -11,6 +11,45 @@ class Settings(BaseModel):
     bot_token: str = Field(default_factory=lambda: os.getenv("BOT_TOKEN", ""))
     admin_ids: List[int] = Field(default_factory=lambda: [int(x) for x in os.getenv("ADMIN_IDS", "").split(",") if x.strip().isdigit()])
     database_url: str = Field(default_factory=lambda: os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./shop.db"))
+    update_mode: str = Field(default_factory=lambda: os.getenv("UPDATE_MODE", "polling"))  # polling | webhook
+    webhook_url: str = Field(default_factory=lambda: os.getenv("WEBHOOK_URL", ""))
+    webhook_listen: str = Field(default_factory=lambda: os.getenv("WEBHOOK_LISTEN", "0.0.0.0"))
+    webhook_port: int = Field(default_factory=lambda: int(os.getenv("WEBHOOK_PORT", "8443")))
+    webhook_secret: str = Field(default_factory=lambda: os.getenv("WEBHOOK_SECRET", ""))
+    webhook_queue_size: int = Field(default_factory=lambda: int(os.getenv("WEBHOOK_QUEUE_SIZE", "1000")))
+    metrics_listen: str = Field(default_factory=lambda: os.getenv("METRICS_LISTEN", "127.0.0.1"))
+    metrics_port: int = Field(default_factory=lambda: int(os.getenv("METRICS_PORT", "0")))  # 0 — без /metrics
+    bot_api_url: str = Field(default_factory=lambda: os.getenv("BOT_API_URL", "https://api.telegram.org/bot"))  # Свой Bot API сервер или заглушка в тестах
+    workers: int = Field(default_factory=lambda: int(os.getenv("WORKERS", "1")))  # >1 — супервизор и процессы-воркеры
+    shard_queue_size: int = Field(default_factory=lambda: int(os.getenv("SHARD_QUEUE_SIZE", "1000")))  # Недоставленных обновлений на воркер
+    shard_health_interval: float = Field(default_factory=lambda: float(os.getenv("SHARD_HEALTH_INTERVAL", "5")))  # Период проверки воркеров, сек
+    shard_drain_timeout: float = Field(default_factory=lambda: float(os.getenv("SHARD_DRAIN_TIMEOUT", "30")))  # Сколько ждать дренажа при остановке, сек
+    shard_index: int = Field(default_factory=lambda: int(os.getenv("SHARD_INDEX", "-1")))  # Номер воркера; задаёт супервизор
+    shard_control_port: int = Field(default_factory=lambda: int(os.getenv("SHARD_CONTROL_PORT", "0")))  # Служебный порт супервизора
+    shard_secret: str = Field(default_factory=lambda: os.getenv("SHARD_SECRET", ""))  # Секрет внутреннего трафика
+    update_concurrency: int = Field(default_factory=lambda: int(os.getenv("UPDATE_CONCURRENCY", "64")))
     log_level: str = Field(default_factory=lambda: os.getenv("LOG_LEVEL", "INFO"))
+    fast_start: bool = Field(default_factory=lambda: os.getenv("FAST_START", "1").lower() in {"1", "true", "yes"})  # Пропуск миграций, если схема актуальна
+    db_profile: str = Field(default_factory=lambda: os.getenv("DB_PROFILE", "default"))  # default | sqlite-wal
+    db_busy_timeout_ms: int = Field(default_factory=lambda: int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000")))
+    db_mmap_size: int = Field(default_factory=lambda: int(os.getenv("DB_MMAP_SIZE", str(256 * 1024 * 1024))))
+    db_cache_size_kib: int = Field(default_factory=lambda: int(os.getenv("DB_CACHE_SIZE_KIB", "65536")))
+    db_read_pool_size: int = Field(default_factory=lambda: int(os.getenv("DB_READ_POOL_SIZE", "4")))
+    group_commit: bool = Field(default_factory=lambda: os.getenv("GROUP_COMMIT", "1").lower() in {"1", "true", "yes"})
+    write_batch_size: int = Field(default_factory=lambda: int(os.getenv("WRITE_BATCH_SIZE", "64")))
+    write_batch_delay: float = Field(default_factory=lambda: float(os.getenv("WRITE_BATCH_DELAY", "0.002")))
+    catalog_cache_size: int = Field(default_factory=lambda: int(os.getenv("CATALOG_CACHE_SIZE", "4096")))
+    catalog_cache_ttl: float = Field(default_factory=lambda: float(os.getenv("CATALOG_CACHE_TTL", "300")))
+    user_cache_size: int = Field(default_factory=lambda: int(os.getenv("USER_CACHE_SIZE", "100000")))
+    cart_coalesce_window: float = Field(default_factory=lambda: float(os.getenv("CART_COALESCE_WINDOW", "0.4")))
+    persistence_interval: float = Field(default_factory=lambda: float(os.getenv("PERSISTENCE_INTERVAL", "5")))  # Период записи user_data, сек
+    photo_warm_delay: float = Field(default_factory=lambda: float(os.getenv("PHOTO_WARM_DELAY", "1.0")))  # Пауза между фото при /warm_photos, сек
+    outbox_rate: float = Field(default_factory=lambda: float(os.getenv("OUTBOX_RATE", "30")))  # Исходящих сообщений в секунду (лимит Bot API)
+    outbox_chat_interval: float = Field(default_factory=lambda: float(os.getenv("OUTBOX_CHAT_INTERVAL", "1.0")))  # Пауза между сообщениями в один чат, сек
+    outbox_senders: int = Field(default_factory=lambda: int(os.getenv("OUTBOX_SENDERS", "8")))
+    broadcast_batch: int = Field(default_factory=lambda: int(os.getenv("BROADCAST_BATCH", "500")))  # Получателей рассылки за один запрос
+    stats_backfill_batch: int = Field(default_factory=lambda: int(os.getenv("STATS_BACKFILL_BATCH", "500")))
+    inline_cache_time: int = Field(default_factory=lambda: int(os.getenv("INLINE_CACHE_TIME", "30")))
+    import_batch_size: int = Field(default_factory=lambda: int(os.getenv("IMPORT_BATCH_SIZE", "2000")))
 
 settings = Settings() 
\ No newline at end of file
@@ -1,22 +1,107 @@
 from __future__ import annotations  # Отложенная оценка аннотаций
 
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker  # Асинхронный движок и фабрика сессий
-from sqlalchemy.orm import DeclarativeBase  # Базовый класс ORM моделей
-from sqlalchemy import select  # Конструктор SELECT-запросов
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine, async_sessionmaker  # Асинхронный движок и фабрика сессий
+from sqlalchemy.engine import make_url  # Разбор строки подключения
+from sqlalchemy.pool import AsyncAdaptedQueuePool  # Пул соединений с фиксированным размером
+from sqlalchemy.orm import DeclarativeBase, Session  # Базовый класс ORM моделей и синхронная сессия (для событий)
+from sqlalchemy import select, event, text  # Конструктор SELECT-запросов, события ORM и сырой SQL
+from sqlalchemy.exc import DBAPIError  # Ошибка драйвера (нет таблицы версии)
+from contextlib import asynccontextmanager  # Точка сохранения как контекст
+from typing import AsyncIterator, Callable  # Типизация колбэков
+from pathlib import Path  # Путь к alembic.ini
 
-from .config import settings  # Настройки приложения
+from .config import Settings, settings  # Настройки приложения
 from .logger import logger  # Логгер
 
 class Base(DeclarativeBase):  # Базовый класс для всех ORM моделей
     pass  # Содержит общую метадату
 
-engine = create_async_engine(settings.database_url, echo=False, future=True)  # Создаём асинхронный движок БД
-SessionLocal = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)  # Фабрика асинхронных сессий
+def _sqlite_pragmas(cfg: Settings, read_only: bool) -> list[str]:  # PRAGMA, выполняемые на каждом новом соединении
+    pragmas = [
+        "PRAGMA journal_mode=WAL",  # Читатели не блокируются писателем
+        "PRAGMA synchronous=NORMAL",  # В WAL достаточно: fsync только на checkpoint
+        f"PRAGMA busy_timeout={cfg.db_busy_timeout_ms}",  # Ждём блокировку вместо «database is locked»
+        f"PRAGMA mmap_size={cfg.db_mmap_size}",  # Чтение страниц через mmap
+        f"PRAGMA cache_size=-{cfg.db_cache_size_kib}",  # Размер кэша страниц (KiB)
+        "PRAGMA temp_store=MEMORY",  # Временные структуры в памяти
+    ]
+    if read_only:
+        pragmas.append("PRAGMA query_only=ON")  # Пул чтения не может ничего изменить
+    return pragmas
 
-async def init_models() -> None:  # Создание таблиц при старте
+def _apply_pragmas(engine: AsyncEngine, pragmas: list[str]) -> None:  # Подписка на подключение: настраиваем соединение
+    @event.listens_for(engine.sync_engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+def use_sqlite_transactions(engine: AsyncEngine) -> None:  # BEGIN выдаёт SQLAlchemy, а не драйвер: иначе SAVEPOINT без BEGIN фиксирует данные на RELEASE
+    @event.listens_for(engine.sync_engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None  # Драйвер больше не начинает транзакции сам
+
+    @event.listens_for(engine.sync_engine, "begin")
+    def _on_begin(conn):
+        conn.exec_driver_sql("BEGIN")
+
+def create_engines(cfg: Settings = settings) -> tuple[AsyncEngine, AsyncEngine]:  # (писатель, читатель) согласно профилю настроек
+    url = make_url(cfg.database_url)  # Разобранная строка подключения
+    file_sqlite = url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:")  # Профиль только для файловой SQLite
+    if cfg.db_profile != "sqlite-wal" or not file_sqlite:  # Профиль по умолчанию: один движок на всё
+        shared = create_async_engine(cfg.database_url, echo=False, future=True)
+        if url.get_backend_name() == "sqlite":
+            use_sqlite_transactions(shared)  # Точки сохранения писателя
+        return shared, shared
+    writer = create_async_engine(  # Единственное соединение на запись: писатели ждут в очереди пула, а не в SQLite
+        cfg.database_url, echo=False, future=True, poolclass=AsyncAdaptedQueuePool, pool_size=1, max_overflow=0,
+    )
+    reader = create_async_engine(  # Пул только для чтения: в WAL читатели работают параллельно с писателем
+        cfg.database_url, echo=False, future=True, poolclass=AsyncAdaptedQueuePool,
+        pool_size=cfg.db_read_pool_size, max_overflow=0,
+    )
+    _apply_pragmas(writer, _sqlite_pragmas(cfg, read_only=False))
+    use_sqlite_transactions(writer)  # Точки сохранения писателя; читателям они не нужны
+    _apply_pragmas(reader, _sqlite_pragmas(cfg, read_only=True))
+    return writer, reader
+
+engine, read_engine = create_engines()  # Движок записи и движок чтения (в профиле default это один движок)
+SessionLocal = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)  # Фабрика асинхронных сессий (запись)
+ReadSessionLocal = async_sessionmaker(read_engine, expire_on_commit=False, class_=AsyncSession)  # Фабрика сессий только для чтения
+
+MIGRATIONS_CONFIG = Path(__file__).resolve().parent.parent / "alembic.ini"  # Конфигурация Alembic
+SCHEMA_REVISION = "0009_outbox"  # Последняя миграция (голова Alembic); обновляется вместе с новой миграцией, тест сверяет
+
+def _upgrade_schema(connection) -> None:  # Применить миграции Alembic на соединении приложения
+    from alembic import command  # Команды Alembic
+    from alembic.config import Config  # Конфигурация Alembic
+    cfg = Config(str(MIGRATIONS_CONFIG))
+    cfg.attributes["connection"] = connection  # migrations/env.py использует это соединение
+    cfg.attributes["configure_logger"] = False  # Логирование уже настроено loguru
+    command.upgrade(cfg, "head")
+
+async def schema_revision(conn) -> str | None:  # Версия схемы из alembic_version одним запросом; None — таблицы нет
+    try:
+        return (await conn.execute(text("SELECT version_num FROM alembic_version"))).scalar_one_or_none()
+    except DBAPIError:  # Пустая БД
+        return None
+
+async def init_models(fast: bool | None = None) -> None:  # Приведение схемы к актуальной версии при старте
+    fast = settings.fast_start if fast is None else fast
+    if fast:  # Быстрый старт: схема уже последней версии — без Alembic (импорт, разбор миграций) и пересчёта счётчиков
+        async with engine.connect() as conn:
+            revision = await schema_revision(conn)
+        if revision == SCHEMA_REVISION:
+            logger.info("Database schema {} is up to date", revision)
+            return
     from . import models  # noqa: F401  # Импорт моделей, чтобы они были зарегистрированы в метадате
+    from .services.catalog_service import rebuild_category_stats  # Заполнение счётчиков категорий
     async with engine.begin() as conn:  # Открываем транзакцию на подключении
-        await conn.run_sync(Base.metadata.create_all)  # Создаём таблицы, если отсутствуют
+        await conn.run_sync(_upgrade_schema)  # alembic upgrade head
+    async with SessionLocal() as session:  # Досчитываем счётчики для категорий, у которых их ещё нет
+        await rebuild_category_stats(session)
+        await session.commit()
     logger.info("Database initialized")  # Пишем в лог об инициализации
 
 async def get_one(session: AsyncSession, stmt):  # Вспомогательная функция: получить одну запись или None
@@ -25,4 +110,38 @@ async def get_one(session: AsyncSession, stmt):  # Вспомогательна
 
 async def get_all(session: AsyncSession, stmt):  # Вспомогательная функция: получить список записей
     result = await session.execute(stmt)  # Выполняем запрос
-    return result.scalars().all()  # Возвращаем все результаты как список 
\ No newline at end of file
+    return result.scalars().all()  # Возвращаем все результаты как список 
+
+_AFTER_COMMIT_KEY = "after_commit_callbacks"  # Ключ в session.info для отложенных колбэков
+
+def call_after_commit(session: AsyncSession | Session, callback: Callable[[], None]) -> None:  # Выполнить колбэк только после успешного commit
+    session.info.setdefault(_AFTER_COMMIT_KEY, []).append(callback)
+
+@asynccontextmanager
+async def savepoint(session: AsyncSession) -> AsyncIterator[None]:  # SAVEPOINT: ошибка откатывает только свои изменения и свои колбэки after_commit
+    callbacks = session.info.setdefault(_AFTER_COMMIT_KEY, [])
+    mark = len(callbacks)
+    try:
+        async with session.begin_nested():
+            await session.connection()  # SAVEPOINT сразу, а не с первым запросом внутри блока
+            yield
+    except BaseException:
+        del callbacks[mark:]
+        raise
+
+@event.listens_for(Session, "after_commit")
+def _run_after_commit(session: Session) -> None:  # Транзакция зафиксирована — выполняем отложенные колбэки
+    for callback in session.info.pop(_AFTER_COMMIT_KEY, ()):
+        callback()
+
+@event.listens_for(Session, "after_transaction_end")
+def _drop_after_commit(session: Session, transaction) -> None:  # Откат/закрытие без commit — колбэки отменяются
+    if transaction.parent is None:  # Только корневая транзакция
+        session.info.pop(_AFTER_COMMIT_KEY, None)
+
+def dialect_insert(session: AsyncSession, model):  # INSERT с поддержкой ON CONFLICT/RETURNING для диалекта сессии
+    if session.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(model)
@@ -1,12 +1,33 @@
 from __future__ import annotations  # Отложенная оценка аннотаций
 
 from telegram import Update  # Тип обновления
-from telegram.ext import ContextTypes, CommandHandler  # Хендлеры команд и контекст
+from telegram.ext import ContextTypes, CommandHandler, CallbackQueryHandler, MessageHandler, filters  # Хендлеры и контекст
+from telegram.error import TelegramError  # Ошибки Bot API
+from datetime import date, datetime  # Фильтр заказов по датам
+from pathlib import Path  # Расширение загруженного файла
+from time import monotonic  # Частота отчётов о прогрессе
+import re  # Разбор диапазона дат
+import tempfile  # Временный файл импорта
 
-from ..database import SessionLocal  # Сессии БД
+from ..database import SessionLocal, ReadSessionLocal  # Сессии БД (запись и только чтение)
+from ..keyboards import orders_kb  # Навигация по заказам
 from ..services.admin_service import AdminService  # Админ-сервис
 from ..services.order_service import OrderService  # Сервис заказов
+from ..services.stats_service import StatsService  # Сводки продаж
+from ..services.import_service import CatalogImporter, ImportReport  # Массовый импорт каталога
+from ..services.photo_service import warm_category_photos  # Прогрев file_id фото
+from ..services.outbox import start_broadcast, stop_broadcast  # Рассылка с лимитом Bot API
+from ..logger import logger  # Логгер
+from ..services.write_queue import write_queue  # Писатель с групповым commit
 from ..config import settings  # Настройки (ADMIN_IDS)
+from ..metrics import metrics  # Метрики хендлеров, БД и Bot API
+
+DATE_RANGE = re.compile(r"\d{4}-\d{2}-\d{2}(\.\.(\d{4}-\d{2}-\d{2})?)?|\.\.\d{4}-\d{2}-\d{2}")  # 2024-01-31, 2024-01-01..2024-01-31, 2024-01-01.., ..2024-01-31
+CALLBACK_DATA_LIMIT = 64  # Максимальная длина callback_data в Telegram (байт)
+IMPORT_EXTENSIONS = {".csv", ".json", ".jsonl"}  # Форматы импорта каталога
+PROGRESS_INTERVAL = 2.0  # Не чаще одного отчёта о прогрессе за столько секунд
+PERF_TOP = 15  # Сколько хендлеров показывать в /perf
+TELEGRAM_TEXT_LIMIT = 4096  # Максимальная длина сообщения
 
 async def cmd_add_category(update: Update, context: ContextTypes.DEFAULT_TYPE):  # Добавить категорию
     async with SessionLocal() as session:  # Сессия БД
@@ -56,39 +77,210 @@ async def cmd_edit_product(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await session.commit()  # Фиксируем
     await update.message.reply_text("OK" if ok else "Неизвестное поле")  # Ответ об успехе/ошибке
 
+def _parse_order_filters(args: list[str]) -> tuple[str | None, date | None, date | None]:  # Аргументы /orders: [status] [YYYY-MM-DD[..YYYY-MM-DD]]
+    status = date_from = date_to = None
+    for arg in args:
+        if DATE_RANGE.fullmatch(arg):  # Дата или диапазон дат
+            start, sep, end = arg.partition("..")
+            date_from = date.fromisoformat(start) if start else None
+            date_to = date.fromisoformat(end) if end else None
+            if not sep:  # Одна дата — заказы за этот день
+                date_to = date_from
+        else:  # Всё остальное — статус
+            status = arg
+    return status, date_from, date_to
+
+def _encode_order_filters(status: str | None, date_from: date | None, date_to: date | None) -> str:  # Фильтры для callback_data
+    return ":".join([status or "-", f"{date_from:%Y%m%d}" if date_from else "-", f"{date_to:%Y%m%d}" if date_to else "-"])
+
+def _decode_order_filters(filters: str) -> tuple[str | None, date | None, date | None]:  # Обратное преобразование
+    status, start, end = filters.rsplit(":", 2)  # Статус может содержать «:»
+    parse = lambda value: None if value == "-" else datetime.strptime(value, "%Y%m%d").date()
+    return (None if status == "-" else status), parse(start), parse(end)
+
+async def _orders_page(filters: str, after_id: int | None = None, before_id: int | None = None):  # Текст и клавиатура страницы заказов
+    status, date_from, date_to = _decode_order_filters(filters)
+    async with ReadSessionLocal() as session:  # Сессия только для чтения
+        rows, has_newer, has_older = await OrderService(session).list_orders_page(status, date_from, date_to, after_id, before_id)
+    if not rows:  # Если пусто
+        return "Заказов нет", None
+    lines = [f"#{o.id} {o.order_number} {o.created_at:%d.%m.%Y %H:%M} {o.status} {o.total_cents/100:.2f} ₽" for o in rows]  # Форматирование строк
+    kb = orders_kb(filters, rows[0].id, rows[-1].id, has_newer, has_older)  # Навигация keyset
+    if len(f"ord:{filters}:a{rows[-1].id}".encode()) > CALLBACK_DATA_LIMIT:  # Слишком длинный статус — без навигации
+        kb = None
+    return "\n".join(lines), kb
+
 async def cmd_orders(update: Update, context: ContextTypes.DEFAULT_TYPE):  # Список заказов
-    async with SessionLocal() as session:  # Сессия БД
-        admin = AdminService(session, settings.admin_ids)  # Админ-сервис
-        if not admin.is_admin(update.effective_user.id):  # Проверка прав
-            await update.message.reply_text("Недостаточно прав")  # Отказ
-            return
-        status = context.args[0] if context.args else None  # Необязательный фильтр по статусу
-        orders = await OrderService(session).list_orders(status)  # Получаем список
-    if not orders:  # Если пусто
-        await update.message.reply_text("Заказов нет")  # Сообщаем
+    if update.effective_user.id not in settings.admin_ids:  # Проверка прав (без обращения к БД)
+        await update.message.reply_text("Недостаточно прав")  # Отказ
+        return
+    try:
+        filters = _encode_order_filters(*_parse_order_filters(context.args))  # Необязательные фильтры по статусу и датам
+    except ValueError:  # Некорректная дата
+        await update.message.reply_text("Использование: /orders [status] [YYYY-MM-DD[..YYYY-MM-DD]]")  # Подсказка
         return
-    lines = [f"#{o.id} {o.order_number} {o.status} {o.total_cents/100:.2f} ₽" for o in orders]  # Форматирование строк
-    await update.message.reply_text("\n".join(lines))  # Отправляем список
+    text, kb = await _orders_page(filters)  # Первая страница
+    await update.message.reply_text(text, reply_markup=kb)  # Отправляем страницу
+
+async def cb_orders_page(update: Update, context: ContextTypes.DEFAULT_TYPE):  # Листание списка заказов
+    query = update.callback_query  # Callback
+    if update.effective_user.id not in settings.admin_ids:  # Проверка прав
+        await query.answer("Недостаточно прав", show_alert=True)
+        return
+    filters, cursor = query.data[len("ord:"):].rsplit(":", 1)  # Фильтры и курсор a<id>/b<id>
+    anchor = int(cursor[1:])  # ID граничного заказа
+    text, kb = await _orders_page(filters, *((anchor, None) if cursor[0] == "a" else (None, anchor)))  # Соседняя страница
+    await query.answer()
+    await query.edit_message_text(text, reply_markup=kb)  # Меняем сообщение
 
 async def cmd_set_status(update: Update, context: ContextTypes.DEFAULT_TYPE):  # Смена статуса заказа
-    async with SessionLocal() as session:  # Сессия БД
-        admin = AdminService(session, settings.admin_ids)  # Админ-сервис
-        if not admin.is_admin(update.effective_user.id):  # Проверка прав
-            await update.message.reply_text("Недостаточно прав")  # Отказ
+    if update.effective_user.id not in settings.admin_ids:  # Проверка прав (без обращения к БД)
+        await update.message.reply_text("Недостаточно прав")  # Отказ
+        return
+    if len(context.args) < 2:  # Проверяем аргументы
+        await update.message.reply_text("Использование: /set_status <id> <status>")  # Подсказка
+        return
+    order_id = int(context.args[0])  # ID заказа
+    status = context.args[1]  # Новый статус
+    found = await write_queue.submit(lambda session: OrderService(session).set_status(order_id, status))  # Статус и уведомление покупателю — одним commit
+    await update.message.reply_text("Статус обновлён" if found else "Заказ не найден")  # Ответ пользователю
+
+async def cmd_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):  # Отчёт о продажах из сводок
+    if update.effective_user.id not in settings.admin_ids:  # Проверка прав (без обращения к БД)
+        await update.message.reply_text("Недостаточно прав")  # Отказ
+        return
+    async with ReadSessionLocal() as session:  # Сессия только для чтения
+        report = await StatsService(session).report()  # Сводки, а не orders/order_items
+    lines = ["Продажи за 7 дней:"]
+    lines += [f"{day:%d.%m} — {orders} зак., {revenue/100:.2f} ₽" for day, orders, revenue in report.daily] or ["нет заказов"]
+    lines += ["", "Заказы по статусам:"]
+    lines += [f"{status}: {orders}" for status, orders in report.statuses] or ["нет заказов"]
+    lines += ["", "Топ товаров:"]
+    lines += [f"{title} — {units} шт., {revenue/100:.2f} ₽" for title, units, revenue in report.top_products] or ["нет продаж"]
+    lines += ["", "Топ категорий:"]
+    lines += [f"{name} — {units} шт., {revenue/100:.2f} ₽" for name, units, revenue in report.top_categories] or ["нет продаж"]
+    if report.backfill_pending:  # Старые заказы ещё досчитываются в фоне
+        lines += ["", "⏳ История заказов ещё досчитывается"]
+    await update.message.reply_text("\n".join(lines))  # Отправляем отчёт
+
+async def cmd_perf(update: Update, context: ContextTypes.DEFAULT_TYPE):  # Где уходит время: хендлеры, БД, Bot API, очереди
+    if update.effective_user.id not in settings.admin_ids:  # Проверка прав (без обращения к БД)
+        await update.message.reply_text("Недостаточно прав")  # Отказ
+        return
+    lines = ["Хендлеры (p50/p95 мс; на вызов: запросов и мс БД, мс Bot API):"]
+    lines += [
+        f"{label} — {n} шт., {p50:.1f}/{p95:.1f} мс; БД {queries:.1f} запр., {db:.1f} мс; API {api:.1f} мс" + (f"; ошибок {errors}" if errors else "")
+        for label, n, p50, p95, queries, db, api, errors in metrics.handler_report()[:PERF_TOP]
+    ] or ["нет вызовов"]
+    lines += ["", f"Фоновые запросы к БД: {metrics.background_queries}, {metrics.background_db_seconds:.1f} с"]
+    lines += ["", "Bot API (p50/p95 мс):"]
+    lines += [
+        f"{method} — {h.count} шт., {h.quantile(0.5) * 1000:.0f}/{h.quantile(0.95) * 1000:.0f} мс" + (f", ошибок {metrics.api_errors[method]}" if metrics.api_errors[method] else "")
+        for method, h in sorted(metrics.api.items(), key=lambda item: -item[1].count)
+    ] or ["нет вызовов"]
+    lines += [""] + [f"{name}: " + ", ".join(f"{k}={v}" for k, v in source().items()) for name, source in metrics.sources.items()]
+    await update.message.reply_text("\n".join(lines)[:TELEGRAM_TEXT_LIMIT])  # Отправляем отчёт
+
+async def cmd_warm_photos(update: Update, context: ContextTypes.DEFAULT_TYPE):  # Загрузить фото категории в Telegram заранее
+    if update.effective_user.id not in settings.admin_ids:  # Проверка прав (без обращения к БД)
+        await update.message.reply_text("Недостаточно прав")  # Отказ
+        return
+    if len(context.args) != 1 or not context.args[0].isdigit():
+        await update.message.reply_text("Использование: /warm_photos <category_id>")  # Подсказка
+        return
+    category_id = int(context.args[0])  # Категория
+    chat_id = update.effective_chat.id  # Служебные фото отправляются сюда и сразу удаляются
+
+    async def job():  # Фоновая задача: хендлер не ждёт загрузки всей категории
+        report = await warm_category_photos(
+            context.bot, chat_id, category_id, write_queue, ReadSessionLocal, settings.photo_warm_delay
+        )
+        await context.bot.send_message(
+            chat_id, f"Прогрев фото категории {category_id}: загружено {report.warmed} из {report.total}, ошибок {report.failed}"
+        )
+
+    context.application.create_task(job(), update=update)  # Ошибки — в общий обработчик ошибок
+    await update.message.reply_text(f"Прогрев фото категории {category_id} запущен")
+
+async def cmd_broadcast(update: Update, context: ContextTypes.DEFAULT_TYPE):  # Рассылка всем пользователям
+    if update.effective_user.id not in settings.admin_ids:  # Проверка прав (без обращения к БД)
+        await update.message.reply_text("Недостаточно прав")  # Отказ
+        return
+    parts = update.message.text.split(maxsplit=1)  # Текст после команды с сохранением переносов строк
+    text = parts[1].strip() if len(parts) > 1 else ""
+    if not text:
+        await update.message.reply_text("Использование: /broadcast <текст>")  # Подсказка
+        return
+    chat_id = update.effective_chat.id  # Сюда придёт итог
+    broadcast_id = await write_queue.submit(lambda session: start_broadcast(session, text, chat_id))  # Отправка идёт в фоне
+    await update.message.reply_text(f"Рассылка #{broadcast_id} запущена. Остановить: /broadcast_stop {broadcast_id}")
+
+async def cmd_broadcast_stop(update: Update, context: ContextTypes.DEFAULT_TYPE):  # Остановить рассылку
+    if update.effective_user.id not in settings.admin_ids:  # Проверка прав (без обращения к БД)
+        await update.message.reply_text("Недостаточно прав")  # Отказ
+        return
+    if len(context.args) != 1 or not context.args[0].isdigit():
+        await update.message.reply_text("Использование: /broadcast_stop <id>")  # Подсказка
+        return
+    broadcast_id = int(context.args[0])
+    stopped = await write_queue.submit(lambda session: stop_broadcast(session, broadcast_id))
+    await update.message.reply_text(f"Рассылка #{broadcast_id} остановлена" if stopped else "Нет такой активной рассылки")
+
+def _import_summary(report: ImportReport) -> str:  # Текст отчёта об импорте
+    lines = [
+        f"Записей: {report.rows}",
+        f"Добавлено товаров: {report.inserted}",
+        f"Обновлено по артикулу: {report.updated}",
+        f"Новых категорий: {report.categories}",
+        f"Пропущено: {report.skipped}",
+    ]
+    lines += report.errors
+    return "\n".join(lines)
+
+async def doc_import(update: Update, context: ContextTypes.DEFAULT_TYPE):  # Импорт каталога из документа CSV/JSON
+    if update.effective_user.id not in settings.admin_ids:  # Проверка прав (без обращения к БД)
+        await update.message.reply_text("Недостаточно прав")  # Отказ
+        return
+    document = update.message.document  # Загруженный файл
+    suffix = Path(document.file_name or "").suffix.lower()  # Формат по расширению
+    if suffix not in IMPORT_EXTENSIONS:
+        await update.message.reply_text("Импорт каталога: пришлите файл .csv, .json или .jsonl")  # Подсказка
+        return
+    status = await update.message.reply_text("Импорт: загрузка файла…")  # Сообщение с прогрессом
+    last_report = monotonic()
+
+    async def progress(report: ImportReport) -> None:  # Редактируем сообщение не чаще PROGRESS_INTERVAL
+        nonlocal last_report
+        if monotonic() - last_report < PROGRESS_INTERVAL:
             return
-        if len(context.args) < 2:  # Проверяем аргументы
-            await update.message.reply_text("Использование: /set_status <id> <status>")  # Подсказка
+        last_report = monotonic()
+        try:
+            await status.edit_text(f"Импорт: обработано {report.rows} записей…")
+        except TelegramError:  # Прогресс не критичен
+            logger.debug("Import progress update failed")
+
+    with tempfile.TemporaryDirectory() as tmp:  # Файл читается с диска потоком, а не в память
+        path = Path(tmp) / f"import{suffix}"
+        await (await document.get_file()).download_to_drive(path)
+        importer = CatalogImporter(write_queue, settings.import_batch_size)
+        try:
+            report = await importer.run(path, progress)
+        except ValueError as exc:  # Повреждённый файл: уже записанные пачки остаются
+            await status.edit_text(f"Импорт прерван: {exc}\n{_import_summary(importer.report)}")
             return
-        order_id = int(context.args[0])  # ID заказа
-        status = context.args[1]  # Новый статус
-        await OrderService(session).set_status(order_id, status)  # Обновляем статус
-        await session.commit()  # Фиксируем
-    await update.message.reply_text("Статус обновлён")  # Ответ пользователю
+    await status.edit_text(f"Импорт завершён\n{_import_summary(report)}")  # Итог
 
 handlers = [  # Регистрируемые хендлеры админа
     CommandHandler("add_category", cmd_add_category),  # Добавить категорию
     CommandHandler("add_product", cmd_add_product),  # Добавить товар
     CommandHandler("edit_product", cmd_edit_product),  # Редактировать товар
     CommandHandler("orders", cmd_orders),  # Список заказов
+    CallbackQueryHandler(cb_orders_page, pattern=r"^ord:.+:(?:\d{8}|-):(?:\d{8}|-):[ab]\d+$"),  # Листание заказов
     CommandHandler("set_status", cmd_set_status),  # Сменить статус заказа
+    CommandHandler("stats", cmd_stats),  # Отчёт о продажах
+    CommandHandler("perf", cmd_perf),  # Метрики производительности
+    CommandHandler("warm_photos", cmd_warm_photos),  # Прогрев фото категории
+    CommandHandler("broadcast", cmd_broadcast),  # Рассылка всем пользователям
+    CommandHandler("broadcast_stop", cmd_broadcast_stop),  # Остановить рассылку
+    MessageHandler(filters.Document.ALL & filters.User(settings.admin_ids), doc_import),  # Импорт каталога из файла: документы остальных не доходят до хендлера
 ] 
\ No newline at end of file
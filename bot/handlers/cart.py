@@ -3,68 +3,126 @@ from __future__ import annotations  # Отложенная оценка анно
 from telegram import Update  # Обновление Telegram
 from telegram.ext import ContextTypes, CallbackQueryHandler, CommandHandler  # Хендлеры и контекст
 
-from ..database import SessionLocal  # Сессии БД
-from ..services.cart_service import CartService  # Сервис корзины
-from ..services.catalog_service import CatalogService  # (опционально) сервис каталога
-from ..keyboards import cart_kb  # Клавиатура корзины
+from ..database import ReadSessionLocal  # Сессии БД только для чтения (запись — через write_queue)
+from ..config import settings  # Окно накопления нажатий
+from ..services.cart_service import CartService, user_id_cache  # Сервис корзины и кэш ID пользователей
+from ..services.cart_buffer import CartWriteBuffer, QtyDeltas  # Накопитель нажатий ➖/➕
+from ..services.write_queue import write_queue  # Писатель с групповым commit
+from ..services.catalog_service import CatalogService  # Сервис каталога (цены из кэша)
+from ..keyboards import cart_kb, cart_items_from_kb  # Клавиатура корзины и её разбор
 
 async def cmd_cart(update: Update, context: ContextTypes.DEFAULT_TYPE):  # /cart — показать корзину
     tg_id = update.effective_user.id  # Telegram ID пользователя
-    async with SessionLocal() as session:  # Открываем сессию БД
-        cart = CartService(session)  # Инициализируем сервис корзины
-        user = await cart.ensure_user(tg_id)  # Гарантируем наличие пользователя
-        items = await cart.get_cart(user)  # Получаем содержимое корзины
-        await session.commit()  # Завершаем транзакцию
-    if not items:  # Если корзина пуста
-        text = "Корзина пуста"  # Сообщение пользователю
-        if update.callback_query:  # Вызов из callback
-            await update.callback_query.edit_message_text(text)  # Редактируем сообщение
-        else:  # Команда
-            await update.message.reply_text(text)  # Отвечаем новым сообщением
+    await qty_buffer.flush(tg_id)  # Сначала записываем накопленные нажатия
+    await _reload_cart(update, tg_id)  # Читаем и отрисовываем корзину
+
+async def cb_cart_view(update: Update, context: ContextTypes.DEFAULT_TYPE):  # Кнопка «🛒 Корзина» под товарами и карточкой
+    await update.callback_query.answer()  # Сразу снимаем «часики» с кнопки
+    await cmd_cart(update, context)  # Карточку с фото не трогаем — корзина придёт новым сообщением
+
+async def _reload_cart(update: Update, tg_id: int):  # Прочитать корзину из БД и отрисовать (без сброса накопителя)
+    user_id = await _user_id(tg_id)  # ID пользователя
+    async with ReadSessionLocal() as session:  # Открываем сессию БД только для чтения
+        items = await CartService(session).get_cart(user_id)  # Получаем содержимое корзины
+    await _show_cart(update, [(p.id, p.title, qty, p.price_cents) for p, qty in items])  # Отрисовываем корзину
+
+async def _user_id(tg_id: int) -> int:  # ID пользователя: из кэша, при промахе — upsert через пул записи
+    user_id = user_id_cache.get(tg_id)  # Горячий путь без БД
+    if user_id is None:  # Новый пользователь или холодный кэш
+        user_id = await write_queue.submit(lambda session: CartService(session).resolve_user_id(tg_id))  # Upsert
+    return user_id
+
+async def _show_cart(update: Update, rows: list[tuple[int, str, int, int]]):  # Отрисовать корзину: (id, title, qty, price_cents)
+    if not rows:  # Если корзина пуста
+        await _render(update, "Корзина пуста")  # Сообщение пользователю
         return  # Завершаем хендлер
-    kb = cart_kb([(p.id, p.title, qty) for p, qty in items])  # Сборка клавиатуры корзины
-    total_rub = sum(p.price_cents * qty for p, qty in items) / 100  # Итог в рублях
-    text = f"Ваша корзина. Итого: {total_rub:.2f} ₽"  # Текст итога
-    if update.callback_query:  # Если callback
-        await update.callback_query.edit_message_text(text, reply_markup=kb)  # Редактируем
-    else:  # Иначе новое сообщение
-        await update.message.reply_text(text, reply_markup=kb)
+    kb = cart_kb([(pid, title, qty) for pid, title, qty, _ in rows])  # Сборка клавиатуры корзины
+    total_rub = sum(price * qty for _, _, qty, price in rows) / 100  # Итог в рублях
+    await _render(update, f"Ваша корзина. Итого: {total_rub:.2f} ₽", kb)  # Текст итога и клавиатура
+
+async def _render(update: Update, text: str, kb=None):  # Вывести корзину: правкой сообщения с кнопкой или новым сообщением
+    query = update.callback_query  # Callback, если корзину открыли кнопкой
+    if query and not (query.message and query.message.photo):  # Текстовое сообщение бота — редактируем
+        await query.edit_message_text(text, reply_markup=kb)
+    else:  # Команда или карточка с фото (у неё подпись, а не текст) — новое сообщение
+        await update.effective_message.reply_text(text, reply_markup=kb)
+
+async def _refresh_cart(update: Update, context: ContextTypes.DEFAULT_TYPE, changed: dict[int, int]):  # Перерисовать корзину после изменения позиций
+    message = update.callback_query.message  # Сообщение с клавиатурой корзины
+    items = cart_items_from_kb(message.reply_markup if message else None)  # Позиции из текущей клавиатуры
+    if not changed.keys() <= {pid for pid, _, _ in items}:  # Клавиатура устарела — перечитываем корзину
+        await _reload_cart(update, update.effective_user.id)  # Не cmd_cart: сброс накопителя держит блокировку пользователя
+        return
+    rows: list[tuple[int, str, int, int]] | None = []  # Позиции с новым количеством и ценами из кэша каталога
+    async with ReadSessionLocal() as session:  # Сессия нужна только при промахе кэша
+        catalog = CatalogService(session)  # Сервис каталога
+        for pid, title, item_qty in items:
+            item_qty = changed.get(pid, item_qty)  # Новое количество изменённой позиции
+            if item_qty <= 0:  # Позиция удалена
+                continue
+            product = await catalog.get_product(pid)  # Карточка товара (обычно из кэша)
+            if product is None:  # Товар снят с продажи — цену берём из корзины
+                rows = None
+                break
+            rows.append((pid, title, item_qty, product.price_cents))
+    if rows is None:
+        await _reload_cart(update, update.effective_user.id)
+        return
+    await _show_cart(update, rows)  # Отрисовываем без повторного чтения корзины
 
 async def cb_add(update: Update, context: ContextTypes.DEFAULT_TYPE):  # Кнопка «Добавить в корзину»
     query = update.callback_query  # Callback объект
     tg_id = update.effective_user.id  # ID пользователя
     product_id = int(query.data.split(":")[1])  # Извлекаем ID товара
-    async with SessionLocal() as session:  # Сессия БД
+    await qty_buffer.flush(tg_id)  # Накопленные нажатия применяются раньше нового действия
+
+    async def job(session):  # Мутация для писателя
         cart = CartService(session)  # Сервис корзины
-        user = await cart.ensure_user(tg_id)  # Гарантируем пользователя
-        await cart.add_to_cart(user, product_id, 1)  # Добавляем 1 шт
-        await session.commit()  # Фиксируем изменения
-    await query.answer("Добавлено в корзину")  # Всплывающее уведомление
+        user_id = await cart.resolve_user_id(tg_id)  # ID пользователя (кэш, при первом визите — upsert)
+        return await cart.add_to_cart(user_id, product_id, 1)  # Добавляем 1 шт
+
+    qty = await write_queue.submit(job)  # Фиксируется групповым commit
+    await query.answer(f"Добавлено в корзину ({qty} шт.)")  # Всплывающее уведомление
 
 async def cb_remove(update: Update, context: ContextTypes.DEFAULT_TYPE):  # Кнопка удаления позиции
     query = update.callback_query  # Callback
     tg_id = update.effective_user.id  # ID пользователя
     product_id = int(query.data.split(":")[1])  # ID товара
-    async with SessionLocal() as session:  # Сессия БД
+    await qty_buffer.flush(tg_id)  # Накопленные нажатия применяются раньше удаления
+
+    async def job(session):  # Мутация для писателя
         cart = CartService(session)  # Сервис корзины
-        user = await cart.ensure_user(tg_id)  # Пользователь
-        await cart.remove_from_cart(user, product_id)  # Удаляем позицию
-        await session.commit()  # Фиксируем
-    await cmd_cart(update, context)  # Обновляем отображение корзины
+        user_id = await cart.resolve_user_id(tg_id)  # ID пользователя (кэш, при первом визите — upsert)
+        await cart.remove_from_cart(user_id, product_id)  # Удаляем позицию
+
+    await write_queue.submit(job)  # Фиксируется групповым commit
+    await _refresh_cart(update, context, {product_id: 0})  # Обновляем отображение корзины
 
 async def cb_qty(update: Update, context: ContextTypes.DEFAULT_TYPE):  # Кнопки изменения количества
     query = update.callback_query  # Callback
-    tg_id = update.effective_user.id  # ID пользователя
     _, product_id_str, delta_str = query.data.split(":")  # Парсим payload
-    async with SessionLocal() as session:  # Сессия БД
+    await query.answer()  # Сразу снимаем «часики» с кнопки
+    await qty_buffer.add(update.effective_user.id, int(product_id_str), int(delta_str), (update, context))  # Копим серию нажатий
+
+async def _flush_qty(tg_id: int, deltas: QtyDeltas, payload) -> None:  # Запись серии нажатий одной транзакцией и одна перерисовка
+    update, context = payload  # Последнее нажатие серии
+
+    async def job(session):  # Мутация для писателя
         cart = CartService(session)  # Сервис корзины
-        user = await cart.ensure_user(tg_id)  # Пользователь
-        await cart.change_qty(user, int(product_id_str), int(delta_str))  # Меняем количество
-        await session.commit()  # Фиксируем
-    await cmd_cart(update, context)  # Обновляем корзину
+        user_id = await cart.resolve_user_id(tg_id)  # ID пользователя (кэш, при первом визите — upsert)
+        return {
+            product_id: await cart.change_qty(user_id, product_id, delta, low)  # Меняем количество одним запросом
+            for product_id, (delta, low) in deltas.items()
+        }  # product_id -> новое количество
+
+    changed = await write_queue.submit(job)  # Фиксируется групповым commit
+    await _refresh_cart(update, context, changed)  # Обновляем корзину
+
+qty_buffer = CartWriteBuffer(settings.cart_coalesce_window, _flush_qty)  # Общий накопитель нажатий процесса
 
 handlers = [  # Регистрируемые хендлеры
     CommandHandler("cart", cmd_cart),  # Команда /cart
+    CallbackQueryHandler(cb_cart_view, pattern=r"^cart:view$"),  # Кнопка «🛒 Корзина» под товарами и карточкой
     CallbackQueryHandler(cb_add, pattern=r"^add:\d+$"),  # Добавить товар
     CallbackQueryHandler(cb_remove, pattern=r"^rem:\d+$"),  # Удалить позицию
     CallbackQueryHandler(cb_qty, pattern=r"^qty:\d+:-?\d+$"),  # Изменить количество
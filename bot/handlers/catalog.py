@@ -3,19 +3,46 @@ from __future__ import annotations  # Отложенная оценка анно
 from telegram import Update, InputMediaPhoto  # Типы обновлений и медиа
 from telegram.ext import ContextTypes, CallbackQueryHandler, CommandHandler  # Хендлеры и контекст
 
-from ..database import SessionLocal  # Фабрика сессий БД
+from ..database import ReadSessionLocal  # Фабрика сессий БД (только чтение)
 from ..services.catalog_service import CatalogService  # Сервис каталога
+from ..services.search_service import SearchService  # Полнотекстовый поиск
+from ..services.photo_service import send_product_photo  # Фото по file_id вместо повторного скачивания URL
+from ..services.write_queue import write_queue  # Писатель с групповым commit (запись file_id)
 from ..keyboards import categories_kb, products_kb, product_detail_kb  # Фабрики клавиатур
 from ..logger import logger  # Логгер
+import zlib  # Короткий ключ поискового запроса для callback_data
+
+SEARCH_HISTORY = 5  # Сколько последних запросов пользователя помнить для листания
 
 async def cmd_start(update: Update, context: ContextTypes.DEFAULT_TYPE):  # /start — показываем категории
+    if context.args and context.args[0].startswith("prd_") and context.args[0][4:].isdigit():  # Deep link из inline-режима
+        await show_product(update, int(context.args[0][4:]))
+        return
     await show_categories(update, context)  # Переиспользуем функцию
 
+async def show_product(update: Update, product_id: int):  # Карточка товара новым сообщением
+    async with ReadSessionLocal() as session:  # Сессия БД
+        product = await CatalogService(session).get_product(product_id)  # Из кэша каталога
+    if not product:
+        await update.message.reply_text("Товар не найден")
+        return
+    if product.photo_url:  # Фото с подписью
+        await send_product_photo(
+            product,
+            lambda photo: update.message.reply_photo(photo, caption=_product_text(product), reply_markup=product_detail_kb(product.id)),
+            write_queue,
+        )
+    else:
+        await update.message.reply_text(_product_text(product), reply_markup=product_detail_kb(product.id))
+
+def _product_text(product) -> str:  # Текст карточки товара
+    return f"{product.title}\n\n{product.description}\n\nЦена: {product.price_cents/100:.2f} ₽"
+
 async def cmd_catalog(update: Update, context: ContextTypes.DEFAULT_TYPE):  # /catalog — показываем категории
     await show_categories(update, context)  # Переиспользуем функцию
 
 async def show_categories(update: Update, context: ContextTypes.DEFAULT_TYPE):  # Универсальный показ категорий
-    async with SessionLocal() as session:  # Открываем сессию БД
+    async with ReadSessionLocal() as session:  # Открываем сессию БД
         service = CatalogService(session)  # Инициализируем сервис
         cats = await service.list_categories()  # Получаем список категорий
         kb = categories_kb([(c.id, c.name) for c in cats])  # Сборка клавиатуры
@@ -30,7 +57,7 @@ async def cb_open_category(update: Update, context: ContextTypes.DEFAULT_TYPE):
     _, cat_id_str = query.data.split(":")  # Разбираем payload
     cat_id = int(cat_id_str)  # Ид категории
     page = 1  # Начинаем с первой страницы
-    async with SessionLocal() as session:  # Сессия БД
+    async with ReadSessionLocal() as session:  # Сессия БД
         service = CatalogService(session)  # Сервис
         products, total_pages = await service.list_products(cat_id, page)  # Товары и число страниц
         kb = products_kb([(p.id, p.title) for p in products], cat_id, page, total_pages)  # Клавиатура
@@ -38,32 +65,71 @@ async def cb_open_category(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def cb_page(update: Update, context: ContextTypes.DEFAULT_TYPE):  # Пагинация
     query = update.callback_query  # Callback
-    _, what, id_str, page_str = query.data.split(":")  # Разбор payload
+    _, what, id_str, page_str, *cursor = query.data.split(":")  # Разбор payload (курсор keyset необязателен)
     page = int(page_str)  # Страница
+    after_id = before_id = None  # Курсор: a<id> — после товара, b<id> — перед товаром
+    if cursor:
+        direction, anchor = cursor[0][0], int(cursor[0][1:])
+        if direction == "a":
+            after_id = anchor
+        else:
+            before_id = anchor
     if what == "cat":  # Пагинация в категории
         cat_id = int(id_str)  # Категория
-        async with SessionLocal() as session:  # Сессия БД
+        async with ReadSessionLocal() as session:  # Сессия БД
             service = CatalogService(session)  # Сервис
-            products, total_pages = await service.list_products(cat_id, page)  # Получаем соответствующую страницу
+            products, total_pages = await service.list_products(cat_id, page, after_id, before_id)  # Страница по курсору
             kb = products_kb([(p.id, p.title) for p in products], cat_id, page, total_pages)  # Клавиатура
         await query.edit_message_reply_markup(reply_markup=kb)  # Меняем только клавиатуру
+    elif what == "srch":  # Пагинация результатов поиска (по рангу, курсор не нужен)
+        text = context.user_data.get("searches", {}).get(int(id_str))  # Запрос по ключу из кнопки
+        if text is None:  # Запрос вытеснен более новыми
+            await query.answer("Поиск устарел, повторите /search", show_alert=True)
+            return
+        async with ReadSessionLocal() as session:  # Сессия БД
+            products, total_pages = await SearchService(session).search(text, page)  # Страница результатов
+        kb = products_kb([(p.id, p.title) for p in products], int(id_str), page, total_pages, what="srch")  # Клавиатура
+        await query.edit_message_reply_markup(reply_markup=kb)  # Меняем только клавиатуру
+
+def _remember_search(context: ContextTypes.DEFAULT_TYPE, text: str) -> int:  # Сохранить запрос, вернуть ключ для кнопок
+    key = zlib.crc32(text.encode())  # Короткий стабильный ключ (callback_data ограничена 64 байтами)
+    searches = context.user_data.setdefault("searches", {})  # Последние запросы пользователя
+    searches.pop(key, None)
+    searches[key] = text
+    while len(searches) > SEARCH_HISTORY:  # Старые запросы вытесняем
+        searches.pop(next(iter(searches)))
+    return key
+
+async def cmd_search(update: Update, context: ContextTypes.DEFAULT_TYPE):  # /search <запрос> — поиск по названию и описанию
+    text = " ".join(context.args).strip()  # Запрос
+    if not text:
+        await update.message.reply_text("Использование: /search <запрос>")  # Подсказка
+        return
+    async with ReadSessionLocal() as session:  # Сессия БД
+        products, total_pages = await SearchService(session).search(text)  # Первая страница результатов
+    if not products:
+        await update.message.reply_text("Ничего не найдено")
+        return
+    kb = products_kb([(p.id, p.title) for p in products], _remember_search(context, text), 1, total_pages, what="srch")  # Клавиатура
+    await update.message.reply_text(f"Результаты поиска «{text}»:", reply_markup=kb)
 
 async def cb_product_detail(update: Update, context: ContextTypes.DEFAULT_TYPE):  # Карточка товара
     query = update.callback_query  # Callback
     _, product_id_str = query.data.split(":")  # Разбор payload
     product_id = int(product_id_str)  # ID товара
-    async with SessionLocal() as session:  # Сессия БД
+    async with ReadSessionLocal() as session:  # Сессия БД
         service = CatalogService(session)  # Сервис
         product = await service.get_product(product_id)  # Получаем товар
     if not product:  # Если не нашли
         await query.answer("Товар не найден", show_alert=True)  # Показываем алерт
         return  # Выходим
-    text = f"{product.title}\n\n{product.description}\n\nЦена: {product.price_cents/100:.2f} ₽"  # Текст карточки
+    text = _product_text(product)  # Текст карточки
     kb = product_detail_kb(product.id)  # Клавиатура карточки
     if product.photo_url:  # Если есть фото
-        await query.message.edit_media(  # Меняем медиа сообщения
-            media=InputMediaPhoto(media=product.photo_url, caption=text),  # Фото с подписью
-            reply_markup=kb,  # Клавиатура
+        await send_product_photo(  # Первый показ — по URL (Telegram качает фото), дальше — по сохранённому file_id
+            product,
+            lambda photo: query.message.edit_media(media=InputMediaPhoto(media=photo, caption=text), reply_markup=kb),  # Фото с подписью и клавиатура
+            write_queue,
         )
     else:  # Если фото нет
         await query.edit_message_text(text, reply_markup=kb)  # Меняем только текст
@@ -73,5 +139,6 @@ handlers = [  # Список хендлеров для регистрации
     CommandHandler("catalog", cmd_catalog),  # Команда /catalog
     CallbackQueryHandler(cb_open_category, pattern=r"^cat:\d+$"),  # Открыть категорию
     CallbackQueryHandler(cb_product_detail, pattern=r"^prd:\d+$"),  # Карточка товара
-    CallbackQueryHandler(cb_page, pattern=r"^page:cat:\d+:\d+$"),  # Пагинация по категориям
+    CallbackQueryHandler(cb_page, pattern=r"^page:(?:cat|srch):\d+:\d+(?::[ab]\d+)?$"),  # Пагинация по категориям (с курсором keyset) и поиску
+    CommandHandler("search", cmd_search),  # Поиск товаров
 ] 
\ No newline at end of file
@@ -2,11 +2,11 @@ from __future__ import annotations  # Отложенная оценка анно
 
 from telegram import Update, ReplyKeyboardMarkup, KeyboardButton  # Типы обновлений и reply-клавиатура
 from telegram.ext import ContextTypes, CallbackQueryHandler, CommandHandler, MessageHandler, filters  # Хендлеры и фильтры
-import phonenumbers  # Валидация телефонных номеров
 
-from ..database import SessionLocal  # Сессия БД
 from ..services.cart_service import CartService  # Сервис корзины
 from ..services.order_service import OrderService  # Сервис заказов
+from ..services.write_queue import write_queue  # Писатель с групповым commit
+from .cart import qty_buffer  # Накопитель нажатий ➖/➕ корзины
 
 DELIVERY_OPTIONS = ["Курьер", "Самовывоз"]  # Варианты доставки
 
@@ -63,18 +63,22 @@ async def message_router(update: Update, context: ContextTypes.DEFAULT_TYPE):  #
 
 async def create_order_and_confirm(update: Update, context: ContextTypes.DEFAULT_TYPE):  # Создание заказа и подтверждение
     tg_id = update.effective_user.id  # ID пользователя
-    async with SessionLocal() as session:  # Сессия БД
+    await qty_buffer.flush(tg_id)  # Заказ собирается из корзины с учётом всех нажатий
+    data = dict(context.user_data)  # Снимок данных диалога для задания
+
+    async def job(session):  # Мутация для писателя
         cart = CartService(session)  # Сервис корзины
-        user = await cart.ensure_user(tg_id)  # Пользователь
+        user_id = await cart.resolve_user_id(tg_id)  # ID пользователя (кэш, при первом визите — upsert)
         order_service = OrderService(session)  # Сервис заказов
-        order = await order_service.create_order(  # Создаём заказ
-            user,
-            context.user_data["name"],
-            context.user_data["phone"],
-            context.user_data["address"],
-            context.user_data["delivery"],
+        return await order_service.create_order(  # Создаём заказ
+            user_id,
+            data["name"],
+            data["phone"],
+            data["address"],
+            data["delivery"],
         )
-        await session.commit()  # Фиксируем транзакцию
+
+    order = await write_queue.submit(job)  # Фиксируется групповым commit
     await update.message.reply_text(  # Отправляем подтверждение
         f"Заказ оформлен! Номер заказа: {order.order_number}\nСтатус: {order.status}"
     )
@@ -87,6 +91,7 @@ async def _reply(update: Update, text: str, reply_markup=None):  # Утилит
         await update.message.reply_text(text, reply_markup=reply_markup)  # Отвечаем пользователю
 
 def _is_valid_phone(s: str) -> bool:  # Проверка валидности телефона через phonenumbers
+    import phonenumbers  # Импорт при первом телефоне, а не при старте бота (модуль и метаданные тяжёлые)
     try:
         parsed = phonenumbers.parse(s, None)  # Парсим номер
         return phonenumbers.is_valid_number(parsed)  # Проверяем валидность
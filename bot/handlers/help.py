@@ -5,7 +5,7 @@ from telegram.ext import ContextTypes, CommandHandler
 
 async def cmd_help(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(
-        "/catalog — каталог\n/cart — корзина\n/checkout — оформить заказ\n/help — помощь"
+        "/catalog — каталог\n/search <запрос> — поиск товаров\n/cart — корзина\n/checkout — оформить заказ\n/help — помощь"
     )
 
 handlers = [CommandHandler("help", cmd_help)] 
\ No newline at end of file
@@ -0,0 +1,33 @@
+from __future__ import annotations  # Отложенная оценка аннотаций
+
+from telegram import InlineQueryResultArticle, InputTextMessageContent, Update  # Типы inline-режима
+from telegram.ext import ContextTypes, InlineQueryHandler  # Хендлер и контекст
+
+from ..config import settings  # Время кэширования ответа
+from ..keyboards import inline_result_kb  # Кнопка «Открыть в боте»
+from ..services.inline_index import product_index  # Префиксный индекс товаров в памяти
+
+INLINE_PAGE_SIZE = 20  # Результатов в одном ответе (Telegram допускает до 50)
+DESCRIPTION_LIMIT = 100  # Сколько символов описания показывать под названием
+
+async def inline_query(update: Update, context: ContextTypes.DEFAULT_TYPE):  # @bot <запрос> — подсказки товаров на каждое нажатие
+    query = update.inline_query  # Inline-запрос
+    offset = int(query.offset) if query.offset.isdigit() else 0  # next_offset предыдущей страницы
+    await product_index.wait_loaded()  # Первые секунды после старта индекс ещё строится в фоне
+    products, next_offset = product_index.search(query.query, offset, INLINE_PAGE_SIZE)  # Без обращения к БД
+    results = [
+        InlineQueryResultArticle(
+            id=str(p.id),
+            title=p.title,
+            description=f"{p.price_cents/100:.2f} ₽ · {p.description[:DESCRIPTION_LIMIT]}",
+            input_message_content=InputTextMessageContent(f"{p.title}\n\nЦена: {p.price_cents/100:.2f} ₽"),
+            reply_markup=inline_result_kb(context.bot.username, p.id),
+            thumbnail_url=p.photo_url,
+        )
+        for p in products
+    ]
+    await query.answer(  # Ответ одинаков для всех пользователей — Telegram кэширует его по тексту запроса
+        results, cache_time=settings.inline_cache_time, is_personal=False, next_offset=str(next_offset or ""),
+    )
+
+handlers = [InlineQueryHandler(inline_query)]  # Список хендлеров для регистрации
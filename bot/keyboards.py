@@ -4,6 +4,7 @@ from telegram import InlineKeyboardButton, InlineKeyboardMarkup  # Кнопки
 from typing import Iterable  # Типизация коллекций
 
 PAGE_SIZE = 6  # Сколько товаров показывать на одной странице
+ORDERS_PAGE_SIZE = 10  # Сколько заказов показывать в одном сообщении /orders
 
 def categories_kb(categories: Iterable[tuple[int, str]]):  # Клавиатура со списком категорий
     buttons = []  # Список строк кнопок
@@ -17,16 +18,18 @@ def categories_kb(categories: Iterable[tuple[int, str]]):  # Клавиатур
         buttons.append(row)  # Добавляем последнюю строку
     return InlineKeyboardMarkup(buttons)  # Возвращаем разметку
 
-def products_kb(products: list[tuple[int, str]], category_id: int, page: int, total_pages: int):  # Клавиатура списка товаров
+def products_kb(products: list[tuple[int, str]], category_id: int, page: int, total_pages: int, what: str = "cat"):  # Клавиатура списка товаров (категории или поиска)
     buttons = []  # Список строк кнопок
     for prod_id, title in products:  # Для каждого товара
         buttons.append([InlineKeyboardButton(title, callback_data=f"prd:{prod_id}")])  # Кнопка на отдельной строке
     nav = []  # Навигационная строка
+    before = f":b{products[0][0]}" if products else ""  # Курсор keyset: первый товар страницы
+    after = f":a{products[-1][0]}" if products else ""  # Курсор keyset: последний товар страницы
     if page > 1:  # Кнопка назад
-        nav.append(InlineKeyboardButton("◀️", callback_data=f"page:cat:{category_id}:{page-1}"))
+        nav.append(InlineKeyboardButton("◀️", callback_data=f"page:{what}:{category_id}:{page-1}{before}"))
     nav.append(InlineKeyboardButton(f"{page}/{total_pages}", callback_data="noop"))  # Индикатор страницы
     if page < total_pages:  # Кнопка вперёд
-        nav.append(InlineKeyboardButton("▶️", callback_data=f"page:cat:{category_id}:{page+1}"))
+        nav.append(InlineKeyboardButton("▶️", callback_data=f"page:{what}:{category_id}:{page+1}{after}"))
     if nav:  # Если навигация есть
         buttons.append(nav)  # Добавляем строку навигации
     buttons.append([InlineKeyboardButton("🛒 Корзина", callback_data="cart:view")])  # Переход в корзину
@@ -40,6 +43,11 @@ def product_detail_kb(product_id: int):  # Клавиатура карточки
         [InlineKeyboardButton("🛒 Корзина", callback_data="cart:view")],  # Открыть корзину
     ])
 
+def inline_result_kb(bot_username: str, product_id: int):  # Кнопка под товаром, отправленным через inline-режим
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton("🛍 Открыть в боте", url=f"https://t.me/{bot_username}?start=prd_{product_id}")],  # Deep link на карточку
+    ])
+
 def cart_kb(items: list[tuple[int, str, int]]):  # Клавиатура корзины с изменением количества
     buttons = []  # Список строк
     for product_id, title, qty in items:  # Для каждого товара в корзине
@@ -50,4 +58,22 @@ def cart_kb(items: list[tuple[int, str, int]]):  # Клавиатура корз
             InlineKeyboardButton("🗑️", callback_data=f"rem:{product_id}"),  # Удалить из корзины
         ])
     buttons.append([InlineKeyboardButton("✅ Оформить заказ", callback_data="checkout:start")])  # Перейти к оформлению
-    return InlineKeyboardMarkup(buttons)  # Возвращаем клавиатуру 
\ No newline at end of file
+    return InlineKeyboardMarkup(buttons)  # Возвращаем клавиатуру 
+
+def cart_items_from_kb(markup: InlineKeyboardMarkup | None) -> list[tuple[int, str, int]]:  # Позиции корзины из уже отправленной клавиатуры
+    items = []  # (product_id, title, qty)
+    for row in markup.inline_keyboard if markup else ():  # Идём по строкам клавиатуры
+        if len(row) != 4 or not str(row[0].callback_data).startswith("qty:"):  # Строка не позиция корзины
+            continue
+        product_id = int(row[0].callback_data.split(":")[1])  # ID товара из кнопки «➖»
+        title, _, qty = row[1].text.rpartition(": ")  # Подпись «<title>: <qty>»
+        items.append((product_id, title, int(qty)))
+    return items
+
+def orders_kb(filters: str, first_id: int, last_id: int, has_newer: bool, has_older: bool):  # Навигация по списку заказов
+    nav = []  # Навигационная строка
+    if has_newer:  # Более новые заказы
+        nav.append(InlineKeyboardButton("◀️", callback_data=f"ord:{filters}:b{first_id}"))
+    if has_older:  # Более старые заказы
+        nav.append(InlineKeyboardButton("▶️", callback_data=f"ord:{filters}:a{last_id}"))
+    return InlineKeyboardMarkup([nav] if nav else [])  # Возвращаем разметку
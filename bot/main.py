@@ -1,45 +1,128 @@
 from __future__ import annotations  # Включает аннотации будущих версий Python (отложенная оценка типов)
 
 import asyncio  # Модуль для работы с асинхронными задачами
+import secrets  # Секрет вебхука, если не задан
+from urllib.parse import urlsplit  # Путь вебхука из публичного URL
+from telegram import Update  # Типы обновлений (для allowed_updates)
 from telegram.ext import Application, ApplicationBuilder  # Компоненты фреймворка python-telegram-bot
+from telegram.request import HTTPXRequest  # HTTP-слой Bot API
 
 from .config import settings  # Загрузка настроек из окружения
 from .logger import logger  # Глобальный логгер
-from .database import init_models  # Инициализация базы данных (создание таблиц)
+from .database import init_models, ReadSessionLocal, engine, read_engine  # Инициализация базы данных (создание таблиц), сессии чтения и движки
+from .persistence import DatabasePersistence  # user_data в БД (ленивое чтение, запись изменённых)
+from .metrics import metrics, MetricsServer, TimedRequest  # Метрики хендлеров, БД и Bot API
+from .services.catalog_service import catalog_cache  # Кэш каталога (гейджи)
+from .services.cart_service import user_id_cache  # Кэш ID пользователей (гейджи)
+from .services.inline_index import load_product_index  # Префиксный индекс для inline-режима
+from .services.write_queue import write_queue  # Писатель с групповым commit
+from .services.outbox import outbox  # Исходящие уведомления и рассылки
+from .services.stats_service import backfill_sales_rollups  # Догоняющее заполнение сводок продаж
 from .handlers import catalog as catalog_h  # Хендлеры каталога
 from .handlers import cart as cart_h  # Хендлеры корзины
 from .handlers import checkout as checkout_h  # Хендлеры оформления заказа
 from .handlers import admin as admin_h  # Админ-команды
 from .handlers import help as help_h  # Команда помощи
+from .handlers import inline as inline_h  # Inline-режим (@bot <запрос>)
+from .webhook import WebhookServer  # Приём обновлений через вебхук
+from .sharding import UPDATE_PATH, ShardLink, WorkerServer, stop_event, supervise  # Несколько процессов: супервизор и воркеры
+from .update_processor import UserOrderedUpdateProcessor  # Параллельная обработка с порядком по пользователю
 
 async def main_async():  # Точка входа (асинхронная) для запуска бота
     if not settings.bot_token:  # Проверяем, что задан токен бота
         raise RuntimeError("BOT_TOKEN is not set")  # Если нет — падаем с понятной ошибкой
-    await init_models()  # Создаём таблицы БД при старте (если их ещё нет)
+    shard = settings.shard_index >= 0  # Воркер под супервизором: обновления приходят от него, схему он уже привёл
+    primary = settings.shard_index <= 0  # Одиночный бот или воркер 0: фоновые задачи и outbox — в одном процессе
+    webhook = settings.update_mode == "webhook" and not shard  # Режим получения обновлений
+    if webhook and not settings.webhook_url:
+        raise RuntimeError("WEBHOOK_URL is not set")
+    if not shard:
+        await init_models()  # Создаём таблицы БД при старте (если их ещё нет)
+    if settings.group_commit:  # Мутации идут через единственного писателя пачками
+        await write_queue.start()
+    backfill = asyncio.create_task(backfill_sales_rollups(write_queue, settings.stats_backfill_batch)) if primary else None  # Старые заказы — в фоне пачками
+    index_loading = asyncio.create_task(load_product_index(ReadSessionLocal))  # Индекс inline-режима строится в фоне, бот отвечает сразу
 
-    app: Application = ApplicationBuilder().token(settings.bot_token).build()  # Создаём приложение Telegram бота
+    metrics.watch_engine(engine)  # Запросы и время БД по хендлерам
+    metrics.watch_engine(read_engine)
+    processor = UserOrderedUpdateProcessor(settings.update_concurrency)  # Медленный хендлер не держит остальных
+    builder = ApplicationBuilder().token(settings.bot_token).base_url(settings.bot_api_url).concurrent_updates(processor)  # Конструктор приложения Telegram бота
+    builder = builder.request(TimedRequest(HTTPXRequest(connection_pool_size=256)))  # Время вызовов Bot API (пул как у PTB по умолчанию)
+    persistence = DatabasePersistence(write_queue, ReadSessionLocal, settings.persistence_interval)  # Диалог оформления переживает перезапуск
+    builder = builder.persistence(persistence)
+    if webhook or shard:  # Без getUpdates: обновления кладёт сервер вебхука в ограниченную очередь (полная — ответ 429)
+        builder = builder.updater(None).update_queue(asyncio.Queue(maxsize=settings.webhook_queue_size))
+    app: Application = builder.build()  # Создаём приложение Telegram бота
 
-    for h in catalog_h.handlers + cart_h.handlers + checkout_h.handlers + admin_h.handlers + help_h.handlers:  # Регистрируем все хендлеры
-        app.add_handler(h)  # Добавляем хендлер в приложение
+    for h in catalog_h.handlers + cart_h.handlers + checkout_h.handlers + admin_h.handlers + help_h.handlers + inline_h.handlers:  # Регистрируем все хендлеры
+        app.add_handler(metrics.instrument(h))  # Добавляем хендлер в приложение (с замером)
+    for name, source in [
+        ("updates", processor.stats), ("write_queue", write_queue.stats), ("catalog_cache", catalog_cache.stats),
+        ("user_cache", user_id_cache.stats), ("cart_buffer", cart_h.qty_buffer.stats),
+        ("persistence", persistence.stats), ("outbox", outbox.stats),
+    ]:  # Гейджи очередей и кэшей для /metrics и /perf
+        metrics.add_source(name, source)
 
     logger.info("Bot starting...")  # Логируем старт
     
     # Ручное управление жизненным циклом
     await app.initialize()
     await app.start()
-    await app.updater.start_polling(drop_pending_updates=True)
+    if primary:
+        await outbox.start(app.bot)  # Продолжает недоставленное с прошлого запуска
+    stop = stop_event()  # SIGTERM/SIGINT — остановка с дообработкой принятых обновлений
+    server = link = None  # Сервер вебхука (у воркера — приём от супервизора) и связь с супервизором
+    if shard:  # Порты выбирает система, супервизор узнаёт их при регистрации
+        metrics_server = MetricsServer(metrics, "127.0.0.1", 0)  # Проверка живости и сводные метрики супервизора
+    else:
+        metrics_server = MetricsServer(metrics, settings.metrics_listen, settings.metrics_port) if settings.metrics_port else None  # /metrics для Prometheus
+    if metrics_server:
+        await metrics_server.start()
+    if shard:
+        server = WorkerServer(app, UPDATE_PATH, settings.shard_secret, "127.0.0.1", 0)
+        await server.start()
+        link = ShardLink(settings.shard_index, settings.shard_control_port, settings.shard_secret)
+        metrics.add_source("shard", link.stats)
+        await link.start(server.port, metrics_server.port, stop)
+    elif webhook:
+        secret = settings.webhook_secret or secrets.token_urlsafe(32)  # Без секрета любой мог бы слать поддельные обновления
+        server = WebhookServer(app, urlsplit(settings.webhook_url).path or "/", secret, settings.webhook_listen, settings.webhook_port)
+        await server.start()
+        await app.bot.set_webhook(
+            settings.webhook_url, secret_token=secret, allowed_updates=Update.ALL_TYPES, drop_pending_updates=True
+        )
+    else:
+        await app.updater.start_polling(drop_pending_updates=True)
     
     # Ожидание завершения работы
     try:
-        await asyncio.Event().wait()  # Бесконечное ожидание
+        await stop.wait()  # До сигнала остановки
     except KeyboardInterrupt:
-        logger.info("Bot stopping...")
+        pass
     finally:
-        await app.stop()
+        logger.info("Bot stopping...")
+        if backfill:
+            backfill.cancel()  # Продолжится со следующего запуска
+        index_loading.cancel()
+        if server:  # Новые обновления Telegram придержит и доставит повторно
+            await server.stop()
+        if app.updater and app.updater.running:
+            await app.updater.stop()
+        await app.stop()  # Дообрабатываем принятые обновления; user_data пишется через ещё работающего писателя
+        if metrics_server:
+            await metrics_server.stop()
+        await outbox.stop()  # Недоставленное останется в БД
+        await cart_h.qty_buffer.flush_all()  # Дописываем накопленные изменения корзин до остановки
+        await write_queue.stop()  # Дожидаемся записи принятых мутаций
+        if link:
+            await link.stop()  # Последние изменения каталога — соседним воркерам
         await app.shutdown()
 
 def main():  # Синхронная точка входа
-    asyncio.run(main_async())
+    if settings.workers > 1 and settings.shard_index < 0:  # Супервизор: сам обновления не обрабатывает
+        asyncio.run(supervise())
+    else:
+        asyncio.run(main_async())
 
 if __name__ == "__main__":  # Если файл запущен как скрипт
     main()  # Запускаем синхронную точку входа
\ No newline at end of file
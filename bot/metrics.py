@@ -0,0 +1,272 @@
+from __future__ import annotations  # Отложенная оценка аннотаций
+
+import asyncio  # Сервер метрик
+import functools  # Обёртка колбэка хендлера
+from bisect import bisect_left  # Корзина гистограммы
+from collections import Counter  # Ошибки Bot API по методам
+from contextvars import ContextVar  # Замер текущего обновления
+from time import perf_counter  # Замер времени
+from typing import Any, Callable  # Типизация источников
+
+from sqlalchemy import event  # События движка
+from sqlalchemy.ext.asyncio import AsyncEngine  # Асинхронный движок
+from telegram.ext import BaseHandler, CommandHandler  # Хендлеры PTB
+from telegram.request import BaseRequest, RequestData  # HTTP-слой бота
+
+from .logger import logger  # Логгер
+from .webhook import HTTPError, read_request, write_response  # Разбор HTTP (как у вебхука)
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)  # Границы корзин гистограмм (сек)
+BACKGROUND = "background"  # Запросы к БД вне хендлеров: писатель, сброс корзин, фоновые задачи
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"  # Текстовый формат Prometheus
+
+
+class Histogram:  # Гистограмма с фиксированными корзинами: запись — bisect и два сложения
+    __slots__ = ("counts", "count", "sum")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # Последняя корзина — больше всех границ
+        self.count = 0  # Наблюдений
+        self.sum = 0.0  # Сумма значений (сек)
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:  # Оценка квантиля: линейно внутри корзины, как histogram_quantile
+        if not self.count:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                if i == len(BUCKETS):  # За последней границей точнее не скажешь
+                    return BUCKETS[-1]
+                low = BUCKETS[i - 1] if i else 0.0
+                return low + (BUCKETS[i] - low) * (rank - seen) / n
+            seen += n
+        return BUCKETS[-1]
+
+
+class UpdateSample:  # Затраты одного вызова хендлера
+    __slots__ = ("queries", "db_seconds", "api_calls", "api_seconds")
+
+    def __init__(self):
+        self.queries = 0  # Запросов к БД
+        self.db_seconds = 0.0  # Время в БД
+        self.api_calls = 0  # Вызовов Bot API
+        self.api_seconds = 0.0  # Время в Bot API
+
+
+class HandlerStats:  # Накопленные затраты хендлера
+    __slots__ = ("latency", "errors", "queries", "db_seconds", "api_calls", "api_seconds")
+
+    def __init__(self):
+        self.latency = Histogram()  # Время хендлера целиком
+        self.errors = 0  # Исключений
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.api_calls = 0
+        self.api_seconds = 0.0
+
+
+current_sample: ContextVar[UpdateSample | None] = ContextVar("current_sample", default=None)  # Замер хендлера в текущей задаче
+
+
+def handler_label(handler: BaseHandler) -> str:  # Метка хендлера: команда, шаблон callback_data или имя функции
+    if isinstance(handler, CommandHandler):
+        return "|".join(f"/{command}" for command in sorted(handler.commands))
+    pattern = getattr(handler, "pattern", None)
+    if pattern is not None:
+        return getattr(pattern, "pattern", str(pattern))
+    return getattr(handler.callback, "__name__", type(handler).__name__)
+
+
+def _escape(value: str) -> str:  # Значение метки Prometheus
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Metrics:  # Реестр метрик процесса: хендлеры, БД, Bot API и гейджи сервисов
+    def __init__(self):
+        self.handlers: dict[str, HandlerStats] = {}  # Метка -> затраты
+        self.background_queries = 0  # Запросы к БД вне хендлеров
+        self.background_db_seconds = 0.0
+        self.api: dict[str, Histogram] = {}  # Метод Bot API -> время вызова
+        self.api_errors: Counter[str] = Counter()  # Метод -> ответов с ошибкой и сбоев соединения
+        self.sources: dict[str, Callable[[], dict[str, Any]]] = {}  # Имя -> stats() сервиса
+        self._engines: set[int] = set()  # Движки, на события которых уже подписались
+
+    def instrument(self, handler: BaseHandler, label: str | None = None) -> BaseHandler:  # Обернуть колбэк хендлера замером
+        stats = self.handlers.setdefault(label or handler_label(handler), HandlerStats())
+        callback = handler.callback
+
+        @functools.wraps(callback)
+        async def timed(update, context):
+            sample = UpdateSample()
+            token = current_sample.set(sample)  # Запросы к БД и Bot API из этой задачи пишутся в замер
+            started = perf_counter()
+            failed = True
+            try:
+                result = await callback(update, context)
+                failed = False
+                return result
+            finally:
+                current_sample.reset(token)
+                stats.latency.observe(perf_counter() - started)
+                stats.errors += failed
+                stats.queries += sample.queries
+                stats.db_seconds += sample.db_seconds
+                stats.api_calls += sample.api_calls
+                stats.api_seconds += sample.api_seconds
+
+        handler.callback = timed
+        return handler
+
+    def watch_engine(self, engine: AsyncEngine) -> None:  # Подписка на выполнение запросов движком
+        sync_engine = engine.sync_engine
+        if id(sync_engine) in self._engines:  # В профиле default писатель и читатель — один движок
+            return
+        self._engines.add(id(sync_engine))
+
+        @event.listens_for(sync_engine, "before_cursor_execute")
+        def _started(conn, cursor, statement, parameters, context, executemany) -> None:
+            conn.info["query_started"] = perf_counter()
+
+        @event.listens_for(sync_engine, "after_cursor_execute")
+        def _finished(conn, cursor, statement, parameters, context, executemany) -> None:
+            elapsed = perf_counter() - conn.info.pop("query_started", perf_counter())
+            sample = current_sample.get()
+            if sample is None:
+                self.background_queries += 1
+                self.background_db_seconds += elapsed
+            else:
+                sample.queries += 1
+                sample.db_seconds += elapsed
+
+    def observe_api(self, method: str, seconds: float, failed: bool) -> None:  # Вызов Bot API
+        histogram = self.api.get(method)
+        if histogram is None:
+            histogram = self.api[method] = Histogram()
+        histogram.observe(seconds)
+        if failed:
+            self.api_errors[method] += 1
+        sample = current_sample.get()
+        if sample is not None:
+            sample.api_calls += 1
+            sample.api_seconds += seconds
+
+    def add_source(self, name: str, stats: Callable[[], dict[str, Any]]) -> None:  # Гейджи сервиса (stats() очередей, кэшей)
+        self.sources[name] = stats
+
+    def handler_report(self) -> list[tuple[str, int, float, float, float, float, float, int]]:  # Для /perf: (метка, вызовов, p50, p95, запросов, мс БД, мс API на вызов, ошибок), самые затратные сверху
+        rows = []
+        for label, stats in self.handlers.items():
+            n = stats.latency.count
+            if n:
+                rows.append((
+                    label, n, stats.latency.quantile(0.5) * 1000, stats.latency.quantile(0.95) * 1000,
+                    stats.queries / n, stats.db_seconds * 1000 / n, stats.api_seconds * 1000 / n, stats.errors,
+                ))
+        return sorted(rows, key=lambda row: -row[1] * row[2])  # Суммарное время ≈ вызовы × медиана
+
+    def render(self) -> str:  # Текстовый формат Prometheus
+        lines: list[str] = []
+        self._histograms(lines, "bot_handler_seconds", "Handler latency", "handler", {k: v.latency for k, v in self.handlers.items()})
+        lines += ["# HELP bot_handler_errors_total Handler exceptions", "# TYPE bot_handler_errors_total counter"]
+        lines += [f'bot_handler_errors_total{{handler="{_escape(k)}"}} {v.errors}' for k, v in self.handlers.items()]
+        queries = {k: (v.queries, v.db_seconds) for k, v in self.handlers.items()}
+        queries[BACKGROUND] = (self.background_queries, self.background_db_seconds)
+        lines += ["# HELP bot_db_queries_total SQL statements executed", "# TYPE bot_db_queries_total counter"]
+        lines += [f'bot_db_queries_total{{handler="{_escape(k)}"}} {n}' for k, (n, _) in queries.items()]
+        lines += ["# HELP bot_db_seconds_total Time spent executing SQL", "# TYPE bot_db_seconds_total counter"]
+        lines += [f'bot_db_seconds_total{{handler="{_escape(k)}"}} {s:.6f}' for k, (_, s) in queries.items()]
+        self._histograms(lines, "bot_api_seconds", "Bot API request latency", "method", self.api)
+        lines += ["# HELP bot_api_errors_total Failed Bot API requests", "# TYPE bot_api_errors_total counter"]
+        lines += [f'bot_api_errors_total{{method="{_escape(k)}"}} {v}' for k, v in self.api_errors.items()]
+        for name, stats in self.sources.items():
+            for key, value in stats().items():
+                metric = f"bot_{name}_{key}"
+                lines += [f"# TYPE {metric} gauge", f"{metric} {value}"]
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _histograms(lines: list[str], name: str, help_text: str, label: str, histograms: dict[str, Histogram]) -> None:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+        for key, histogram in histograms.items():
+            tag = f'{label}="{_escape(key)}"'
+            cumulative = 0
+            for bound, n in zip(BUCKETS, histogram.counts):
+                cumulative += n
+                lines.append(f'{name}_bucket{{{tag},le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{{tag},le="+Inf"}} {histogram.count}')
+            lines.append(f"{name}_sum{{{tag}}} {histogram.sum:.6f}")
+            lines.append(f"{name}_count{{{tag}}} {histogram.count}")
+
+
+metrics = Metrics()  # Общий реестр процесса
+
+
+class TimedRequest(BaseRequest):  # HTTP-слой бота с замером вызовов Bot API (обёртка над любым BaseRequest)
+    def __init__(self, request: BaseRequest, registry: Metrics = metrics):
+        self.request = request  # Настоящий HTTP-слой
+        self.registry = registry  # Куда писать замеры
+
+    @property
+    def read_timeout(self) -> float | None:
+        return self.request.read_timeout
+
+    async def initialize(self) -> None:
+        await self.request.initialize()
+
+    async def shutdown(self) -> None:
+        await self.request.shutdown()
+
+    async def do_request(self, url: str, method: str, request_data: RequestData | None = None, *args, **kwargs) -> tuple[int, bytes]:
+        started = perf_counter()
+        failed = True
+        try:
+            status, payload = await self.request.do_request(url, method, request_data, *args, **kwargs)
+            failed = status >= 400
+            return status, payload
+        finally:
+            self.registry.observe_api(url.rsplit("/", 1)[-1], perf_counter() - started, failed)
+
+
+class MetricsServer:  # GET /metrics в текстовом формате Prometheus
+    def __init__(self, registry: Metrics = metrics, host: str = "127.0.0.1", port: int = 9100):
+        self.registry = registry  # Реестр метрик
+        self.host = host  # Адрес прослушивания
+        self.port = port  # Порт (0 — любой свободный)
+        self._server: asyncio.Server | None = None
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]  # Фактический порт
+        logger.info("Metrics on http://{}:{}/metrics", self.host, self.port)
+
+    async def stop(self) -> None:
+        if self._server is None:
+            return
+        self._server.close()
+        await self._server.wait_closed()
+        self._server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:  # Один запрос на соединение
+        try:
+            request = await read_request(reader)
+            if request is not None:
+                method, target, _, _ = request
+                if target.split("?", 1)[0] != "/metrics":
+                    write_response(writer, 404, keep_alive=False)
+                elif method != "GET":
+                    write_response(writer, 405, keep_alive=False)
+                else:
+                    body = self.registry.render().encode()
+                    write_response(writer, 200, body, keep_alive=False, headers={"Content-Type": CONTENT_TYPE})
+                await writer.drain()
+        except HTTPError as exc:
+            write_response(writer, exc.status, keep_alive=False)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
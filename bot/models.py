@@ -1,11 +1,15 @@
 from __future__ import annotations  # Отложенная оценка аннотаций
 
-from sqlalchemy import String, Integer, ForeignKey, Boolean, DateTime, UniqueConstraint  # Типы и связи
-from sqlalchemy.orm import Mapped, mapped_column, relationship  # Описание ORM полей и связей
-from datetime import datetime  # Метка времени создания
+from sqlalchemy import String, Integer, ForeignKey, Boolean, Date, DateTime, LargeBinary, UniqueConstraint, Index  # Типы, связи и индексы
+from sqlalchemy import DDL, event, func, insert, literal, select, update, inspect  # События ORM, DDL и конструкторы запросов для счётчиков
+from sqlalchemy.orm import Mapped, mapped_column, relationship, raiseload, Session  # Описание ORM полей и связей, сессия для событий
+from collections import defaultdict  # Накопление изменений счётчиков
+from datetime import date, datetime  # Метка времени создания и день сводки
 
 from .database import Base  # Базовый класс ORM
 
+READ_OPTIONS = (raiseload("*"),)  # Для путей чтения: обращение к незагруженной связи — ошибка, а не скрытый запрос на каждую строку (N+1)
+
 class User(Base):  # Пользователь бота
     __tablename__ = "users"  # Таблица users
     id: Mapped[int] = mapped_column(Integer, primary_key=True)  # PK
@@ -32,11 +36,41 @@ class Product(Base):  # Товар
     description: Mapped[str] = mapped_column(String(2048))  # Описание
     price_cents: Mapped[int] = mapped_column(Integer)  # Цена в копейках
     photo_url: Mapped[str | None] = mapped_column(String(1024), nullable=True)  # URL фото
+    photo_file_id: Mapped[str | None] = mapped_column(String(255), nullable=True)  # file_id фото, уже загруженного в Telegram (сбрасывается при смене URL)
     is_active: Mapped[bool] = mapped_column(Boolean, default=True)  # Активен ли товар
+    sku: Mapped[str | None] = mapped_column(String(64), unique=True, index=True, nullable=True)  # Артикул поставщика (ключ импорта)
 
     category_id: Mapped[int | None] = mapped_column(ForeignKey("categories.id", ondelete="SET NULL"), nullable=True)  # FK на категорию
     category: Mapped[Category | None] = relationship(back_populates="products")  # Объект категории
 
+    __table_args__ = (
+        Index("ix_products_category_active_title", "category_id", "is_active", "title", "id"),  # Keyset-пагинация по (title, id)
+    )
+
+PRODUCTS_FTS_DDL = [  # Полнотекстовый индекс активных товаров (SQLite FTS5, external content) и триггеры синхронизации
+    "CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5("
+    "title, description, content='products', content_rowid='id', "
+    "prefix='2 3', tokenize='unicode61 remove_diacritics 2')",
+    "INSERT INTO products_fts(products_fts, rank) VALUES ('rank', 'bm25(10.0, 1.0)')",  # Совпадение в названии весит больше
+    "CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products WHEN new.is_active BEGIN "
+    "INSERT INTO products_fts(rowid, title, description) VALUES (new.id, new.title, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products WHEN old.is_active BEGIN "
+    "INSERT INTO products_fts(products_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE OF title, description, is_active ON products BEGIN "
+    "INSERT INTO products_fts(products_fts, rowid, title, description) "
+    "SELECT 'delete', old.id, old.title, old.description WHERE old.is_active; "
+    "INSERT INTO products_fts(rowid, title, description) SELECT new.id, new.title, new.description WHERE new.is_active; END",
+]
+
+for _statement in PRODUCTS_FTS_DDL:  # create_all (тесты, бенчмарки) создаёт индекс вместе с таблицей товаров
+    event.listen(Product.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+event.listen(Product.__table__, "before_drop", DDL("DROP TABLE IF EXISTS products_fts").execute_if(dialect="sqlite"))
+
+class CategoryStats(Base):  # Денормализованные счётчики категории (поддерживаются инкрементально)
+    __tablename__ = "category_stats"
+    category_id: Mapped[int] = mapped_column(ForeignKey("categories.id", ondelete="CASCADE"), primary_key=True)  # PK/FK на категорию
+    active_products: Mapped[int] = mapped_column(Integer, default=0)  # Число активных товаров в категории
+
 class CartItem(Base):  # Позиция в корзине
     __tablename__ = "cart_items"
     id: Mapped[int] = mapped_column(Integer, primary_key=True)  # PK
@@ -48,7 +82,10 @@ class CartItem(Base):  # Позиция в корзине
     user: Mapped[User] = relationship(back_populates="cart_items")  # Объект пользователя
     product: Mapped[Product] = relationship()  # Объект товара
 
-    __table_args__ = (UniqueConstraint("user_id", "product_id", name="uq_cart_user_product"),)  # Уникальность пары (user, product)
+    __table_args__ = (
+        UniqueConstraint("user_id", "product_id", name="uq_cart_user_product"),  # Уникальность пары (user, product)
+        Index("ix_cart_items_user_product_qty", "user_id", "product_id", "quantity"),  # Покрывающий индекс чтения корзины
+    )
 
 class Order(Base):  # Заказ
     __tablename__ = "orders"
@@ -67,14 +104,123 @@ class Order(Base):  # Заказ
     user: Mapped[User | None] = relationship(back_populates="orders")  # Объект пользователя
     items: Mapped[list[OrderItem]] = relationship(back_populates="order", cascade="all, delete-orphan")  # Позиции заказа
 
+    __table_args__ = (
+        Index("ix_orders_status_created", "status", "created_at", "id"),  # Список заказов с фильтром по статусу
+        Index("ix_orders_created", "created_at", "id"),  # Список заказов без фильтра (новые сверху)
+    )
+
 class OrderItem(Base):  # Позиция заказа
     __tablename__ = "order_items"
     id: Mapped[int] = mapped_column(Integer, primary_key=True)  # PK
 
-    order_id: Mapped[int] = mapped_column(ForeignKey("orders.id", ondelete="CASCADE"))  # FK на заказ
+    order_id: Mapped[int] = mapped_column(ForeignKey("orders.id", ondelete="CASCADE"), index=True)  # FK на заказ
     product_id: Mapped[int] = mapped_column(ForeignKey("products.id", ondelete="SET NULL"), nullable=True)  # FK на товар (может быть NULL)
     quantity: Mapped[int] = mapped_column(Integer, default=1)  # Количество
     price_cents: Mapped[int] = mapped_column(Integer)  # Цена на момент заказа (в копейках)
 
     order: Mapped[Order] = relationship(back_populates="items")  # Объект заказа
-    product: Mapped[Product | None] = relationship()  # Объект товара (может отсутствовать) 
\ No newline at end of file
+    product: Mapped[Product | None] = relationship()  # Объект товара (может отсутствовать) 
+
+class SalesDaily(Base):  # Сводка продаж по дням (поддерживается инкрементально при создании заказа)
+    __tablename__ = "sales_daily"
+    day: Mapped[date] = mapped_column(Date, primary_key=True)  # День (UTC)
+    orders: Mapped[int] = mapped_column(Integer, default=0)  # Число заказов
+    revenue_cents: Mapped[int] = mapped_column(Integer, default=0)  # Выручка в копейках
+
+class OrderStatusCount(Base):  # Число заказов в каждом статусе
+    __tablename__ = "order_status_counts"
+    status: Mapped[str] = mapped_column(String(32), primary_key=True)  # Статус
+    orders: Mapped[int] = mapped_column(Integer, default=0)  # Число заказов
+
+class ProductSales(Base):  # Продажи по товарам
+    __tablename__ = "product_sales"
+    product_id: Mapped[int] = mapped_column(ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)  # PK/FK на товар
+    units: Mapped[int] = mapped_column(Integer, default=0)  # Продано штук
+    revenue_cents: Mapped[int] = mapped_column(Integer, default=0)  # Выручка в копейках
+
+    __table_args__ = (Index("ix_product_sales_units", "units"),)  # Топ товаров без сортировки всей таблицы
+
+class CategorySales(Base):  # Продажи по категориям (категория товара на момент заказа)
+    __tablename__ = "category_sales"
+    category_id: Mapped[int] = mapped_column(ForeignKey("categories.id", ondelete="CASCADE"), primary_key=True)  # PK/FK на категорию
+    units: Mapped[int] = mapped_column(Integer, default=0)  # Продано штук
+    revenue_cents: Mapped[int] = mapped_column(Integer, default=0)  # Выручка в копейках
+
+    __table_args__ = (Index("ix_category_sales_units", "units"),)  # Топ категорий без сортировки всей таблицы
+
+class RollupState(Base):  # Прогресс догоняющего заполнения сводок
+    __tablename__ = "rollup_state"
+    name: Mapped[str] = mapped_column(String(64), primary_key=True)  # Имя сводки
+    last_id: Mapped[int] = mapped_column(Integer, default=0)  # До какого ID заказа сводка уже заполнена
+    upto_id: Mapped[int] = mapped_column(Integer, default=0)  # Заказы с большим ID учитываются инкрементально
+
+class UserState(Base):  # Состояние диалогов пользователя (context.user_data) для BasePersistence
+    __tablename__ = "user_state"
+    user_id: Mapped[int] = mapped_column(Integer, primary_key=True)  # Telegram ID пользователя
+    data: Mapped[bytes] = mapped_column(LargeBinary)  # pickle словаря user_data
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)  # Когда записано
+
+class Broadcast(Base):  # Рассылка всем пользователям: получатели читаются пачками по users.id, прогресс — курсор
+    __tablename__ = "broadcasts"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)  # PK
+    text: Mapped[str] = mapped_column(String(4096))  # Текст сообщения
+    status: Mapped[str] = mapped_column(String(16), default="running", index=True)  # running | done | cancelled
+    admin_chat_id: Mapped[int | None] = mapped_column(Integer, nullable=True)  # Куда прислать итог
+    last_user_id: Mapped[int] = mapped_column(Integer, default=0)  # Пользователи с ID до этого включительно уже обработаны
+    sent: Mapped[int] = mapped_column(Integer, default=0)  # Доставлено
+    failed: Mapped[int] = mapped_column(Integer, default=0)  # Не доставлено (бот заблокирован, чат удалён)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)  # Когда запущена
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)  # Когда завершена
+
+class OutboxMessage(Base):  # Исходящее сообщение (уведомление), ждущее отправки; удаляется после доставки
+    __tablename__ = "outbox"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)  # PK, порядок отправки
+    chat_id: Mapped[int] = mapped_column(Integer)  # Telegram ID получателя
+    text: Mapped[str] = mapped_column(String(4096))  # Текст сообщения
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)  # Когда поставлено
+
+def _bump_category_counter(connection, category_id: int, delta: int) -> None:  # Изменить счётчик активных товаров категории
+    stats = CategoryStats.__table__  # Таблица счётчиков
+    res = connection.execute(
+        update(stats).where(stats.c.category_id == category_id).values(active_products=stats.c.active_products + delta)
+    )  # Инкремент одним UPDATE
+    if res.rowcount == 0:  # Счётчика ещё нет — считаем один раз по таблице (flush уже выполнен целиком)
+        products = Product.__table__
+        connection.execute(
+            insert(stats).from_select(
+                ["category_id", "active_products"],
+                select(literal(category_id), func.count()).where(
+                    products.c.category_id == category_id, products.c.is_active == True  # noqa: E712
+                ),
+            )
+        )
+
+@event.listens_for(Session, "after_flush")
+def _maintain_category_counters(session: Session, flush_context) -> None:  # Переносим изменения товаров в счётчики категорий
+    deltas: dict[int, int] = defaultdict(int)  # category_id -> изменение числа активных товаров
+    for obj in session.new:  # Новые товары
+        if isinstance(obj, Product) and obj.is_active and obj.category_id is not None:
+            deltas[obj.category_id] += 1
+    for obj in session.deleted:  # Удалённые товары
+        if isinstance(obj, Product) and obj.is_active and obj.category_id is not None:
+            deltas[obj.category_id] -= 1
+    for obj in session.dirty:  # Изменённые товары: смена категории/активности
+        if not isinstance(obj, Product):
+            continue
+        state = inspect(obj)  # Состояние объекта с историей изменений
+        cat_hist = state.attrs.category_id.history  # История category_id
+        act_hist = state.attrs.is_active.history  # История is_active
+        if not cat_hist.has_changes() and not act_hist.has_changes():  # Счётчики не затронуты
+            continue
+        old_cat = cat_hist.deleted[0] if cat_hist.deleted else obj.category_id  # Прежняя категория
+        old_active = act_hist.deleted[0] if act_hist.deleted else obj.is_active  # Прежняя активность
+        if old_active and old_cat is not None:
+            deltas[old_cat] -= 1
+        if obj.is_active and obj.category_id is not None:
+            deltas[obj.category_id] += 1
+    if not deltas:
+        return
+    connection = session.connection()  # Соединение текущей транзакции
+    for category_id, delta in deltas.items():
+        if delta:
+            _bump_category_counter(connection, category_id, delta)
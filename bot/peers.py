@@ -0,0 +1,25 @@
+from __future__ import annotations  # Отложенная оценка аннотаций
+
+from typing import Any, Callable  # Типизация подписчиков
+
+CATALOG = "catalog"  # Инвалидированы теги кэша каталога: payload — кортеж тегов
+INDEX = "index"  # Изменились товары inline-индекса: payload — (снимки, удалённые ID)
+OUTBOX = "outbox"  # В outbox появились сообщения или рассылка: payload — None
+
+Subscriber = Callable[[str, Any], None]  # (вид события, данные)
+
+_subscribers: list[Subscriber] = []  # Без шардирования пусто — публикация ничего не стоит
+
+
+def subscribe(callback: Subscriber) -> None:  # Получать изменения, закоммиченные этим процессом (воркер шардирования пересылает их соседям)
+    _subscribers.append(callback)
+
+
+def unsubscribe(callback: Subscriber) -> None:
+    if callback in _subscribers:
+        _subscribers.remove(callback)
+
+
+def publish(kind: str, payload: Any = None) -> None:  # Вызывается после commit, когда локальные кэши уже обновлены
+    for callback in list(_subscribers):
+        callback(kind, payload)
@@ -0,0 +1,128 @@
+from __future__ import annotations  # Отложенная оценка аннотаций
+
+import asyncio  # Фоновая запись
+import pickle  # Сериализация user_data (как PicklePersistence)
+from datetime import datetime  # Метка записи
+from typing import Any  # Типизация user_data
+
+from sqlalchemy import delete, select  # Чтение и удаление строк
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker  # Сессии
+from telegram.ext import BasePersistence, PersistenceInput  # Точка расширения PTB
+
+from .database import dialect_insert  # INSERT ... ON CONFLICT
+from .logger import logger  # Логгер
+from .models import UserState  # Таблица состояний
+from .services.write_queue import WriteQueue  # Писатель с групповым commit
+
+UserData = dict[Any, Any]  # context.user_data
+
+
+class DatabasePersistence(BasePersistence[UserData, dict, dict]):  # user_data в таблице user_state: строка на пользователя, пишутся только изменившиеся
+    def __init__(self, writer: WriteQueue, read_sessions: async_sessionmaker, update_interval: float = 5.0):
+        super().__init__(PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False), update_interval)
+        self.writer = writer  # Запись пачкой изменений одним заданием писателя
+        self.read_sessions = read_sessions  # Ленивое чтение состояния пользователя
+        self._saved: dict[int, int] = {}  # ID -> хэш записанного состояния (0 — строки нет); есть ключ — пользователь уже загружен
+        self._dirty: dict[int, bytes | None] = {}  # ID -> новое состояние для записи (None — удалить строку)
+        self._writer: asyncio.Task | None = None  # Идущая запись
+        self.writes = 0  # Записано строк (вставлено/обновлено/удалено)
+        self.flushes = 0  # Транзакций записи
+
+    async def get_user_data(self) -> dict[int, UserData]:  # При старте ничего не читаем: состояние подгружается в refresh_user_data
+        return {}
+
+    async def refresh_user_data(self, user_id: int, user_data: UserData) -> None:  # Перед обработкой обновления: первое обращение — читаем строку
+        if user_id in self._saved:
+            return
+        async with self.read_sessions() as session:
+            blob = (await session.execute(select(UserState.data).where(UserState.user_id == user_id))).scalar_one_or_none()
+        if user_id in self._saved:  # Пока читали, состояние уже загрузило параллельное обновление (PTB вызывает refresh для каждого)
+            return
+        self._saved[user_id] = hash(blob) if blob else 0
+        if blob:
+            user_data.update(pickle.loads(blob))
+
+    async def update_user_data(self, user_id: int, data: UserData) -> None:  # PTB раз в update_interval отдаёт копии данных затронутых пользователей
+        blob = pickle.dumps(data, pickle.HIGHEST_PROTOCOL) if data else None
+        if self._saved.get(user_id, -1) == (hash(blob) if blob else 0):  # Не изменилось (обычный случай: пользователь просто листал каталог)
+            self._dirty.pop(user_id, None)
+            return
+        self._dirty[user_id] = blob
+        self._schedule()
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self._dirty[user_id] = None
+        self._schedule()
+
+    async def flush(self) -> None:  # Остановка приложения: дописать всё накопленное
+        if self._writer:
+            await asyncio.shield(self._writer)
+        await self._write()
+
+    def stats(self) -> dict[str, int]:  # Счётчики для отчётов и метрик
+        return {"loaded_users": len(self._saved), "dirty": len(self._dirty), "writes": self.writes, "flushes": self.flushes}
+
+    def _schedule(self) -> None:  # Изменения одного прохода PTB собираются и пишутся одной транзакцией
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.get_running_loop().create_task(self._write())
+
+    async def _write(self) -> None:
+        while self._dirty:
+            batch, self._dirty = self._dirty, {}
+            now = datetime.utcnow()
+            upserts = [{"user_id": user_id, "data": blob, "updated_at": now} for user_id, blob in batch.items() if blob]
+            deleted = [user_id for user_id, blob in batch.items() if not blob]
+
+            async def job(session: AsyncSession) -> None:
+                if upserts:
+                    stmt = dialect_insert(session, UserState)
+                    stmt = stmt.on_conflict_do_update(
+                        index_elements=[UserState.user_id], set_={"data": stmt.excluded.data, "updated_at": stmt.excluded.updated_at}
+                    )
+                    await session.execute(stmt, upserts)  # executemany
+                if deleted:
+                    await session.execute(delete(UserState).where(UserState.user_id.in_(deleted)))
+
+            try:
+                await self.writer.submit(job)
+            except Exception:  # Вернём в очередь, кроме того, что успело измениться заново; следующая попытка — в следующем проходе PTB
+                logger.exception("Persisting user_data failed for {} users", len(batch))
+                self._dirty = {**batch, **self._dirty}
+                return
+            for user_id, blob in batch.items():
+                self._saved[user_id] = hash(blob) if blob else 0
+            self.writes += len(batch)
+            self.flushes += 1
+
+    async def get_chat_data(self) -> dict[int, dict]:
+        return {}
+
+    async def get_bot_data(self) -> dict:
+        return {}
+
+    async def get_callback_data(self) -> None:
+        return None
+
+    async def get_conversations(self, name: str) -> dict:
+        return {}
+
+    async def update_conversation(self, name: str, key, new_state) -> None:
+        pass
+
+    async def update_chat_data(self, chat_id: int, data: dict) -> None:
+        pass
+
+    async def update_bot_data(self, data: dict) -> None:
+        pass
+
+    async def update_callback_data(self, data) -> None:
+        pass
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data: dict) -> None:
+        pass
@@ -0,0 +1,55 @@
+from __future__ import annotations  # Отложенная оценка аннотаций
+
+from collections import Counter  # Повторяющиеся запросы
+from typing import Iterable  # Типизация набора движков
+
+from sqlalchemy import event  # События движка
+from sqlalchemy.engine import Engine  # Синхронный движок
+from sqlalchemy.ext.asyncio import AsyncEngine  # Асинхронный движок
+
+MAX_SQL_SHOWN = 300  # Сколько символов запроса показывать в отчёте
+
+
+class QueryBudgetExceeded(AssertionError):  # Блок выполнил больше запросов, чем разрешено
+    pass
+
+
+class QueryBudget:  # Счётчик SQL-запросов движков внутри блока with; при превышении — ошибка со списком запросов
+    def __init__(self, engines: AsyncEngine | Engine | Iterable[AsyncEngine | Engine], limit: int, label: str = "block"):
+        engines = [engines] if isinstance(engines, (AsyncEngine, Engine)) else list(engines)
+        self.engines = list({id(e): e for e in (getattr(e, "sync_engine", e) for e in engines)}.values())  # Писатель и читатель могут совпадать
+        self.limit = limit  # Разрешённое число запросов
+        self.label = label  # Что меряем (для отчёта)
+        self.statements: list[str] = []  # Выполненные запросы по порядку (executemany — один запрос)
+
+    def __enter__(self) -> QueryBudget:
+        for engine in self.engines:
+            event.listen(engine, "before_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        for engine in self.engines:
+            event.remove(engine, "before_cursor_execute", self._record)
+        if exc_type is None and len(self.statements) > self.limit:
+            raise QueryBudgetExceeded(self.report())
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        self.statements.append(statement)
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def report(self) -> str:  # Текст отчёта: запросы по порядку, повторы отмечены как вероятный N+1
+        repeats = Counter(self.statements)
+        lines = [f"{self.label}: {self.count} SQL statements, budget {self.limit}"]
+        for i, statement in enumerate(self.statements, 1):
+            sql = " ".join(statement.split())
+            sql = sql if len(sql) <= MAX_SQL_SHOWN else sql[:MAX_SQL_SHOWN] + "..."
+            mark = f"  [x{repeats[statement]}, possible N+1]" if repeats[statement] > 1 else ""
+            lines.append(f"{i:>3}. {sql}{mark}")
+        return "\n".join(lines)
+
+
+def query_budget(engines: AsyncEngine | Engine | Iterable[AsyncEngine | Engine], limit: int, label: str = "block") -> QueryBudget:  # with query_budget(engine, 2): ...
+    return QueryBudget(engines, limit, label)
@@ -4,6 +4,8 @@ from sqlalchemy import select  # Конструктор SELECT
 from sqlalchemy.ext.asyncio import AsyncSession  # Асинхронная сессия
 
 from ..models import Category, Product, User  # ORM-модели
+from .catalog_service import CATEGORIES_TAG, ProductCard, category_tag, product_tag, mark_catalog_changed  # Инвалидация кэша каталога
+from .inline_index import mark_index_changed  # Обновление префиксного индекса inline-режима
 
 class AdminService:  # Сервис административных операций
     def __init__(self, session: AsyncSession, admin_ids: list[int]):  # Принимает сессию и список ID админов
@@ -17,6 +19,7 @@ class AdminService:  # Сервис административных опера
         category = Category(name=name)  # Создаём запись категории
         self.session.add(category)  # Добавляем в сессию
         await self.session.flush()  # Фиксируем для получения id
+        mark_catalog_changed(self.session, CATEGORIES_TAG)  # Список категорий устареет после commit
         return category  # Возвращаем категорию
 
     async def add_product(
@@ -35,6 +38,7 @@ class AdminService:  # Сервис административных опера
                 category = Category(name=category_name)
                 self.session.add(category)
                 await self.session.flush()
+                mark_catalog_changed(self.session, CATEGORIES_TAG)  # Появилась новая категория
         product = Product(
             title=title,
             description=description,
@@ -45,6 +49,8 @@ class AdminService:  # Сервис административных опера
         )  # Собираем объект товара
         self.session.add(product)  # Добавляем в сессию
         await self.session.flush()  # Фиксируем для присвоения id
+        mark_catalog_changed(self.session, category_tag(product.category_id), product_tag(product.id))  # Страницы категории и карточка
+        mark_index_changed(self.session, [ProductCard.from_model(product)])  # Товар появится в inline-поиске после commit
         return product  # Возвращаем товар
 
     async def edit_product(self, product_id: int, field: str, value: str) -> bool:  # Редактировать товар
@@ -52,6 +58,7 @@ class AdminService:  # Сервис административных опера
         product = res.scalar_one_or_none()  # Товар или None
         if not product:  # Если не найден — False
             return False
+        tags = {product_tag(product.id), category_tag(product.category_id)}  # Карточка и страницы категории: страницы кэшируют полные снимки товаров
         if field == "title":  # Изменение названия
             product.title = value
         elif field == "description":  # Изменение описания
@@ -67,9 +74,17 @@ class AdminService:  # Сервис административных опера
                 category = Category(name=value)
                 self.session.add(category)
                 await self.session.flush()
+                tags.add(CATEGORIES_TAG)  # Появилась новая категория
             product.category_id = category.id  # Привязываем к товару
+            tags.add(category_tag(category.id))  # Новая категория товара
         elif field == "photo":  # Изменение фото
             product.photo_url = value
+            product.photo_file_id = None  # Загруженное в Telegram фото больше не то
         else:  # Неизвестное поле
             return False
+        mark_catalog_changed(self.session, *tags)  # Инвалидируем кэш каталога после commit
+        if product.is_active:  # Inline-поиск: новый снимок товара или удаление скрытого
+            mark_index_changed(self.session, [ProductCard.from_model(product)])
+        else:
+            mark_index_changed(self.session, removed=[product.id])
         return True  # Успех 
\ No newline at end of file
@@ -0,0 +1,76 @@
+from __future__ import annotations  # Отложенная оценка аннотаций
+
+import asyncio  # Таймеры и блокировки
+from typing import Any, Awaitable, Callable  # Типизация колбэка сброса
+
+from ..logger import logger  # Логгер
+
+QtyDeltas = dict[int, tuple[int, int]]  # product_id -> (суммарная дельта, минимальная промежуточная сумма)
+FlushCallback = Callable[[int, QtyDeltas, Any], Awaitable[None]]  # (tg_id, дельты, последний payload)
+
+
+class CartWriteBuffer:  # Накопитель изменений количества: серия нажатий ➖/➕ сливается в одну запись и одну перерисовку
+    def __init__(self, window: float, flush: FlushCallback):  # Окно накопления (сек) и функция записи/перерисовки
+        self.window = window  # 0 — без накопления, сразу в БД
+        self._flush = flush  # Колбэк сброса
+        self._pending: dict[int, QtyDeltas] = {}  # Накопленные дельты по пользователям
+        self._payloads: dict[int, Any] = {}  # Последний payload (update) пользователя для перерисовки
+        self._timers: dict[int, asyncio.TimerHandle] = {}  # Отложенные сбросы
+        self._locks: dict[int, asyncio.Lock] = {}  # Сбросы одного пользователя идут строго по очереди
+        self._waiters: dict[int, int] = {}  # Сколько сбросов ждут/держат блокировку пользователя
+        self.presses = 0  # Принято нажатий
+        self.flushes = 0  # Выполнено сбросов (транзакций и перерисовок)
+
+    async def add(self, key: int, product_id: int, delta: int, payload: Any = None) -> None:  # Учесть нажатие
+        deltas = self._pending.setdefault(key, {})  # Дельты пользователя
+        net, low = deltas.get(product_id, (0, 0))  # Текущая сумма и минимум
+        net += delta
+        deltas[product_id] = (net, min(low, net))  # Минимум нужен, чтобы «➖ до нуля, потом ➕» удаляло позицию, как при поштучной записи
+        self._payloads[key] = payload  # Перерисовываем по последнему нажатию
+        self.presses += 1
+        if self.window <= 0:  # Накопление выключено
+            await self.flush(key)
+        elif key not in self._timers:  # Первое нажатие серии — планируем сброс
+            loop = asyncio.get_running_loop()
+            self._timers[key] = loop.call_later(self.window, self._schedule_flush, key)
+
+    def _schedule_flush(self, key: int) -> None:  # Срабатывание таймера
+        self._timers.pop(key, None)
+        asyncio.ensure_future(self._flush_logged(key))
+
+    async def _flush_logged(self, key: int) -> None:  # Фоновый сброс: ошибки только логируем
+        try:
+            await self.flush(key)
+        except Exception:
+            logger.exception("Cart buffer flush failed for {}", key)
+
+    async def flush(self, key: int) -> None:  # Немедленно записать накопленное для пользователя (перед чтением корзины)
+        timer = self._timers.pop(key, None)  # Отменяем отложенный сброс
+        if timer:
+            timer.cancel()
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        try:
+            async with lock:  # Дожидаемся сброса, уже идущего в фоне
+                deltas = self._pending.pop(key, None)
+                payload = self._payloads.pop(key, None)
+                if deltas:
+                    deltas = {pid: d for pid, d in deltas.items() if d != (0, 0)}  # Взаимно погасившиеся нажатия
+                if deltas:
+                    self.flushes += 1
+                    await self._flush(key, deltas, payload)
+        finally:
+            self._waiters[key] -= 1
+            if not self._waiters[key]:  # Больше никто не ждёт — освобождаем блокировку пользователя
+                del self._waiters[key]
+                self._locks.pop(key, None)
+
+    async def flush_all(self) -> None:  # Записать всё накопленное (остановка бота)
+        for key in list(self._pending):
+            try:
+                await self.flush(key)
+            except Exception:
+                logger.exception("Cart buffer flush failed for {}", key)
+
+    def stats(self) -> dict[str, int]:  # Счётчики для отчётов
+        return {"presses": self.presses, "flushes": self.flushes, "pending_users": len(self._pending)}
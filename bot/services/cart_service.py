@@ -1,54 +1,85 @@
 from __future__ import annotations  # Отложенная оценка аннотаций
 
-from sqlalchemy import select, delete  # Конструкторы SELECT и DELETE
+from sqlalchemy import select, delete, update, case  # Конструкторы SELECT, DELETE, UPDATE и CASE
 from sqlalchemy.ext.asyncio import AsyncSession  # Асинхронная сессия
 
-from ..models import CartItem, Product, User  # ORM-модели корзины, товара и пользователя
+from ..cache import LRUCache  # Ограниченный LRU-кэш
+from ..config import settings  # Размер кэша пользователей
+from ..database import call_after_commit, dialect_insert  # Колбэки после commit и INSERT ... ON CONFLICT
+from ..models import READ_OPTIONS, CartItem, Product, User  # ORM-модели корзины, товара и пользователя, опции чтения
+
+user_id_cache = LRUCache(settings.user_cache_size)  # Общий для процесса кэш tg_id -> users.id
+
+def user_id_of(user: User | int) -> int:  # Внутренний ID пользователя из объекта или готового ID
+    return user if isinstance(user, int) else user.id
 
 class CartService:  # Сервис работы с корзиной
     def __init__(self, session: AsyncSession):  # Принимаем асинхронную сессию
         self.session = session  # Сохраняем сессию
 
-    async def ensure_user(self, tg_id: int) -> User:  # Гарантируем наличие пользователя в БД
-        res = await self.session.execute(select(User).where(User.tg_id == tg_id))  # Ищем пользователя по Telegram ID
-        user = res.scalar_one_or_none()  # Получаем пользователя или None
-        if not user:  # Если нет — создаём
-            user = User(tg_id=tg_id)  # Новый пользователь
-            self.session.add(user)  # Добавляем в сессию
-            await self.session.flush()  # Фиксируем для получения id
-        return user  # Возвращаем пользователя
+    async def resolve_user_id(self, tg_id: int) -> int:  # users.id по Telegram ID; пользователь создаётся при первом обращении
+        user_id = user_id_cache.get(tg_id)  # Горячий путь: без запросов к БД
+        if user_id is not None:
+            return user_id
+        stmt = (
+            dialect_insert(self.session, User)
+            .values(tg_id=tg_id)
+            .on_conflict_do_nothing(index_elements=[User.tg_id])
+            .returning(User.id)
+        )  # Один upsert: вставка или ничего, если пользователь уже есть (в т.ч. создан параллельным апдейтом)
+        user_id = (await self.session.execute(stmt)).scalar_one_or_none()
+        if user_id is None:  # Конфликт — пользователь уже есть (или вставлен раньше в этой же транзакции), читаем его ID
+            res = await self.session.execute(select(User.id).where(User.tg_id == tg_id))
+            user_id = res.scalar_one()
+        call_after_commit(self.session, lambda: user_id_cache.set(tg_id, user_id))  # Кэшируем только после commit: откат не оставит в кэше чужой ID
+        return user_id
 
-    async def add_to_cart(self, user: User, product_id: int, qty: int = 1) -> None:  # Добавить товар в корзину
-        res = await self.session.execute(
-            select(CartItem).where(CartItem.user_id == user.id, CartItem.product_id == product_id)  # Ищем позицию в корзине
-        )
-        item = res.scalar_one_or_none()  # Позиция или None
-        if item:  # Если позиция уже есть — увеличиваем количество
-            item.quantity = max(1, item.quantity + qty)  # Не опускаемся ниже 1
-        else:  # Иначе добавляем новую позицию
-            self.session.add(CartItem(user_id=user.id, product_id=product_id, quantity=max(1, qty)))  # Добавляем новую запись
+    async def ensure_user(self, tg_id: int) -> User:  # Гарантируем наличие пользователя в БД и возвращаем ORM-объект
+        user_id = await self.resolve_user_id(tg_id)  # ID через кэш/upsert
+        return await self.session.get(User, user_id)  # Загружаем объект пользователя
 
-    async def change_qty(self, user: User, product_id: int, delta: int) -> None:  # Изменить количество позиции
-        res = await self.session.execute(
-            select(CartItem).where(CartItem.user_id == user.id, CartItem.product_id == product_id)  # Находим позицию
+    async def add_to_cart(self, user: User | int, product_id: int, qty: int = 1) -> int:  # Добавить товар в корзину, вернуть новое количество
+        new_qty = case((CartItem.quantity + qty < 1, 1), else_=CartItem.quantity + qty)  # Не опускаемся ниже 1
+        stmt = (
+            dialect_insert(self.session, CartItem)
+            .values(user_id=user_id_of(user), product_id=product_id, quantity=max(1, qty))  # Новая позиция
+            .on_conflict_do_update(index_elements=[CartItem.user_id, CartItem.product_id], set_={"quantity": new_qty})  # uq_cart_user_product
+            .returning(CartItem.quantity)
+        )  # Один атомарный upsert вместо SELECT + изменения в Python
+        return (await self.session.execute(stmt)).scalar_one()
+
+    async def change_qty(self, user: User | int, product_id: int, delta: int, low: int | None = None) -> int:  # Изменить количество, вернуть новое (0 — позиции нет)
+        low = min(delta, 0) if low is None else low  # Минимальная промежуточная сумма серии нажатий (для одиночного — сама дельта)
+        where = (CartItem.user_id == user_id_of(user), CartItem.product_id == product_id)  # Позиция корзины
+        new_qty = case((CartItem.quantity + low <= 0, 0), else_=CartItem.quantity + delta)  # Серия, прошедшая через ноль, удаляет позицию
+        stmt = (
+            update(CartItem)
+            .where(*where)
+            .values(quantity=new_qty)  # Инкремент на стороне БД: без гонки при двойном нажатии
+            .returning(CartItem.quantity)
+            .execution_options(synchronize_session=False)
         )
-        item = res.scalar_one_or_none()  # Позиция или None
-        if not item:  # Если позиции нет — ничего не делаем
-            return
-        item.quantity += delta  # Меняем количество
-        if item.quantity <= 0:  # Если стало 0 или меньше — удаляем позицию
-            await self.remove_from_cart(user, product_id)
-
-    async def remove_from_cart(self, user: User, product_id: int) -> None:  # Удалить товар из корзины
+        qty = (await self.session.execute(stmt)).scalar_one_or_none()
+        if qty is None:  # Если позиции нет — ничего не делаем
+            return 0
+        if qty <= 0:  # Если стало 0 или меньше — удаляем позицию (условие защищает от параллельного инкремента)
+            await self.session.execute(
+                delete(CartItem).where(*where, CartItem.quantity <= 0).execution_options(synchronize_session=False)
+            )
+            return 0
+        return qty
+
+    async def remove_from_cart(self, user: User | int, product_id: int) -> None:  # Удалить товар из корзины
         await self.session.execute(
-            delete(CartItem).where(CartItem.user_id == user.id, CartItem.product_id == product_id)  # Удаляем запись
+            delete(CartItem).where(CartItem.user_id == user_id_of(user), CartItem.product_id == product_id)  # Удаляем запись
         )
 
-    async def get_cart(self, user: User) -> list[tuple[Product, int]]:  # Получить содержимое корзины
+    async def get_cart(self, user: User | int) -> list[tuple[Product, int]]:  # Получить содержимое корзины
         res = await self.session.execute(
             select(CartItem, Product).
+            options(*READ_OPTIONS).
             join(Product, Product.id == CartItem.product_id).
-            where(CartItem.user_id == user.id)  # Джоин с товарами для получения данных
+            where(CartItem.user_id == user_id_of(user))  # Джоин с товарами для получения данных
         )
         items: list[tuple[Product, int]] = []  # Список (товар, количество)
         for item, product in res.all():  # Идём по результату
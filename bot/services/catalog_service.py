@@ -1,40 +1,222 @@
 from __future__ import annotations  # Отложенная оценка аннотаций
 
-from sqlalchemy import select, func  # Построители запросов SELECT и агрегаций
+from dataclasses import dataclass  # Неизменяемые снимки записей каталога
+from typing import Any, Hashable  # Типизация ключей кэша
+from sqlalchemy import select, func, event, tuple_, delete, insert, update  # Построители запросов, агрегаций и события ORM
 from sqlalchemy.ext.asyncio import AsyncSession  # Асинхронная сессия SQLAlchemy
+from sqlalchemy.orm import Session  # Синхронная сессия (для подписки на события commit)
 from math import ceil  # Округление вверх для страниц
 
-from ..models import Category, Product  # ORM-модели
+from ..cache import LRUCache  # Ограниченный LRU-кэш
+from ..config import settings  # Размер и TTL кэша
+from ..database import call_after_commit  # Колбэки после успешного commit
+from .. import peers  # Изменения для соседних процессов (шардирование)
+from ..models import READ_OPTIONS, Category, CategoryStats, Product  # ORM-модели и опции чтения
 from ..keyboards import PAGE_SIZE  # Размер страницы каталога
 
+CATEGORIES_TAG = "categories"  # Тег инвалидации списка категорий
+_PENDING_KEY = "catalog_changes"  # Ключ в session.info для накопления изменений до commit
+
+
+def category_tag(category_id: int | None) -> tuple[str, int | None]:  # Тег страниц товаров категории
+    return ("category", category_id)
+
+
+def product_tag(product_id: int) -> tuple[str, int]:  # Тег карточки товара
+    return ("product", product_id)
+
+
+@dataclass(frozen=True, slots=True)
+class CategoryCard:  # Снимок категории, безопасный для переиспользования между сессиями
+    id: int
+    name: str
+
+
+@dataclass(frozen=True, slots=True)
+class ProductCard:  # Снимок товара для списков и карточки
+    id: int
+    title: str
+    description: str
+    price_cents: int
+    photo_url: str | None
+    category_id: int | None
+    photo_file_id: str | None = None  # Повторная отправка фото без скачивания URL
+
+    @classmethod
+    def from_model(cls, product: Product) -> ProductCard:  # Построить снимок из ORM-объекта
+        return cls(
+            id=product.id,
+            title=product.title,
+            description=product.description,
+            price_cents=product.price_cents,
+            photo_url=product.photo_url,
+            category_id=product.category_id,
+            photo_file_id=product.photo_file_id,
+        )
+
+
+class CatalogCache:  # Версионированный кэш каталога: запись валидна, пока не изменилась версия её тега
+    def __init__(self, maxsize: int, ttl: float | None = None):  # Размер и TTL (страховка от правок в обход сервиса)
+        self._lru = LRUCache(maxsize, ttl)  # Хранилище: (ключ, версия тега) -> значение
+        self._versions: dict[Hashable, int] = {}  # Текущие версии тегов
+
+    def version(self, tag: Hashable) -> int:  # Текущая версия тега
+        return self._versions.get(tag, 0)
+
+    def get(self, key: Hashable, tag: Hashable) -> Any:  # Значение или None, если нет/устарело
+        return self._lru.get((key, self.version(tag)))  # Устаревшие версии не совпадут и вытеснятся по LRU
+
+    def set(self, key: Hashable, tag: Hashable, value: Any, version: int) -> None:  # Сохранить значение
+        if version != self.version(tag):  # Пока читали из БД, тег успели инвалидировать — не кэшируем
+            return
+        self._lru.set((key, version), value)
+
+    def invalidate(self, *tags: Hashable) -> None:  # Инвалидировать все записи с данными тегами
+        for tag in tags:
+            self._versions[tag] = self.version(tag) + 1
+
+    def clear(self) -> None:  # Полный сброс (тесты, ручное обслуживание)
+        self._lru.clear()
+        self._versions.clear()
+
+    def stats(self) -> dict[str, int]:  # Счётчики попаданий/промахов
+        return self._lru.stats()
+
+
+catalog_cache = CatalogCache(settings.catalog_cache_size, settings.catalog_cache_ttl)  # Общий кэш процесса
+
+
+def mark_catalog_changed(session: AsyncSession | Session, *tags: Hashable) -> None:  # Запомнить, что инвалидировать после commit
+    pending = session.info.get(_PENDING_KEY)  # Теги, уже накопленные в текущей транзакции
+    if pending is None:  # Первое изменение в транзакции — регистрируем инвалидацию после commit
+        pending = session.info[_PENDING_KEY] = set()
+
+        def _invalidate() -> None:
+            changed = tuple(session.info.pop(_PENDING_KEY, pending))
+            catalog_cache.invalidate(*changed)
+            peers.publish(peers.CATALOG, changed)
+
+        call_after_commit(session, _invalidate)
+    pending.update(tags)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _discard_catalog_changes(session: Session, transaction) -> None:  # Откат/закрытие без commit — изменений нет
+    if transaction.parent is None:  # Только корневая транзакция
+        session.info.pop(_PENDING_KEY, None)
+
+
 class CatalogService:  # Сервис каталога
-    def __init__(self, session: AsyncSession):  # Принимаем асинхронную сессию БД
+    def __init__(self, session: AsyncSession, cache: CatalogCache | None = None):  # Принимаем асинхронную сессию БД
         self.session = session  # Сохраняем сессию
+        self.cache = cache or catalog_cache  # Кэш каталога (по умолчанию общий)
 
-    async def list_categories(self) -> list[Category]:  # Список категорий
-        stmt = select(Category).order_by(Category.name)  # Запрос категорий с сортировкой по имени
+    async def list_categories(self) -> list[CategoryCard]:  # Список категорий
+        key = (CATEGORIES_TAG,)  # Ключ кэша
+        cached = self.cache.get(key, CATEGORIES_TAG)  # Пробуем кэш
+        if cached is not None:
+            return list(cached)
+        version = self.cache.version(CATEGORIES_TAG)  # Версия до чтения из БД
+        stmt = select(Category.id, Category.name).order_by(Category.name)  # Запрос категорий с сортировкой по имени
         res = await self.session.execute(stmt)  # Выполняем запрос
-        return list(res.scalars().all())  # Возвращаем список объектов Category
+        cats = tuple(CategoryCard(id=row.id, name=row.name) for row in res)  # Снимки категорий
+        self.cache.set(key, CATEGORIES_TAG, cats, version)  # Кэшируем
+        return list(cats)
 
-    async def list_products(self, category_id: int, page: int = 1) -> tuple[list[Product], int]:  # Список товаров с пагинацией
+    async def list_products(
+        self,
+        category_id: int,
+        page: int = 1,
+        after_id: int | None = None,
+        before_id: int | None = None,
+    ) -> tuple[list[ProductCard], int]:  # Список товаров с пагинацией (keyset по (title, id), OFFSET — для старых кнопок)
         page = max(1, page)  # Минимум первая страница
-        total_stmt = select(func.count()).select_from(Product).where(  # Считаем общее число товаров
-            Product.category_id == category_id, Product.is_active == True  # noqa: E712  # Только активные товары категории
-        )
-        total = (await self.session.execute(total_stmt)).scalar_one()  # Получаем число товаров
+        tag = category_tag(category_id)  # Тег инвалидации
+        key = ("page", category_id, page, after_id, before_id)  # Ключ кэша
+        cached = self.cache.get(key, tag)  # Пробуем кэш
+        if cached is not None:
+            products, total_pages = cached
+            return list(products), total_pages
+        version = self.cache.version(tag)  # Версия до чтения из БД
+        total = await self.count_active_products(category_id)  # Число товаров из поддерживаемого счётчика
         total_pages = max(1, ceil(total / PAGE_SIZE))  # Сколько всего страниц
-        offset = (page - 1) * PAGE_SIZE  # Смещение для LIMIT/OFFSET
-        stmt = (
-            select(Product)
-            .where(Product.category_id == category_id, Product.is_active == True)  # noqa: E712  # Фильтр
-            .order_by(Product.title)  # Сортировка по названию
-            .limit(PAGE_SIZE)  # Лимит на страницу
-            .offset(offset)  # Смещение
+        base = select(Product).options(*READ_OPTIONS).where(Product.category_id == category_id, Product.is_active == True)  # noqa: E712  # Фильтр
+        rows: list[Product] = []
+        if after_id is not None or before_id is not None:  # Keyset: продолжаем от граничного товара соседней страницы
+            anchor_id = after_id if after_id is not None else before_id  # ID граничного товара
+            anchor = (select(Product.title).where(Product.id == anchor_id).scalar_subquery(), anchor_id)  # Ключ (title, id) якоря
+            if after_id is not None:  # Следующая страница
+                stmt = base.where(tuple_(Product.title, Product.id) > tuple_(*anchor)).order_by(Product.title, Product.id)
+            else:  # Предыдущая страница: идём назад и разворачиваем
+                stmt = base.where(tuple_(Product.title, Product.id) < tuple_(*anchor)).order_by(Product.title.desc(), Product.id.desc())
+            rows = list((await self.session.execute(stmt.limit(PAGE_SIZE))).scalars())  # Выполняем запрос
+            if before_id is not None:
+                rows.reverse()
+        if not rows:  # Первая страница, старые кнопки без курсора или исчезнувший якорь — LIMIT/OFFSET
+            offset = (page - 1) * PAGE_SIZE  # Смещение для LIMIT/OFFSET
+            stmt = base.order_by(Product.title, Product.id).limit(PAGE_SIZE).offset(offset)  # Сортировка по названию
+            rows = list((await self.session.execute(stmt)).scalars())  # Выполняем запрос
+        products = tuple(ProductCard.from_model(p) for p in rows)  # Снимки товаров
+        self.cache.set(key, tag, (products, total_pages), version)  # Кэшируем страницу
+        return list(products), total_pages  # Список товаров и количество страниц
+
+    async def count_active_products(self, category_id: int) -> int:  # Число активных товаров категории
+        stmt = select(CategoryStats.active_products).where(CategoryStats.category_id == category_id)  # Готовый счётчик
+        total = (await self.session.execute(stmt)).scalar_one_or_none()
+        if total is not None:
+            return total
+        total_stmt = select(func.count()).select_from(Product).where(  # Счётчика нет (категория без товаров) — считаем
+            Product.category_id == category_id, Product.is_active == True  # noqa: E712  # Только активные товары категории
         )
-        res = await self.session.execute(stmt)  # Выполняем запрос
-        return list(res.scalars().all()), total_pages  # Список товаров и количество страниц
+        return (await self.session.execute(total_stmt)).scalar_one()
 
-    async def get_product(self, product_id: int) -> Product | None:  # Получить товар по id
-        stmt = select(Product).where(Product.id == product_id, Product.is_active == True)  # noqa: E712  # Фильтр по id и активности
+    async def get_product(self, product_id: int) -> ProductCard | None:  # Получить товар по id
+        tag = product_tag(product_id)  # Тег инвалидации
+        key = ("product", product_id)  # Ключ кэша
+        cached = self.cache.get(key, tag)  # Пробуем кэш
+        if cached is not None:
+            return cached or None  # False — закэшированное «не найден»
+        version = self.cache.version(tag)  # Версия до чтения из БД
+        stmt = select(Product).options(*READ_OPTIONS).where(Product.id == product_id, Product.is_active == True)  # noqa: E712  # Фильтр по id и активности
         res = await self.session.execute(stmt)  # Выполняем запрос
-        return res.scalar_one_or_none()  # Возвращаем товар или None 
\ No newline at end of file
+        product = res.scalar_one_or_none()  # Товар или None
+        card = ProductCard.from_model(product) if product else None  # Снимок товара
+        self.cache.set(key, tag, card or False, version)  # Кэшируем и отрицательный результат
+        return card
+
+    async def save_photo_file_id(self, product_id: int, photo_url: str, file_id: str) -> bool:  # Запомнить file_id отправленного фото
+        products = Product.__table__  # Core: одно поле без загрузки объекта
+        category_id = (await self.session.execute(
+            update(products)
+            .where(products.c.id == product_id, products.c.photo_url == photo_url)  # URL успели сменить — file_id от старого фото
+            .values(photo_file_id=file_id)
+            .returning(products.c.category_id)
+        )).first()
+        if category_id is None:
+            return False
+        mark_catalog_changed(self.session, product_tag(product_id), category_tag(category_id[0]))  # Карточка и страницы категории получат file_id после commit
+        return True
+
+    async def photos_to_warm(self, category_id: int) -> list[tuple[int, str]]:  # Активные товары категории с фото, ещё не загруженным в Telegram
+        stmt = select(Product.id, Product.photo_url).where(
+            Product.category_id == category_id,
+            Product.is_active == True,  # noqa: E712
+            Product.photo_url.is_not(None),
+            Product.photo_file_id.is_(None),
+        ).order_by(Product.id)
+        return [(row.id, row.photo_url) for row in await self.session.execute(stmt)]
+
+
+async def rebuild_category_stats(session: AsyncSession, category_ids: list[int] | None = None) -> None:  # Пересчитать счётчики категорий
+    stats = CategoryStats.__table__  # Таблица счётчиков
+    counts = (
+        select(Product.category_id, func.count())
+        .where(Product.category_id.is_not(None), Product.is_active == True)  # noqa: E712
+        .group_by(Product.category_id)
+    )  # Подсчёт по таблице товаров
+    if category_ids is None:  # Первичное заполнение: только категории без счётчика
+        counts = counts.where(Product.category_id.not_in(select(stats.c.category_id)))
+    else:  # Точечный пересчёт после массовых изменений
+        await session.execute(delete(stats).where(stats.c.category_id.in_(category_ids)))
+        counts = counts.where(Product.category_id.in_(category_ids))
+    await session.execute(insert(stats).from_select(["category_id", "active_products"], counts))
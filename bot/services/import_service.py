@@ -0,0 +1,241 @@
+from __future__ import annotations  # Отложенная оценка аннотаций
+
+import asyncio  # Разбор CSV в потоке
+import csv  # Разбор CSV
+import json  # Разбор JSON / JSON Lines
+from dataclasses import dataclass, field  # Отчёт об импорте
+from itertools import chain, islice  # Первая строка обратно в поток, пачки записей
+from pathlib import Path  # Путь к файлу
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterator, TextIO  # Типизация потоков строк и колбэков
+
+import aiofiles  # Асинхронное чтение файла
+from sqlalchemy import case, insert, select  # Конструкторы запросов
+from sqlalchemy.ext.asyncio import AsyncSession  # Асинхронная сессия
+
+from ..database import call_after_commit, dialect_insert  # Колбэки после commit и INSERT ... ON CONFLICT
+from ..models import Category, Product  # ORM-модели
+from .catalog_service import (  # Кэш, счётчики и снимки каталога
+    CATEGORIES_TAG, ProductCard, category_tag, mark_catalog_changed, product_tag, rebuild_category_stats,
+)
+from .inline_index import mark_index_changed  # Префиксный индекс inline-режима
+from .write_queue import WriteQueue  # Писатель с групповым commit
+
+READ_CHUNK = 256 * 1024  # Сколько символов читать с диска за раз
+CSV_BATCH = 1000  # Записей CSV, разбираемых в потоке за один переход
+MAX_ERRORS = 10  # Сколько ошибок строк сохранять в отчёте
+PRODUCT_FIELDS = ["sku", "title", "description", "price_cents", "category_id", "photo_url", "is_active"]  # Колонки вставки
+UPSERT_FIELDS = [name for name in PRODUCT_FIELDS if name != "sku"]  # Что обновляется у существующего артикула
+CARD_FIELDS = ["title", "description", "price_cents", "photo_url", "category_id", "photo_file_id"]  # Поля ProductCard после id (в том же порядке)
+FALSE_VALUES = {"0", "false", "no", "нет"}  # Значения «неактивен»
+
+
+def _chunk_lines(f: TextIO) -> Iterator[str]:  # Строки файла, читаемого кусками READ_CHUNK; неполная строка переходит в следующий кусок
+    carry = ""
+    while chunk := f.read(READ_CHUNK):
+        lines = (carry + chunk).split("\n")  # Только \n: прочие разделители Юникода могут быть внутри полей
+        carry = lines.pop()
+        for line in lines:
+            yield line + "\n"
+    if carry:
+        yield carry
+
+
+def _csv_records(path: str | Path) -> Iterator[tuple[int, dict[str, str]]]:  # Один csv.reader на весь файл: кавычки разбирает он, а не счёт по строкам
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        lines = _chunk_lines(f)
+        first = next(lines, None)
+        if first is None:
+            return
+        delimiter = ";" if first.count(";") > first.count(",") else ","  # Excel в русской локали пишет «;»
+        header: list[str] | None = None  # Первая запись — заголовок
+        number = 0  # Номер записи
+        for values in csv.reader(chain([first], lines), delimiter=delimiter):
+            if not any(values):  # Пустые строки пропускаем
+                continue
+            if header is None:
+                header = [name.strip().lower() for name in values]
+                continue
+            number += 1
+            yield number, dict(zip(header, values))
+
+
+async def iter_csv_rows(path: str | Path) -> AsyncIterator[tuple[int, dict[str, str]]]:  # Поток строк CSV: (номер записи, поля)
+    records = _csv_records(path)  # Чтение и разбор — в потоке пачками, цикл событий не блокируется
+    try:
+        while batch := await asyncio.to_thread(list, islice(records, CSV_BATCH)):
+            for record in batch:
+                yield record
+    finally:
+        records.close()
+
+
+async def iter_json_rows(path: str | Path) -> AsyncIterator[tuple[int, Any]]:  # Поток объектов JSON-массива или JSON Lines
+    decoder = json.JSONDecoder()
+    number = 0  # Номер объекта
+    async with aiofiles.open(path, encoding="utf-8-sig") as f:
+        buf, pos, eof = "", 0, False
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n,[]":  # Разделители между объектами
+                pos += 1
+            if pos < len(buf):
+                try:
+                    obj, end = decoder.raw_decode(buf, pos)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise ValueError(f"Некорректный JSON в объекте {number + 1}") from None
+                else:
+                    pos = end
+                    number += 1
+                    yield number, obj
+                    continue
+            elif eof:
+                return
+            chunk = await f.read(READ_CHUNK)  # Объект не поместился — дочитываем
+            buf, pos, eof = buf[pos:] + chunk, 0, not chunk
+
+
+def _parse_price(row: dict[str, Any]) -> int:  # Цена в копейках: price_cents или price в рублях
+    if row.get("price_cents") not in (None, ""):
+        return int(row["price_cents"])
+    value = row.get("price")
+    if value in (None, ""):
+        raise ValueError("нет price")
+    if isinstance(value, (int, float)):
+        return round(value * 100)
+    return round(float(str(value).replace(" ", "").replace(",", ".")) * 100)
+
+
+@dataclass(slots=True)
+class ImportReport:  # Итог и прогресс импорта
+    rows: int = 0  # Прочитано записей
+    inserted: int = 0  # Новых товаров
+    updated: int = 0  # Обновлено по артикулу
+    skipped: int = 0  # Пропущено записей с ошибками
+    categories: int = 0  # Создано категорий
+    errors: list[str] = field(default_factory=list)  # Первые ошибки
+
+
+class CatalogImporter:  # Потоковый импорт каталога: пачки строк -> одна транзакция на пачку через общего писателя
+    def __init__(self, queue: WriteQueue, batch_size: int = 2000):  # Писатель и размер пачки
+        self.queue = queue  # Общий писатель (импорт чередуется с оформлением заказов)
+        self.batch_size = max(1, batch_size)  # Строк в одной транзакции
+        self.categories: dict[str, int] = {}  # Имя категории -> ID
+        self.report = ImportReport()  # Счётчики
+
+    async def run(
+        self,
+        path: str | Path,
+        on_progress: Callable[[ImportReport], Awaitable[None]] | None = None,
+    ) -> ImportReport:  # Импортировать файл .csv, .json или .jsonl
+        rows = iter_csv_rows(path) if Path(path).suffix.lower() == ".csv" else iter_json_rows(path)
+        self.categories = await self.queue.submit(self._load_categories)  # Карта категорий — один раз
+        batch: list[dict[str, Any]] = []
+        async for number, raw in rows:
+            self.report.rows += 1
+            row = self._parse(number, raw)
+            if row is not None:
+                batch.append(row)
+            if len(batch) >= self.batch_size:
+                await self._write(batch, on_progress)
+                batch = []
+        if batch:
+            await self._write(batch, on_progress)
+        return self.report
+
+    async def _load_categories(self, session: AsyncSession) -> dict[str, int]:  # Все категории (их немного)
+        rows = await session.execute(select(Category.name, Category.id).order_by(Category.name))  # По покрывающему индексу имени
+        return dict(rows.all())
+
+    def _parse(self, number: int, raw: Any) -> dict[str, Any] | None:  # Запись файла -> строка products (category — пока имя)
+        try:
+            if not isinstance(raw, dict):
+                raise ValueError("ожидался объект")
+            row = {str(k).strip().lower(): v for k, v in raw.items()}
+            title = str(row.get("title") or "").strip()
+            if not title:
+                raise ValueError("нет title")
+            active = row.get("active", row.get("is_active"))
+            return {
+                "sku": str(row["sku"]).strip() if row.get("sku") not in (None, "") else None,
+                "title": title,
+                "description": str(row.get("description") or ""),
+                "price_cents": _parse_price(row),
+                "category": str(row.get("category") or "").strip() or None,
+                "photo_url": str(row.get("photo_url") or row.get("photo") or "").strip() or None,
+                "is_active": active in (None, "") or str(active).strip().lower() not in FALSE_VALUES,
+            }
+        except (ValueError, TypeError, KeyError) as exc:
+            self.report.skipped += 1
+            if len(self.report.errors) < MAX_ERRORS:
+                self.report.errors.append(f"запись {number}: {exc}")
+            return None
+
+    async def _write(self, batch: list[dict[str, Any]], on_progress) -> None:  # Одна пачка — одно задание писателя
+        inserted, updated, created = await self.queue.submit(lambda session: self._write_batch(session, batch))
+        self.report.inserted += inserted
+        self.report.updated += updated
+        self.report.categories += created
+        if on_progress:
+            await on_progress(self.report)
+
+    async def _write_batch(self, session: AsyncSession, batch: list[dict[str, Any]]) -> tuple[int, int, int]:  # Запись пачки
+        # Задание может быть перезапущено писателем после отката — общее состояние меняем только после commit
+        categories = await self._resolve_categories(session, {row["category"] for row in batch if row["category"]})
+        created = {name: cid for name, cid in categories.items() if name not in self.categories}
+        if created:
+            call_after_commit(session, lambda: self.categories.update(created))
+            mark_catalog_changed(session, CATEGORIES_TAG)
+        values = [
+            {**{k: row[k] for k in PRODUCT_FIELDS if k != "category_id"}, "category_id": categories.get(row["category"])}
+            for row in batch
+        ]
+        with_sku = [v for v in values if v["sku"]]
+        without_sku = [v for v in values if not v["sku"]]
+        touched: set[int | None] = {v["category_id"] for v in values}  # Категории, чьи страницы и счётчики меняются
+        products = Product.__table__  # Таблица товаров
+        returned = [products.c.id, *(products.c[name] for name in CARD_FIELDS), products.c.is_active]  # Снимок для inline-индекса
+        written = []  # Записанные строки: порядок RETURNING не гарантирован, поэтому возвращаем всё нужное
+        updated = 0
+        if with_sku:
+            existing = await session.execute(
+                select(Product.sku, Product.category_id).where(Product.sku.in_({v["sku"] for v in with_sku}))
+            )  # Прежние категории обновляемых товаров
+            previous = dict(existing.all())
+            touched.update(previous.values())
+            updated = sum(1 for v in with_sku if v["sku"] in previous)
+            stmt = dialect_insert(session, products)  # Core-таблица: без поштучной обработки ORM bulk insert
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[products.c.sku],
+                set_={
+                    **{name: stmt.excluded[name] for name in UPSERT_FIELDS},
+                    "photo_file_id": case(  # Новый URL — загруженное в Telegram фото устарело
+                        (products.c.photo_url.is_not_distinct_from(stmt.excluded.photo_url), products.c.photo_file_id), else_=None
+                    ),
+                },
+            ).returning(*returned)
+            written += (await session.execute(stmt, with_sku)).all()
+        if without_sku:
+            written += (await session.execute(insert(products).returning(*returned), without_sku)).all()
+        touched.discard(None)
+        if touched:
+            await rebuild_category_stats(session, list(touched))  # Core-вставка минует события ORM — пересчитываем затронутые
+        mark_catalog_changed(session, *(category_tag(cid) for cid in touched), *(product_tag(row.id) for row in written))
+        mark_index_changed(
+            session,
+            [ProductCard(*row[:-1]) for row in written if row.is_active],
+            [row.id for row in written if not row.is_active],
+        )
+        return len(values) - updated, updated, len(created)
+
+    async def _resolve_categories(self, session: AsyncSession, names: set[str]) -> dict[str, int]:  # Имя -> ID, новые создаются
+        known = {name: self.categories[name] for name in names if name in self.categories}
+        missing = names - known.keys()
+        if missing:
+            await session.execute(
+                dialect_insert(session, Category)
+                .values([{"name": name} for name in missing])
+                .on_conflict_do_nothing(index_elements=[Category.name])
+            )
+            rows = await session.execute(select(Category.name, Category.id).where(Category.name.in_(missing)))
+            known.update(rows.all())
+        return known
@@ -0,0 +1,195 @@
+from __future__ import annotations  # Отложенная оценка аннотаций
+
+import asyncio  # Ожидание загрузки индекса
+import re  # Разбиение названий на слова
+from time import monotonic  # Длительность загрузки
+from bisect import bisect_left, insort  # Поиск диапазона префикса и точечные правки отсортированного массива
+from typing import Iterable  # Типизация коллекций
+
+from sqlalchemy import event, select  # Конструктор SELECT и события ORM
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker  # Асинхронная сессия и фабрика
+from sqlalchemy.orm import Session  # Синхронная сессия (для подписки на события транзакции)
+
+from ..database import call_after_commit  # Колбэки после успешного commit
+from .. import peers  # Изменения для соседних процессов (шардирование)
+from ..logger import logger  # Логгер
+from ..models import Product  # ORM-модель товара
+from .catalog_service import ProductCard  # Снимок товара
+
+WORD = re.compile(r"\w+")  # Слова названия и запроса (Юникод)
+MAX_TOKENS = 4  # Больше слов запроса не учитываем
+MAX_INLINE_RESULTS = 200  # Глубже по next_offset не листаем
+SCAN_LIMIT = 2000  # Сколько записей диапазона префикса просматривать за запрос (бюджет времени)
+BULK_THRESHOLD = 256  # Начиная с такого числа изменённых записей массив собирается заново одним проходом
+LOAD_ATTEMPTS = 5  # Попыток построить индекс при старте
+LOAD_RETRY_DELAY = 1.0  # Пауза перед повтором (сек), удваивается: 1, 2, 4, 8
+_PENDING_KEY = "inline_index_changes"  # Ключ в session.info для накопления изменений до commit
+_PREFIX_END = "\U0010ffff"  # Верхняя граница диапазона префикса
+
+
+def _words(text: str) -> list[str]:  # Нормализованные слова: регистр и ё/е не различаем
+    return WORD.findall(text.casefold().replace("ё", "е"))
+
+
+class ProductIndex:  # Префиксный индекс активных товаров в памяти: отсортированный массив (слово, название, ID) + bisect
+    def __init__(self):
+        self._keys: list[tuple[str, str, int]] = []  # Отсортированные записи индекса
+        self._entries: dict[int, list[tuple[str, str, int]]] = {}  # ID товара -> его записи (для удаления)
+        self._cards: dict[int, ProductCard] = {}  # ID товара -> снимок для результата
+        self._texts: dict[int, str] = {}  # ID товара -> " слово1 слово2 ..." для проверки остальных слов запроса
+        self._loaded = asyncio.Event()  # Индекс построен; до этого inline-запросы ждут
+        self._deferred: list[tuple[list[ProductCard], list[int]]] | None = None  # Изменения, закоммиченные во время загрузки
+
+    def __len__(self) -> int:  # Число проиндексированных товаров
+        return len(self._cards)
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded.is_set()
+
+    async def wait_loaded(self) -> None:  # Дождаться построения индекса (при старте он грузится в фоне)
+        await self._loaded.wait()
+
+    def give_up(self) -> None:  # Индекс построить не удалось: inline-запросы больше не ждут и получают пустой ответ
+        self._loaded.set()
+
+    async def load(self, session: AsyncSession) -> None:  # Построить индекс из активных товаров (при старте)
+        self._deferred = []  # Снимок чтения может не увидеть правки, закоммиченные во время загрузки, — применим их после
+        try:
+            columns = [Product.id, Product.title, Product.description, Product.price_cents, Product.photo_url, Product.category_id]
+            rows = await session.stream(select(*columns).where(Product.is_active == True))  # noqa: E712  # Поля ProductCard по порядку
+            entries: dict[int, list[tuple[str, str, int]]] = {}
+            cards: dict[int, ProductCard] = {}
+            texts: dict[int, str] = {}
+            keys = []
+            async for row in rows:  # Строим в стороне: ошибка чтения не оставит индекс заполненным наполовину
+                card = ProductCard(*row)
+                entries[card.id], texts[card.id] = self._card_entries(card)
+                cards[card.id] = card
+                keys += entries[card.id]
+            self._keys, self._entries, self._cards, self._texts = sorted(keys), entries, cards, texts
+        finally:
+            deferred, self._deferred = self._deferred, None
+            for changed, removed in deferred:  # После ошибки — к прежнему индексу, чтобы он не отстал до повтора
+                self.apply(changed, removed)
+        self._loaded.set()
+
+    def apply(self, cards: Iterable[ProductCard] = (), removed: Iterable[int] = ()) -> None:  # Добавить/обновить и убрать товары
+        cards = list(cards)
+        if self._deferred is not None:  # Идёт загрузка
+            self._deferred.append((cards, list(removed)))
+            return
+        gone = {pid for pid in (*removed, *(card.id for card in cards)) if pid in self._entries}  # Товары со старыми записями
+        for product_id in gone:
+            del self._cards[product_id], self._texts[product_id]
+        stale = sorted(entry for product_id in gone for entry in self._entries.pop(product_id))
+        fresh = sorted(entry for card in cards for entry in self._add(card))
+        if len(stale) + len(fresh) < BULK_THRESHOLD:  # Правка из админки: сдвиг массива на каждую запись
+            for entry in stale:
+                del self._keys[bisect_left(self._keys, entry)]
+            for entry in fresh:
+                insort(self._keys, entry)
+            return
+        cuts = sorted(  # Импорт: позиции вставок и удалений, затем одна сборка массива срезами
+            [(bisect_left(self._keys, entry), 0, entry) for entry in fresh]
+            + [(bisect_left(self._keys, entry), 1, ()) for entry in stale]
+        )  # При равной позиции вставка идёт раньше удаления, порядок сохраняется
+        keys, start = [], 0
+        for pos, delete, entry in cuts:
+            keys += self._keys[start:pos]
+            start = pos
+            if delete:
+                start += 1
+            else:
+                keys.append(entry)
+        keys += self._keys[start:]
+        self._keys = keys
+
+    def search(self, text: str, offset: int = 0, limit: int = 20) -> tuple[list[ProductCard], int | None]:  # Страница и next_offset
+        tokens = list(dict.fromkeys(_words(text)))[:MAX_TOKENS]  # Каждое слово запроса — префикс какого-то слова названия
+        limit = min(limit, MAX_INLINE_RESULTS - offset)
+        if not tokens or limit <= 0:
+            return [], None
+        ranges = [
+            (bisect_left(self._keys, (token,)), bisect_left(self._keys, (token + _PREFIX_END,)), token) for token in tokens
+        ]
+        lo, hi, token = min(ranges, key=lambda r: r[1] - r[0])  # Просматриваем самый узкий диапазон
+        others = [" " + t for t in tokens if t != token]  # Остальные слова: начало какого-то слова названия
+        found: list[ProductCard] = []
+        seen: set[int] = set()  # Товар попадает в диапазон несколько раз, если префиксу отвечают несколько его слов
+        skip = offset
+        for i in range(lo, min(hi, lo + SCAN_LIMIT)):
+            product_id = self._keys[i][2]
+            if product_id in seen:
+                continue
+            seen.add(product_id)
+            if others:
+                text = self._texts[product_id]
+                if not all(t in text for t in others):
+                    continue
+            if skip:
+                skip -= 1
+                continue
+            if len(found) == limit:  # Есть следующая страница
+                return found, offset + limit
+            found.append(self._cards[product_id])
+        return found, None
+
+    def _add(self, card: ProductCard) -> list[tuple[str, str, int]]:  # Записать товар в индекс, вернуть его записи
+        entries, self._texts[card.id] = self._card_entries(card)
+        self._entries[card.id] = entries
+        self._cards[card.id] = card
+        return entries
+
+    @staticmethod
+    def _card_entries(card: ProductCard) -> tuple[list[tuple[str, str, int]], str]:  # Записи товара (по одной на слово названия) и строка слов
+        title = card.title.casefold()  # Внутри слова — по алфавиту названия
+        words = list(dict.fromkeys(_words(card.title)))
+        return [(word, title, card.id) for word in words], " " + " ".join(words)
+
+
+product_index = ProductIndex()  # Общий индекс процесса
+
+
+async def load_product_index(read_sessions: async_sessionmaker, index: ProductIndex = product_index) -> None:  # Построить индекс в фоне после старта бота
+    delay = LOAD_RETRY_DELAY
+    for attempt in range(1, LOAD_ATTEMPTS + 1):
+        started = monotonic()
+        try:
+            async with read_sessions() as session:
+                await index.load(session)
+        except Exception:
+            if attempt == LOAD_ATTEMPTS:
+                logger.exception("Inline index not built after {} attempts, inline mode answers empty until restart", attempt)
+                index.give_up()
+                return
+            logger.exception("Inline index load failed (attempt {}/{}), retrying in {:.0f}s", attempt, LOAD_ATTEMPTS, delay)
+            await asyncio.sleep(delay)
+            delay *= 2
+            continue
+        logger.info("Inline index: {} products in {:.1f}s", len(index), monotonic() - started)
+        return
+
+
+def mark_index_changed(
+    session: AsyncSession | Session, cards: Iterable[ProductCard] = (), removed: Iterable[int] = ()
+) -> None:  # Запомнить изменения товаров, применить к индексу после commit
+    pending = session.info.get(_PENDING_KEY)  # Изменения, уже накопленные в текущей транзакции: ID -> снимок или None
+    if pending is None:  # Первое изменение в транзакции — регистрируем применение после commit
+        pending = session.info[_PENDING_KEY] = {}
+
+        def _apply() -> None:
+            changes = session.info.pop(_PENDING_KEY, pending)
+            cards, removed = [card for card in changes.values() if card], [pid for pid, card in changes.items() if card is None]
+            product_index.apply(cards, removed)
+            peers.publish(peers.INDEX, (cards, removed))
+
+        call_after_commit(session, _apply)
+    pending.update({card.id: card for card in cards})
+    pending.update(dict.fromkeys(removed))
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _discard_index_changes(session: Session, transaction) -> None:  # Откат/закрытие без commit — изменений нет
+    if transaction.parent is None:  # Только корневая транзакция
+        session.info.pop(_PENDING_KEY, None)
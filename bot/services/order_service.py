@@ -1,12 +1,22 @@
 from __future__ import annotations  # Отложенная оценка аннотаций
 
-from sqlalchemy import select  # Конструктор SELECT
+from sqlalchemy import select, insert, delete, func, literal, tuple_, Row  # Конструкторы запросов
 from sqlalchemy.ext.asyncio import AsyncSession  # Асинхронная сессия
-from datetime import datetime  # Генерация даты для номера заказа
+from datetime import date, datetime, time, timedelta  # Генерация даты для номера заказа и фильтр по датам
 import secrets  # Для генерации случайной части номера
 
-from ..models import Order, OrderItem, User, Product, CartItem  # ORM-модели
-from .cart_service import CartService  # Используем CartService для получения корзины
+from ..database import dialect_insert  # INSERT ... ON CONFLICT для диалекта сессии
+from ..models import READ_OPTIONS, Order, OrderItem, User, Product, CartItem  # ORM-модели и опции чтения
+from ..keyboards import ORDERS_PAGE_SIZE  # Размер страницы списка заказов
+from .cart_service import CartService, user_id_of  # Используем CartService для получения корзины
+from .stats_service import StatsService  # Сводки продаж
+from .outbox import enqueue_message  # Уведомление покупателя (уходит после commit)
+
+ORDER_NUMBER_ATTEMPTS = 5  # Сколько номеров пробовать при коллизии
+ORDER_COLUMNS = [
+    "user_id", "total_cents", "delivery_method", "status", "created_at",
+    "customer_name", "customer_phone", "customer_address", "order_number",
+]  # Порядок колонок шапки заказа для INSERT ... SELECT
 
 class OrderService:  # Сервис заказов
     def __init__(self, session: AsyncSession):  # Принимаем асинхронную сессию
@@ -15,51 +25,116 @@ class OrderService:  # Сервис заказов
 
     async def create_order(
         self,
-        user: User,
+        user: User | int,
         customer_name: str,
         customer_phone: str,
         customer_address: str,
         delivery_method: str,
-    ) -> Order:  # Создать заказ из корзины пользователя
-        items = await self.cart_service.get_cart(user)  # Получаем товары из корзины
-        total_cents = sum(prod.price_cents * qty for prod, qty in items)  # Считаем итог в копейках
-        order_number = self._generate_order_number()  # Генерируем номер заказа
-        order = Order(
-            user_id=user.id,
-            total_cents=total_cents,
-            delivery_method=delivery_method,
-            status="new",
-            customer_name=customer_name,
-            customer_phone=customer_phone,
-            customer_address=customer_address,
-            order_number=order_number,
-        )  # Создаём объект заказа
-        self.session.add(order)  # Добавляем в сессию
-        await self.session.flush()  # Фиксируем для получения order.id
-        for product, qty in items:  # Создаём позиции заказа
-            self.session.add(
-                OrderItem(order_id=order.id, product_id=product.id, quantity=qty, price_cents=product.price_cents)
-            )  # Добавляем позицию
-        # clear cart
-        await self.session.execute(select(CartItem).where(CartItem.user_id == user.id))  # Ненужный select (можно убрать), сохраняем как безопасный no-op
+    ) -> Order:  # Создать заказ из корзины пользователя: три запроса при любом размере корзины
+        user_id = user_id_of(user)  # Внутренний ID пользователя
+        order = None  # Созданный заказ
+        for _ in range(ORDER_NUMBER_ATTEMPTS):  # Коллизия номера — пробуем новый, а не падаем с IntegrityError
+            header = (
+                select(
+                    literal(user_id),
+                    func.coalesce(func.sum(CartItem.quantity * Product.price_cents), 0),  # Итог считает БД
+                    literal(delivery_method),
+                    literal("new"),
+                    literal(datetime.utcnow()),
+                    literal(customer_name),
+                    literal(customer_phone),
+                    literal(customer_address),
+                    literal(self._generate_order_number()),
+                )
+                .select_from(CartItem)
+                .join(Product, Product.id == CartItem.product_id)
+                .where(CartItem.user_id == user_id)
+            )  # Шапка заказа из корзины с текущими ценами
+            stmt = (
+                dialect_insert(self.session, Order)
+                .from_select(ORDER_COLUMNS, header)
+                .on_conflict_do_nothing(index_elements=[Order.order_number])  # Занятый номер — пустой результат
+                .returning(Order)
+            )
+            order = (await self.session.execute(select(Order).from_statement(stmt))).scalar_one_or_none()
+            if order is not None:
+                break
+        if order is None:  # Все попытки заняты — практически невозможно
+            raise RuntimeError("Could not allocate a unique order number")
+        await self.session.execute(
+            insert(OrderItem).from_select(
+                ["order_id", "product_id", "quantity", "price_cents"],
+                select(literal(order.id), CartItem.product_id, CartItem.quantity, Product.price_cents)
+                .join(Product, Product.id == CartItem.product_id)
+                .where(CartItem.user_id == user_id),
+            )
+        )  # Позиции со снимком цен одним INSERT ... SELECT
         await self.session.execute(
-            CartItem.__table__.delete().where(CartItem.user_id == user.id)  # Удаляем все позиции корзины пользователя
+            delete(CartItem).where(CartItem.user_id == user_id)  # Удаляем все позиции корзины пользователя
         )
+        await StatsService(self.session).record_order(order)  # Сводки продаж в той же транзакции
         return order  # Возвращаем заказ
 
     def _generate_order_number(self) -> str:  # Генерация номера заказа вида YYMMDD-xxxxxx
         return datetime.utcnow().strftime("%y%m%d") + "-" + secrets.token_hex(3)  # Дата + случайный hex
 
     async def list_orders(self, status: str | None = None) -> list[Order]:  # Список заказов (опционально по статусу)
-        stmt = select(Order).order_by(Order.created_at.desc())  # Сортируем по дате создания (новые сверху)
+        stmt = select(Order).options(*READ_OPTIONS).order_by(Order.created_at.desc())  # Сортируем по дате создания (новые сверху), связи не подгружаются
         if status:
             stmt = stmt.where(Order.status == status)  # Фильтр по статусу
         res = await self.session.execute(stmt)  # Выполняем запрос
         return list(res.scalars().all())  # Список объектов Order
 
-    async def set_status(self, order_id: int, status: str) -> None:  # Обновить статус заказа
+    async def list_orders_page(
+        self,
+        status: str | None = None,
+        date_from: date | None = None,
+        date_to: date | None = None,
+        after_id: int | None = None,
+        before_id: int | None = None,
+        limit: int = ORDERS_PAGE_SIZE,
+    ) -> tuple[list[Row], bool, bool]:  # Страница заказов (новые сверху): строки, есть ли более новые, есть ли более старые
+        stmt = select(Order.id, Order.order_number, Order.status, Order.total_cents, Order.created_at)  # Только нужные колонки
+        if status:
+            stmt = stmt.where(Order.status == status)  # Фильтр по статусу (индекс status, created_at, id)
+        if date_from:
+            stmt = stmt.where(Order.created_at >= datetime.combine(date_from, time.min))  # С начала дня
+        if date_to:
+            stmt = stmt.where(Order.created_at < datetime.combine(date_to + timedelta(days=1), time.min))  # По конец дня включительно
+        key = tuple_(Order.created_at, Order.id)  # Ключ keyset
+        newest_first = (Order.created_at.desc(), Order.id.desc())  # Порядок показа
+        page = stmt.order_by(*newest_first)  # Первая страница
+        if after_id is not None or before_id is not None:  # Keyset: продолжаем от граничного заказа соседней страницы
+            anchor_id = after_id if after_id is not None else before_id  # ID граничного заказа
+            anchor = tuple_(select(Order.created_at).where(Order.id == anchor_id).scalar_subquery(), anchor_id)  # Ключ якоря
+            if after_id is not None:  # Более старые заказы
+                page = stmt.where(key < anchor).order_by(*newest_first)
+            else:  # Более новые: идём вверх и разворачиваем
+                page = stmt.where(key > anchor).order_by(Order.created_at, Order.id)
+        rows = list((await self.session.execute(page.limit(limit + 1))).all())  # Лишняя строка — признак следующей страницы
+        more = len(rows) > limit
+        rows = rows[:limit]
+        if before_id is not None:
+            rows.reverse()
+            if rows:
+                return rows, more, True
+        elif after_id is not None and rows:
+            return rows, True, more
+        if after_id is not None or before_id is not None:  # Якорь исчез или за ним пусто — с начала списка
+            return await self.list_orders_page(status, date_from, date_to, limit=limit)
+        return rows, False, more
+
+    async def set_status(self, order_id: int, status: str) -> bool:  # Обновить статус заказа и уведомить покупателя
         res = await self.session.execute(select(Order).where(Order.id == order_id))  # Находим заказ по id
         order = res.scalar_one_or_none()  # Заказ или None
         if not order:  # Если не найден — выходим
-            return
-        order.status = status  # Меняем статус 
\ No newline at end of file
+            return False
+        if order.status == status:  # Статус тот же — уведомлять не о чем
+            return True
+        await StatsService(self.session).record_status_change(order.id, order.status, status)  # Счётчики статусов
+        order.status = status  # Меняем статус
+        if order.user_id is not None:  # Покупатель не удалён
+            tg_id = (await self.session.execute(select(User.tg_id).where(User.id == order.user_id))).scalar_one_or_none()
+            if tg_id is not None:
+                enqueue_message(self.session, tg_id, f"Статус заказа {order.order_number}: {status}")  # В той же транзакции, что и смена статуса
+        return True
@@ -0,0 +1,376 @@
+from __future__ import annotations  # Отложенная оценка аннотаций
+
+import asyncio  # Отправители и ожидание лимитов
+import itertools  # Порядок внутри приоритета
+from collections import defaultdict, deque  # Пачки рассылки по порядку
+from dataclasses import dataclass  # Пачка и сообщение
+from datetime import datetime  # Время завершения рассылки
+from time import monotonic  # Лимиты по времени
+
+from sqlalchemy import case, delete, select, update  # Запросы к outbox и broadcasts
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker  # Сессии
+from sqlalchemy.orm import Session  # Синхронная сессия (call_after_commit)
+from telegram import Bot  # Bot API
+from telegram.error import BadRequest, Forbidden, RetryAfter, TelegramError  # Ошибки отправки
+
+from ..config import settings  # Лимиты и число отправителей
+from ..database import ReadSessionLocal, call_after_commit  # Сессии чтения и пробуждение после commit
+from ..logger import logger  # Логгер
+from .. import peers  # Пробуждение отправителя в другом процессе (шардирование)
+from ..models import Broadcast, OutboxMessage, User  # Таблицы рассылок, исходящих и получателей
+from .write_queue import WriteQueue, write_queue  # Писатель с групповым commit
+
+NOTIFY, BROADCAST = 0, 1  # Приоритеты: уведомления о заказах обгоняют рассылку
+MAX_ATTEMPTS = 5  # Попыток при сетевых ошибках (паузы 2, 4, 8, 16 с)
+IDLE_POLL = 30.0  # Страховочный опрос таблиц, если пробуждение потерялось (сек)
+CHAT_TRACK_LIMIT = 10_000  # Сколько чатов помнить для поштучного лимита, прежде чем чистить
+
+
+class TokenBucket:  # Общий лимит отправок в секунду; RetryAfter останавливает всех отправителей
+    def __init__(self, rate: float, burst: float | None = None):
+        self.rate = rate  # Жетонов в секунду
+        self.burst = burst or rate  # Ёмкость: не больше секунды отправок разом
+        self._tokens = self.burst  # Доступно сейчас
+        self._updated = monotonic()  # Когда пересчитывали
+        self._paused_until = 0.0  # Пауза по RetryAfter
+
+    async def acquire(self) -> None:  # Дождаться жетона
+        while True:
+            now = monotonic()
+            if now < self._paused_until:
+                await asyncio.sleep(self._paused_until - now)
+                continue
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def pause(self, seconds: float) -> None:  # Telegram попросил подождать — после паузы начинаем с пустого ведра
+        self._paused_until = max(self._paused_until, monotonic() + seconds)
+        self._tokens = 0
+
+
+@dataclass(slots=True)
+class _Batch:  # Пачка получателей рассылки: курсор сохраняется, когда отправлены она и все предыдущие
+    broadcast_id: int
+    last_user_id: int
+    remaining: int
+    sent: int = 0
+    failed: int = 0
+
+
+@dataclass(slots=True)
+class _Message:  # Сообщение в очереди отправителей
+    chat_id: int
+    text: str
+    outbox_id: int | None = None  # Строка outbox (уведомление)
+    batch: _Batch | None = None  # Пачка рассылки
+
+
+class OutboxSender:  # Отправка исходящих: уведомления из outbox и рассылки по users пачками, с общим и поштучным лимитом
+    def __init__(
+        self,
+        queue: WriteQueue,
+        read_sessions: async_sessionmaker,
+        rate: float = 30.0,
+        chat_interval: float = 1.0,
+        senders: int = 8,
+        batch_size: int = 500,
+    ):
+        self.queue = queue  # Запись прогресса и удаление доставленного
+        self.read_sessions = read_sessions  # Чтение outbox, рассылок и получателей
+        self.bucket = TokenBucket(rate)  # Общий лимит Bot API (~30 сообщений/с)
+        self.chat_interval = chat_interval  # Не чаще сообщения в секунду в один чат
+        self.senders = max(1, senders)  # Параллельных отправителей (скрывают задержку сети)
+        self.batch_size = max(1, batch_size)  # Получателей рассылки за один запрос
+        self.capacity = self.senders * 4  # Сообщений рассылки и уведомлений в работе — память не зависит от числа получателей
+        self.bot: Bot | None = None
+        self._pending: asyncio.PriorityQueue | None = None  # (приоритет, порядок, сообщение)
+        self._slots: asyncio.Semaphore | None = None  # Место для сообщений рассылки
+        self._notify_wake = asyncio.Event()  # Появились уведомления или освободилось место
+        self._broadcast_wake = asyncio.Event()  # Запущена рассылка
+        self._drained = asyncio.Event()  # Все пачки рассылки отправлены
+        self._tasks: list[asyncio.Task] = []
+        self._in_flight: set[int] = set()  # ID строк outbox в работе
+        self._undeleted: set[int] = set()  # Отправленные уведомления, чью строку не удалось удалить (остаются в _in_flight)
+        self._batches: deque[_Batch] = deque()  # Пачки рассылки по порядку курсора
+        self._saving = 0  # Записей курсора в работе и в ожидании
+        self._checkpoint_lock = asyncio.Lock()  # Одна запись курсора за раз: пачки сохраняются по порядку
+        self._chat_ready: dict[int, float] = {}  # Чат -> когда в него можно писать снова
+        self._order = itertools.count()
+        self.sent = 0  # Доставлено
+        self.failed = 0  # Не доставлено
+        self.throttled = 0  # Ответов RetryAfter
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self, bot: Bot) -> None:  # Запуск: недоставленное с прошлого раза продолжается из БД
+        if self.running:
+            return
+        self.bot = bot
+        self._pending = asyncio.PriorityQueue()
+        self._slots = asyncio.Semaphore(self.capacity)
+        self._drained.set()
+        self._tasks = [
+            asyncio.create_task(self._feed_notifications(), name="outbox-notify"),
+            asyncio.create_task(self._feed_broadcasts(), name="outbox-broadcast"),
+            *(asyncio.create_task(self._send_loop(), name=f"outbox-sender-{i}") for i in range(self.senders)),
+        ]
+
+    async def stop(self) -> None:  # Остановка: отправленное не повторится, остальное — после перезапуска
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def wake(self) -> None:  # В БД появилось что отправить (после commit)
+        self._notify_wake.set()
+        self._broadcast_wake.set()
+
+    def stats(self) -> dict[str, int]:  # Счётчики для метрик
+        return {
+            "sent": self.sent,
+            "failed": self.failed,
+            "throttled": self.throttled,
+            "queued": self._pending.qsize() if self._pending else 0,
+            "broadcast_batches": len(self._batches),
+        }
+
+    async def _feed_notifications(self) -> None:  # Уведомления из outbox по порядку ID
+        while True:
+            self._notify_wake.clear()
+            if self._undeleted:
+                await self._retry_deletes()
+            room = self.capacity - len(self._in_flight)
+            if room > 0:
+                async with self.read_sessions() as session:
+                    rows = (await session.execute(
+                        select(OutboxMessage.id, OutboxMessage.chat_id, OutboxMessage.text)
+                        .where(OutboxMessage.id.not_in(self._in_flight))  # Не больше capacity ID
+                        .order_by(OutboxMessage.id)
+                        .limit(room)
+                    )).all()
+                for row in rows:
+                    self._in_flight.add(row.id)
+                    self._put(NOTIFY, _Message(row.chat_id, row.text, outbox_id=row.id))
+                if len(rows) == room:  # Возможно, есть ещё — ждём места
+                    continue
+            await self._wait(self._notify_wake)
+
+    async def _feed_broadcasts(self) -> None:  # Рассылки по одной, получатели — пачками по users.id (keyset)
+        cursors: dict[int, int] = {}  # Рассылка -> последний поставленный в очередь пользователь
+        while True:
+            self._broadcast_wake.clear()
+            async with self.read_sessions() as session:
+                broadcast = (await session.execute(
+                    select(Broadcast.id, Broadcast.text, Broadcast.last_user_id)
+                    .where(Broadcast.status == "running").order_by(Broadcast.id).limit(1)
+                )).first()  # Перечитываем каждую пачку: остановленная рассылка больше не кормится
+                if broadcast is None:
+                    rows = None
+                else:
+                    after = cursors.setdefault(broadcast.id, broadcast.last_user_id)
+                    rows = (await session.execute(
+                        select(User.id, User.tg_id).where(User.id > after).order_by(User.id).limit(self.batch_size)
+                    )).all()
+            if broadcast is None:
+                await self._wait(self._broadcast_wake)
+                continue
+            if not rows:  # Получатели кончились: дожидаемся отправки и сохранения последних пачек
+                await self._drained.wait()
+                if self._batches:  # Запись последних счётчиков не удалась — повторяем, итог без них был бы неверным
+                    try:
+                        await self._checkpoint()
+                    except Exception:
+                        logger.exception("Broadcast {} checkpoint failed", broadcast.id)
+                        await self._wait(self._broadcast_wake)
+                        continue
+                await self.queue.submit(lambda session: self._finish(session, broadcast.id))
+                continue
+            cursors[broadcast.id] = rows[-1].id
+            for start in range(0, len(rows), self.capacity):  # Курсор сохраняется по мелким пачкам — после перезапуска повторится не больше пары пачек
+                chunk = rows[start:start + self.capacity]
+                batch = _Batch(broadcast.id, chunk[-1].id, len(chunk))
+                self._batches.append(batch)
+                self._drained.clear()
+                for row in chunk:
+                    await self._slots.acquire()  # Обратное давление: в памяти не больше capacity сообщений рассылки
+                    self._put(BROADCAST, _Message(row.tg_id, broadcast.text, batch=batch))
+
+    async def _send_loop(self) -> None:  # Отправитель
+        while True:
+            _, _, message = await self._pending.get()
+            delivered: bool | None = None  # None — до Bot API дело не дошло
+            try:
+                delivered = await self._deliver(message)
+                if delivered:
+                    self.sent += 1
+                else:
+                    self.failed += 1
+                await self._done(message, delivered)
+            except Exception:  # Ошибка БД не должна останавливать отправителя
+                logger.exception("Outbox sender failed on chat {}", message.chat_id)
+                if message.outbox_id is not None and delivered is not None:  # Уведомление ушло, строка осталась: повторяем только DELETE
+                    self._undeleted.add(message.outbox_id)
+            finally:
+                if message.outbox_id is not None:
+                    if message.outbox_id not in self._undeleted:  # Иначе строка снова попала бы в очередь и ушла повторно
+                        self._in_flight.discard(message.outbox_id)
+                    self._notify_wake.set()  # Освободилось место
+                else:
+                    self._slots.release()
+
+    async def _deliver(self, message: _Message) -> bool:  # Отправить с учётом лимитов; False — доставить невозможно
+        attempt = 0
+        while True:
+            await self._chat_turn(message.chat_id)
+            await self.bucket.acquire()
+            try:
+                await self.bot.send_message(message.chat_id, message.text)
+                return True
+            except RetryAfter as exc:  # Превышен лимит — пауза для всех отправителей, то же сообщение ещё раз
+                self.throttled += 1
+                self.bucket.pause(exc.retry_after)
+            except (Forbidden, BadRequest) as exc:  # Бот заблокирован, чат не найден — повтор не поможет
+                logger.info("Message to chat {} not delivered: {}", message.chat_id, exc)
+                return False
+            except TelegramError as exc:  # Сеть, таймаут — повтор с нарастающей паузой
+                attempt += 1
+                if attempt >= MAX_ATTEMPTS:
+                    logger.warning("Message to chat {} dropped after {} attempts: {}", message.chat_id, attempt, exc)
+                    return False
+                await asyncio.sleep(2 ** attempt)
+
+    async def _chat_turn(self, chat_id: int) -> None:  # Поштучный лимит: слот чата резервируется до ожидания
+        now = monotonic()
+        ready = self._chat_ready.get(chat_id, 0.0)
+        self._chat_ready[chat_id] = max(now, ready) + self.chat_interval
+        if len(self._chat_ready) > CHAT_TRACK_LIMIT:  # Рассылка пишет в каждый чат один раз — старые записи не нужны
+            self._chat_ready = {cid: t for cid, t in self._chat_ready.items() if t > now}
+        if ready > now:
+            await asyncio.sleep(ready - now)
+
+    async def _done(self, message: _Message, delivered: bool) -> None:  # Учесть результат
+        if message.outbox_id is not None:  # Уведомление: строка больше не нужна (доставлено или недоставимо)
+            outbox_id = message.outbox_id
+
+            async def job(session: AsyncSession) -> None:
+                await session.execute(delete(OutboxMessage).where(OutboxMessage.id == outbox_id))
+
+            await self.queue.submit(job)
+            return
+        batch = message.batch
+        batch.remaining -= 1
+        if delivered:
+            batch.sent += 1
+        else:
+            batch.failed += 1
+        if batch.remaining == 0 and self._batches and self._batches[0].remaining == 0:  # Первая пачка отправлена (или её запись не удалась)
+            await self._checkpoint()
+
+    async def _retry_deletes(self) -> None:  # Удалить строки отправленных уведомлений, не удалённые из-за ошибки БД
+        ids = list(self._undeleted)
+        try:
+            await self.queue.submit(lambda session: session.execute(delete(OutboxMessage).where(OutboxMessage.id.in_(ids))))
+        except Exception:  # Повторим при следующем пробуждении; до тех пор строки не отправляются
+            logger.exception("Outbox cleanup of {} sent notifications failed", len(ids))
+            return
+        self._undeleted.difference_update(ids)
+        self._in_flight.difference_update(ids)
+
+    async def _checkpoint(self) -> None:  # Сохранить курсор и счётчики по всем отправленным подряд пачкам
+        self._saving += 1
+        try:
+            async with self._checkpoint_lock:  # Иначе повтор упавшей записи мог бы лечь после записи следующих пачек
+                saved: list[_Batch] = []
+                done: dict[int, _Batch] = {}
+                totals: dict[int, list[int]] = defaultdict(lambda: [0, 0])
+                while self._batches and self._batches[0].remaining == 0:
+                    batch = self._batches.popleft()
+                    saved.append(batch)
+                    done[batch.broadcast_id] = batch
+                    totals[batch.broadcast_id][0] += batch.sent
+                    totals[batch.broadcast_id][1] += batch.failed
+                if not saved:  # Пачки уже сохранила предыдущая запись
+                    return
+
+                async def job(session: AsyncSession) -> None:
+                    for broadcast_id, batch in done.items():
+                        sent, failed = totals[broadcast_id]
+                        await session.execute(
+                            update(Broadcast)
+                            .where(Broadcast.id == broadcast_id)
+                            .values(
+                                last_user_id=case(  # Курсор только растёт: повтор после перезапуска не начнётся раньше сохранённого
+                                    (Broadcast.last_user_id < batch.last_user_id, batch.last_user_id), else_=Broadcast.last_user_id
+                                ),
+                                sent=Broadcast.sent + sent,
+                                failed=Broadcast.failed + failed,
+                            )
+                        )
+
+                try:
+                    await self.queue.submit(job)
+                except Exception:  # Запись не удалась — пачки возвращаются в начало очереди, их сохранит следующая попытка
+                    self._batches.extendleft(reversed(saved))
+                    raise
+        finally:
+            self._saving -= 1
+            if not self._saving and all(batch.remaining == 0 for batch in self._batches):  # Всё отправлено: итог — после записи счётчиков
+                self._drained.set()
+
+    async def _finish(self, session: AsyncSession, broadcast_id: int) -> None:  # Отметить рассылку завершённой и сообщить админу
+        row = (await session.execute(
+            update(Broadcast)
+            .where(Broadcast.id == broadcast_id, Broadcast.status == "running")
+            .values(status="done", finished_at=datetime.utcnow())
+            .returning(Broadcast.admin_chat_id, Broadcast.sent, Broadcast.failed)
+        )).first()
+        if row and row.admin_chat_id:
+            enqueue_message(session, row.admin_chat_id, f"Рассылка #{broadcast_id} завершена: доставлено {row.sent}, не доставлено {row.failed}")
+            call_after_commit(session, self.wake)  # Будим этот отправитель (enqueue_message будит общий)
+
+    def _put(self, priority: int, message: _Message) -> None:
+        self._pending.put_nowait((priority, next(self._order), message))
+
+    async def _wait(self, event: asyncio.Event) -> None:  # Ждём пробуждения или страховочного опроса
+        try:
+            await asyncio.wait_for(event.wait(), IDLE_POLL)
+        except asyncio.TimeoutError:
+            pass
+
+
+outbox = OutboxSender(
+    write_queue, ReadSessionLocal, settings.outbox_rate, settings.outbox_chat_interval, settings.outbox_senders, settings.broadcast_batch
+)  # Общий отправитель процесса
+
+
+def _wake_outbox() -> None:  # Отправитель работает в одном процессе — будим и его, если он не здесь
+    outbox.wake()
+    peers.publish(peers.OUTBOX)
+
+
+def enqueue_message(session: AsyncSession | Session, chat_id: int, text: str) -> None:  # Сообщение уйдёт, только если транзакция зафиксирована
+    session.add(OutboxMessage(chat_id=chat_id, text=text))
+    call_after_commit(session, _wake_outbox)
+
+
+async def start_broadcast(session: AsyncSession, text: str, admin_chat_id: int | None = None) -> int:  # Запустить рассылку всем пользователям
+    broadcast = Broadcast(text=text, status="running", admin_chat_id=admin_chat_id, last_user_id=0, sent=0, failed=0)
+    session.add(broadcast)
+    await session.flush()  # ID рассылки
+    call_after_commit(session, _wake_outbox)
+    return broadcast.id
+
+
+async def stop_broadcast(session: AsyncSession, broadcast_id: int) -> bool:  # Остановить рассылку (уже поставленные в очередь уйдут)
+    res = await session.execute(
+        update(Broadcast)
+        .where(Broadcast.id == broadcast_id, Broadcast.status == "running")
+        .values(status="cancelled", finished_at=datetime.utcnow())
+    )
+    return bool(res.rowcount)
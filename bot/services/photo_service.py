@@ -0,0 +1,82 @@
+from __future__ import annotations  # Отложенная оценка аннотаций
+
+import asyncio  # Пауза между отправками прогрева
+from dataclasses import dataclass  # Итог прогрева
+from typing import Awaitable, Callable  # Типизация отправки
+
+from sqlalchemy.ext.asyncio import async_sessionmaker  # Сессии чтения
+from telegram import Bot, Message  # Bot API и отправленное сообщение
+from telegram.error import BadRequest, RetryAfter, TelegramError  # Ошибки Bot API
+
+from ..logger import logger  # Логгер
+from .catalog_service import CatalogService, ProductCard  # Запись file_id и выборка товаров для прогрева
+from .write_queue import WriteQueue  # Писатель с групповым commit
+
+SendPhoto = Callable[[str], Awaitable[Message | bool]]  # Отправка фото по file_id или URL (edit_media, reply_photo)
+
+
+async def send_product_photo(product: ProductCard, send: SendPhoto, queue: WriteQueue) -> Message | bool:  # Отправить фото товара, по возможности без скачивания URL
+    if product.photo_file_id:  # Фото уже в Telegram — сервер не качает URL заново
+        try:
+            return await send(product.photo_file_id)
+        except BadRequest as exc:  # file_id больше не принимается (другой бот, удалён) — шлём по URL и запоминаем новый
+            if "not modified" in exc.message:  # Та же карточка уже открыта — дело не в file_id
+                raise
+            logger.warning("Product {} photo file_id rejected: {}", product.id, exc)
+    message = await send(product.photo_url)
+    await remember_photo(product, message, queue)
+    return message
+
+
+async def remember_photo(product: ProductCard, message: Message | bool, queue: WriteQueue) -> bool:  # Сохранить file_id, который Telegram вернул на отправку
+    if not isinstance(message, Message) or not message.photo:  # Inline-сообщение (edit вернул True) или не фото
+        return False
+    file_id = message.photo[-1].file_id  # Самый большой размер: по нему Telegram отдаёт все превью
+    if file_id == product.photo_file_id:
+        return False
+    return await queue.submit(lambda session: CatalogService(session).save_photo_file_id(product.id, product.photo_url, file_id))
+
+
+@dataclass(slots=True)
+class WarmReport:  # Итог прогрева фото категории
+    total: int = 0  # Товаров без file_id
+    warmed: int = 0  # Загружено в Telegram
+    failed: int = 0  # Telegram не смог скачать URL
+
+
+async def warm_category_photos(
+    bot: Bot,
+    chat_id: int,
+    category_id: int,
+    queue: WriteQueue,
+    read_sessions: async_sessionmaker,
+    delay: float = 1.0,
+) -> WarmReport:  # Загрузить фото товаров категории в Telegram заранее: отправка в служебный чат, file_id в БД, сообщение удаляется
+    async with read_sessions() as session:
+        pending = await CatalogService(session).photos_to_warm(category_id)
+    report = WarmReport(total=len(pending))
+    for product_id, photo_url in pending:
+        message = await _send_warm_photo(bot, chat_id, product_id, photo_url)
+        if message is None:
+            report.failed += 1
+        else:
+            card = ProductCard(product_id, "", "", 0, photo_url, category_id)  # Для записи нужны только ID и URL
+            await remember_photo(card, message, queue)
+            report.warmed += 1
+            try:
+                await bot.delete_message(chat_id, message.message_id)  # Служебное сообщение не нужно
+            except TelegramError:
+                logger.debug("Deleting warm-up photo {} failed", message.message_id)
+        await asyncio.sleep(delay)  # Не упираемся в лимит сообщений в один чат
+    return report
+
+
+async def _send_warm_photo(bot: Bot, chat_id: int, product_id: int, photo_url: str) -> Message | None:  # Отправка с ожиданием лимита Bot API
+    while True:
+        try:
+            return await bot.send_photo(chat_id, photo_url, disable_notification=True)
+        except RetryAfter as exc:  # Лимит — ждём, сколько сказано, и повторяем тот же товар
+            await asyncio.sleep(exc.retry_after)
+        except TelegramError as exc:  # Битый или недоступный URL — следующий товар
+            logger.warning("Warming photo of product {} failed: {}", product_id, exc)
+            return None
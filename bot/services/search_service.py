@@ -0,0 +1,61 @@
+from __future__ import annotations  # Отложенная оценка аннотаций
+
+import re  # Разбор поискового запроса
+from math import ceil  # Округление вверх для страниц
+
+from sqlalchemy import column, func, literal_column, or_, select, table  # Конструкторы запросов
+from sqlalchemy.ext.asyncio import AsyncSession  # Асинхронная сессия
+
+from ..keyboards import PAGE_SIZE  # Размер страницы
+from ..models import READ_OPTIONS, Product  # ORM-модель товара и опции чтения
+from .catalog_service import ProductCard  # Снимок товара для клавиатур
+
+TOKEN = re.compile(r"\w+")  # Слова запроса (Юникод)
+MAX_TOKENS = 8  # Больше слов в запросе не учитываем
+MAX_RESULTS = PAGE_SIZE * 50  # Больше результатов не показываем (и не считаем)
+RANK_WINDOW = 1000  # Для слишком частых слов bm25 считается только по стольким самым новым совпадениям
+products_fts = table("products_fts", column("rowid"), column("rank"))  # Виртуальная таблица FTS5 (создаётся миграцией)
+
+
+def fts_query(text: str) -> str | None:  # Запрос пользователя -> безопасное выражение FTS5: все слова, последнее — по префиксу
+    tokens = [f'"{token}"' for token in TOKEN.findall(text.lower())[:MAX_TOKENS]]  # Кавычки экранируют операторы FTS5 (AND, NEAR, -, ...)
+    if not tokens:
+        return None
+    tokens[-1] += "*"  # Недописанное слово; префиксный поиск по всем словам заметно дороже
+    return " ".join(tokens)
+
+
+class SearchService:  # Полнотекстовый поиск товаров
+    def __init__(self, session: AsyncSession):  # Принимаем асинхронную сессию
+        self.session = session  # Сохраняем сессию
+
+    async def search(self, text: str, page: int = 1) -> tuple[list[ProductCard], int]:  # Страница результатов и число страниц
+        match = fts_query(text)  # Выражение FTS5
+        if match is None:
+            return [], 1
+        page = max(1, page)  # Минимум первая страница
+        offset = (page - 1) * PAGE_SIZE  # Смещение страницы
+        active = Product.is_active == True  # noqa: E712  # Только активные товары
+        if self.session.get_bind().dialect.name != "sqlite":  # Другие СУБД: все слова в названии или описании
+            words = TOKEN.findall(text.lower())[:MAX_TOKENS]
+            base = select(Product).options(*READ_OPTIONS).where(
+                active, *(or_(Product.title.ilike(f"%{w}%"), Product.description.ilike(f"%{w}%")) for w in words)
+            )
+            total = (await self.session.execute(select(func.count()).select_from(base.subquery()))).scalar_one()
+            rows = (await self.session.execute(base.order_by(Product.title, Product.id).limit(PAGE_SIZE).offset(offset))).scalars()
+            return [ProductCard.from_model(p) for p in rows], max(1, ceil(total / PAGE_SIZE))
+        hits = select(products_fts.c.rowid).where(literal_column("products_fts").op("MATCH")(match))  # В индексе только активные товары
+        edge = (
+            await self.session.execute(hits.order_by(products_fts.c.rowid.desc()).limit(1).offset(RANK_WINDOW - 1))
+        ).scalar_one_or_none()  # Есть ли больше RANK_WINDOW совпадений (обход по rowid, без ранжирования)
+        if edge is not None:  # Частое слово: ранжировать все совпадения дорого, берём окно самых новых товаров
+            hits = hits.where(products_fts.c.rowid >= edge)
+            total = MAX_RESULTS  # В окне заведомо больше, чем показываем
+        else:  # Считаем не дальше MAX_RESULTS: дальше никто не листает
+            total = (await self.session.execute(select(func.count()).select_from(hits.limit(MAX_RESULTS).subquery()))).scalar_one()
+        total_pages = max(1, ceil(total / PAGE_SIZE))  # Сколько всего страниц
+        if offset >= total:
+            return [], total_pages
+        ids = list((await self.session.execute(hits.order_by(products_fts.c.rank).limit(PAGE_SIZE).offset(offset))).scalars())  # bm25: ORDER BY rank выполняет сам FTS5
+        found = {p.id: p for p in (await self.session.execute(select(Product).options(*READ_OPTIONS).where(Product.id.in_(ids), active))).scalars()}
+        return [ProductCard.from_model(found[pid]) for pid in ids if pid in found], total_pages  # Порядок ранжирования
@@ -0,0 +1,154 @@
+from __future__ import annotations  # Отложенная оценка аннотаций
+
+import asyncio  # Пауза между пачками догоняющего заполнения
+from dataclasses import dataclass  # Снимок отчёта
+from datetime import date, datetime, timedelta  # Границы отчёта по дням
+
+from sqlalchemy import select, func  # Конструкторы запросов
+from sqlalchemy.ext.asyncio import AsyncSession  # Асинхронная сессия
+
+from ..database import dialect_insert  # INSERT ... ON CONFLICT для диалекта сессии
+from ..models import (  # ORM-модели
+    Category, CategorySales, Order, OrderItem, OrderStatusCount, Product, ProductSales, RollupState, SalesDaily,
+)
+from ..logger import logger  # Логгер
+from .write_queue import WriteQueue  # Писатель с групповым commit
+
+SALES_ROLLUP = "sales"  # Имя сводки продаж в rollup_state
+
+
+@dataclass(frozen=True, slots=True)
+class SalesReport:  # Отчёт /stats
+    daily: list[tuple[date, int, int]]  # (день, заказов, выручка) за последние дни, новые сверху
+    statuses: list[tuple[str, int]]  # (статус, заказов)
+    top_products: list[tuple[str, int, int]]  # (товар, штук, выручка)
+    top_categories: list[tuple[str, int, int]]  # (категория, штук, выручка)
+    backfill_pending: bool  # Старые заказы ещё досчитываются
+
+
+class StatsService:  # Сводки продаж: инкрементальное обновление и отчёт за O(1) от объёма истории
+    def __init__(self, session: AsyncSession):  # Принимаем асинхронную сессию
+        self.session = session  # Сохраняем сессию
+
+    async def record_order(self, order: Order) -> None:  # Учесть только что созданный заказ
+        await self._add_orders(order.id - 1, order.id)
+
+    async def record_status_change(self, order_id: int, old: str, new: str) -> None:  # Перенести заказ между статусами
+        if old == new or not await self._is_counted(order_id):  # Заказ ещё не учтён — догоняющее заполнение возьмёт новый статус
+            return
+        await self._bump_status(old, -1)
+        await self._bump_status(new, 1)
+
+    async def backfill_batch(self, batch_size: int = 500) -> bool:  # Досчитать очередную пачку старых заказов; True — всё учтено
+        state = await self.session.get(RollupState, SALES_ROLLUP)  # Прогресс заполнения
+        if state is None or state.last_id >= state.upto_id:
+            return True
+        edge = (
+            await self.session.execute(
+                select(Order.id)
+                .where(Order.id > state.last_id, Order.id <= state.upto_id)
+                .order_by(Order.id)
+                .offset(batch_size - 1)
+                .limit(1)
+            )
+        ).scalar_one_or_none()  # Последний ID пачки
+        hi = edge if edge is not None else state.upto_id  # Остаток меньше пачки — до конца
+        await self._add_orders(state.last_id, hi)
+        state.last_id = hi
+        return hi >= state.upto_id
+
+    async def report(self, days: int = 7, top: int = 5) -> SalesReport:  # Отчёт из сводок: чтения по ключу и по индексу
+        since = datetime.utcnow().date() - timedelta(days=days - 1)  # Первый день отчёта
+        daily = await self.session.execute(
+            select(SalesDaily.day, SalesDaily.orders, SalesDaily.revenue_cents)
+            .where(SalesDaily.day >= since)
+            .order_by(SalesDaily.day.desc())
+        )
+        statuses = await self.session.execute(
+            select(OrderStatusCount.status, OrderStatusCount.orders)
+            .where(OrderStatusCount.orders != 0)
+            .order_by(OrderStatusCount.status)
+        )
+        products = await self.session.execute(
+            select(Product.title, ProductSales.units, ProductSales.revenue_cents)
+            .join(Product, Product.id == ProductSales.product_id)
+            .order_by(ProductSales.units.desc())
+            .limit(top)
+        )
+        categories = await self.session.execute(
+            select(Category.name, CategorySales.units, CategorySales.revenue_cents)
+            .join(Category, Category.id == CategorySales.category_id)
+            .order_by(CategorySales.units.desc())
+            .limit(top)
+        )
+        state = await self.session.get(RollupState, SALES_ROLLUP)
+        return SalesReport(
+            daily=[tuple(row) for row in daily],
+            statuses=[tuple(row) for row in statuses],
+            top_products=[tuple(row) for row in products],
+            top_categories=[tuple(row) for row in categories],
+            backfill_pending=state is not None and state.last_id < state.upto_id,
+        )
+
+    async def _is_counted(self, order_id: int) -> bool:  # Учтён ли заказ в сводках
+        state = await self.session.get(RollupState, SALES_ROLLUP)
+        return state is None or order_id > state.upto_id or order_id <= state.last_id
+
+    async def _add_orders(self, lo: int, hi: int) -> None:  # Добавить в сводки заказы с ID в (lo, hi]: по запросу на сводку
+        in_range = (Order.id > lo, Order.id <= hi)  # Диапазон по первичному ключу
+        await self._upsert(
+            SalesDaily,
+            ["day", "orders", "revenue_cents"],
+            select(func.date(Order.created_at), func.count(), func.sum(Order.total_cents))
+            .where(*in_range)
+            .group_by(func.date(Order.created_at)),
+        )
+        await self._upsert(
+            OrderStatusCount,
+            ["status", "orders"],
+            select(Order.status, func.count()).where(*in_range).group_by(Order.status),
+        )
+        item_range = (OrderItem.order_id > lo, OrderItem.order_id <= hi)  # Тот же диапазон по индексу order_items(order_id)
+        revenue = func.sum(OrderItem.quantity * OrderItem.price_cents)  # Выручка по снимку цены
+        await self._upsert(
+            ProductSales,
+            ["product_id", "units", "revenue_cents"],
+            select(OrderItem.product_id, func.sum(OrderItem.quantity), revenue)
+            .where(*item_range, OrderItem.product_id.is_not(None))
+            .group_by(OrderItem.product_id),
+        )
+        await self._upsert(
+            CategorySales,
+            ["category_id", "units", "revenue_cents"],
+            select(Product.category_id, func.sum(OrderItem.quantity), revenue)
+            .join(Product, Product.id == OrderItem.product_id)
+            .where(*item_range, Product.category_id.is_not(None))
+            .group_by(Product.category_id),
+        )
+
+    async def _bump_status(self, status: str, delta: int) -> None:  # Изменить счётчик статуса
+        stmt = dialect_insert(self.session, OrderStatusCount).values(status=status, orders=delta)
+        await self.session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[OrderStatusCount.status], set_={"orders": OrderStatusCount.orders + stmt.excluded.orders}
+            )
+        )
+
+    async def _upsert(self, model, columns: list[str], rows) -> None:  # INSERT ... SELECT с прибавлением к существующим строкам
+        table = model.__table__
+        key = [c.name for c in table.primary_key.columns]  # Ключ сводки
+        stmt = dialect_insert(self.session, model).from_select(columns, rows)
+        await self.session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=key,
+                set_={name: table.c[name] + stmt.excluded[name] for name in columns if name not in key},
+            )
+        )
+
+
+async def backfill_sales_rollups(queue: WriteQueue, batch_size: int = 500, pause: float = 0.05) -> None:  # Догоняющее заполнение сводок
+    try:
+        while not await queue.submit(lambda session: StatsService(session).backfill_batch(batch_size)):  # Короткие транзакции через общего писателя
+            await asyncio.sleep(pause)  # Уступаем место оформлению заказов
+    except Exception:  # Фоновая задача: ошибку только логируем, прогресс сохранён в rollup_state
+        logger.exception("Sales rollup backfill failed")
@@ -0,0 +1,129 @@
+from __future__ import annotations  # Отложенная оценка аннотаций
+
+import asyncio  # Очередь и фоновая задача писателя
+from typing import Any, Awaitable, Callable, TypeVar  # Типизация заданий
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker  # Сессии БД
+
+from ..config import settings  # Размер пачки и задержка
+from ..database import SessionLocal, savepoint  # Фабрика сессий записи и точки сохранения
+from ..logger import logger  # Логгер
+from ..metrics import UpdateSample, current_sample  # Замер хендлера, отправившего задание
+
+T = TypeVar("T")  # Результат задания
+WriteJob = Callable[[AsyncSession], Awaitable[T]]  # Задание: работает с сессией, commit не делает
+Queued = tuple[WriteJob, asyncio.Future, UpdateSample | None]  # Задание, его результат и замер хендлера
+
+
+class WriteQueue:  # Единственный писатель с групповым commit: задания идут подряд в одной транзакции, один commit на пачку
+    def __init__(self, session_factory: async_sessionmaker, max_batch: int = 64, max_delay: float = 0.002):  # Фабрика сессий и границы пачки
+        self.session_factory = session_factory  # Сессии для пачек
+        self.max_batch = max(1, max_batch)  # Не больше заданий в одной транзакции
+        self.max_delay = max_delay  # Сколько ждать добора пачки после первого задания (сек)
+        self._queue: asyncio.Queue[Queued] | None = None  # Очередь заданий
+        self._task: asyncio.Task | None = None  # Фоновая задача писателя
+        self.batches = 0  # Выполнено commit
+        self.jobs = 0  # Выполнено заданий
+        self.largest_batch = 0  # Самая большая пачка
+
+    @property
+    def running(self) -> bool:  # Запущен ли писатель
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:  # Запуск фоновой задачи
+        if self.running:
+            return
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run(), name="write-queue")
+
+    async def stop(self) -> None:  # Остановка: дописываем всё, что уже в очереди
+        if not self.running:
+            return
+        await self._queue.join()  # Ждём выполнения принятых заданий
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def submit(self, job: WriteJob[T]) -> T:  # Выполнить задание и вернуть его результат (или исключение)
+        if not self.running:  # Писатель не запущен (тесты, скрипты) — обычная транзакция
+            async with self.session_factory() as session:
+                result = await job(session)
+                await session.commit()
+            return result
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((job, future, current_sample.get()))  # Запросы задания засчитаются хендлеру, а не фону
+        return await future
+
+    async def _run(self) -> None:  # Цикл писателя
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]  # Ждём первое задание
+            deadline = loop.time() + self.max_delay  # Граница добора пачки
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())  # Забираем всё, что уже ждёт
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))  # Ждём ещё немного
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await self._execute(batch)
+            except Exception as exc:  # Сбой commit/соединения — сообщаем всем заданиям пачки
+                logger.exception("Write batch failed")
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _execute(self, batch: list[Queued]) -> None:  # Одна транзакция на пачку, каждое задание — в своей точке сохранения
+        pending = [item for item in batch if not item[1].cancelled()]  # Отменённые вызывающим не выполняем
+        if not pending:
+            return
+        outcomes: list[tuple[asyncio.Future, Any, bool]] = []  # (future, результат или исключение, успех)
+        async with self.session_factory() as session:
+            for job, future, sample in pending:
+                try:
+                    async with savepoint(session):  # Ошибка откатывает только это задание — соседи не перезапускаются
+                        token = current_sample.set(sample)  # SQL задания — хендлеру; SAVEPOINT и общий commit остаются фоновыми
+                        try:
+                            result = await job(session)
+                        finally:
+                            current_sample.reset(token)
+                except Exception as exc:
+                    outcomes.append((future, exc, False))
+                else:
+                    outcomes.append((future, result, True))
+            await session.commit()  # Один commit (и один fsync) на всю пачку
+        succeeded = sum(ok for _, _, ok in outcomes)
+        self.batches += 1
+        self.jobs += succeeded
+        self.largest_batch = max(self.largest_batch, succeeded)
+        for future, value, ok in outcomes:
+            if future.done():
+                continue
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+    def stats(self) -> dict[str, int]:  # Счётчики для отчётов
+        return {
+            "batches": self.batches,
+            "jobs": self.jobs,
+            "largest_batch": self.largest_batch,
+            "queued": self._queue.qsize() if self._queue else 0,
+        }
+
+
+write_queue = WriteQueue(SessionLocal, settings.write_batch_size, settings.write_batch_delay)  # Общий писатель процесса
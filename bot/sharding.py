@@ -0,0 +1,562 @@
+from __future__ import annotations  # Отложенная оценка аннотаций
+
+import asyncio  # Процессы, серверы и пересылка
+import json  # Тела служебных запросов
+import os  # Окружение воркеров и родительский процесс
+import re  # Разбор строк метрик
+import secrets  # Секрет внутреннего трафика
+import signal  # Остановка по SIGTERM
+import sys  # Интерпретатор для воркеров
+from contextlib import suppress  # Сигналы недоступны (Windows)
+from dataclasses import astuple  # Снимок товара в JSON
+from time import monotonic  # Паузы перезапуска и таймауты
+from typing import Any, Sequence  # Типизация
+from urllib.parse import urlsplit  # Путь вебхука из публичного URL
+
+from telegram import Bot, Update  # Bot API фронта и список типов обновлений
+from telegram.error import RetryAfter, TelegramError  # Ошибки getUpdates
+
+from . import peers  # Изменения для соседних процессов
+from .config import settings  # Параметры супервизора
+from .database import init_models  # Миграции до запуска воркеров
+from .logger import logger  # Логгер
+from .metrics import MetricsServer  # /metrics супервизора и воркеров
+from .services.catalog_service import ProductCard, catalog_cache  # Кэш каталога
+from .services.inline_index import product_index  # Inline-индекс
+from .services.outbox import outbox  # Отправитель исходящих
+from .webhook import MAX_HEADER, SECRET_HEADER, WebhookServer, json_loads  # Разбор HTTP и приём обновлений
+
+UPDATE_PATH = "/update"  # Обновления от супервизора воркеру
+PEER_PATH = "/peer"  # Изменения каталога, индекса и outbox между процессами
+HELLO_PATH = "/hello"  # Воркер сообщает супервизору свои порты
+WORKER_HEADER = "x-shard-worker"  # Номер воркера-отправителя изменения
+POLL_TIMEOUT = 30  # Long polling getUpdates (сек)
+RETRY_DELAY = 0.1  # Пауза перед повтором доставки воркеру (перезапуск, очередь полна)
+PEER_ATTEMPTS = 5  # Попыток отправить изменение супервизору
+HEALTH_FAILURES = 3  # Неответов подряд, после которых зависший воркер убивается и перезапускается
+STARTUP_TIMEOUT = 60.0  # Сколько ждать регистрации нового воркера (сек)
+RESTART_DELAY = 0.5  # Пауза перед перезапуском; удваивается, пока воркер падает сразу после старта
+RESTART_DELAY_MAX = 30.0
+STABLE_UPTIME = 60.0  # Проработал дольше — следующее падение снова с короткой паузой
+LINK_ERRORS = (OSError, EOFError, asyncio.TimeoutError, ValueError)  # Процесс на том конце недоступен или оборвал ответ
+_SAMPLE = re.compile(r"^([A-Za-z_:][\w:]*)(?:\{(.*)\})?\s+(\S+)$")  # Строка значения Prometheus: имя{метки} значение
+
+
+def user_key(data: dict[str, Any]) -> int | None:  # Ключ шардирования из сырого обновления: пользователь, иначе чат (как update_key)
+    chat_id = None
+    for field, value in data.items():
+        if field == "update_id" or not isinstance(value, dict):
+            continue
+        user = value.get("from") or value.get("user")  # message, callback_query, inline_query... / poll_answer, message_reaction
+        if isinstance(user, dict) and "id" in user:
+            return user["id"]
+        chat = value.get("chat") or (value.get("message") or {}).get("chat")
+        if chat_id is None and isinstance(chat, dict):
+            chat_id = chat.get("id")
+    return chat_id
+
+
+def shard_of(data: dict[str, Any], workers: int) -> int:  # Номер воркера: один пользователь — всегда один процесс
+    key = user_key(data)
+    return key % workers if key is not None else 0
+
+
+def encode_event(kind: str, payload: Any) -> bytes:  # Изменение в JSON для соседей
+    if kind == peers.CATALOG:
+        payload = [list(tag) if isinstance(tag, tuple) else tag for tag in payload]
+    elif kind == peers.INDEX:
+        cards, removed = payload
+        payload = [[astuple(card) for card in cards], list(removed)]
+    return json.dumps({"kind": kind, "payload": payload}).encode()
+
+
+def apply_event(event: dict[str, Any]) -> None:  # Применить изменение соседа к кэшам процесса (без повторной публикации)
+    kind, payload = event["kind"], event.get("payload")
+    if kind == peers.CATALOG:
+        catalog_cache.invalidate(*(tuple(tag) if isinstance(tag, list) else tag for tag in payload))
+    elif kind == peers.INDEX:
+        product_index.apply([ProductCard(*row) for row in payload[0]], payload[1])
+    elif kind == peers.OUTBOX:
+        outbox.wake()
+
+
+def merge_metrics(texts: dict[int, str]) -> list[str]:  # Метрики воркеров одним текстом: метка worker, семейства не перемешаны
+    families: dict[str, tuple[list[str], list[str]]] = {}  # Имя -> (HELP/TYPE, значения всех воркеров)
+    for index, text in texts.items():
+        family = None
+        for line in text.splitlines():
+            if line.startswith("#"):
+                parts = line.split(" ", 3)
+                if len(parts) >= 3 and parts[1] in ("HELP", "TYPE"):
+                    family = parts[2]
+                    headers = families.setdefault(family, ([], []))[0]
+                    if line not in headers:
+                        headers.append(line)
+                continue
+            match = _SAMPLE.match(line)
+            if match is None:
+                continue
+            name, labels, value = match.groups()
+            labels = f'worker="{index}",{labels}' if labels else f'worker="{index}"'
+            families.setdefault(family or name, ([], []))[1].append(f"{name}{{{labels}}} {value}")
+    return [line for headers, samples in families.values() for line in (*headers, *samples)]
+
+
+class LocalClient:  # HTTP/1.1 с keep-alive к процессу на этой машине (воркер или супервизор)
+    def __init__(self, port: int, secret: str | None = None, timeout: float = 10.0):
+        self.port = port  # Порт на 127.0.0.1
+        self.secret = secret  # Секрет внутреннего трафика
+        self.timeout = timeout  # Предел на запрос целиком
+        self._reader: asyncio.StreamReader | None = None
+        self._writer: asyncio.StreamWriter | None = None
+        self._lock = asyncio.Lock()  # Один запрос за раз на соединении
+
+    async def request(self, method: str, path: str, body: bytes = b"", headers: dict[str, str] | None = None) -> tuple[int, bytes]:  # (код, тело)
+        async with self._lock:
+            try:
+                return await asyncio.wait_for(self._exchange(method, path, body, headers or {}), self.timeout)
+            except BaseException:  # Ответ не дочитан — соединение больше не годится
+                self.close()
+                raise
+
+    async def _exchange(self, method: str, path: str, body: bytes, headers: dict[str, str]) -> tuple[int, bytes]:
+        if self._writer is None:
+            self._reader, self._writer = await asyncio.open_connection("127.0.0.1", self.port, limit=MAX_HEADER)
+        lines = [f"{method} {path} HTTP/1.1", "Host: 127.0.0.1", f"Content-Length: {len(body)}"]
+        if self.secret:
+            lines.append(f"{SECRET_HEADER}: {self.secret}")
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        self._writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        await self._writer.drain()
+        status_line, *header_lines = (await self._reader.readuntil(b"\r\n\r\n"))[:-4].decode("latin-1").split("\r\n")
+        response_headers = {}
+        for line in header_lines:
+            name, _, value = line.partition(":")
+            response_headers[name.strip().lower()] = value.strip()
+        length = int(response_headers.get("content-length", "0"))
+        payload = await self._reader.readexactly(length) if length else b""
+        if response_headers.get("connection", "").lower() == "close":
+            self.close()
+        return int(status_line.split(" ", 2)[1]), payload
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+
+
+class WorkerServer(WebhookServer):  # Приём обновлений от супервизора и изменений от соседних воркеров
+    def _accept(self, method: str, target: str, headers: dict[str, str], body: bytes) -> int:
+        if target.split("?", 1)[0] != PEER_PATH:
+            return super()._accept(method, target, headers, body)
+        if method != "POST":
+            return 405
+        if not self._authorized(headers):
+            return 403
+        try:
+            apply_event(json_loads(body))
+        except Exception:
+            logger.exception("Peer event rejected")
+            return 400
+        return 200
+
+
+class ShardLink:  # Сторона воркера: регистрация у супервизора, публикация изменений, остановка вместе с супервизором
+    def __init__(self, index: int, control_port: int, secret: str):
+        self.index = index  # Номер воркера
+        self.client = LocalClient(control_port, secret)  # Служебный порт супервизора
+        self._events: asyncio.Queue[bytes] = asyncio.Queue()  # Изменения к отправке по порядку commit
+        self._tasks: list[asyncio.Task] = []
+        self.published = 0  # Отправлено изменений
+        self.dropped = 0  # Не отправлено (соседи увидят правку по TTL кэша)
+
+    def __call__(self, kind: str, payload: Any) -> None:  # Подписчик peers
+        self._events.put_nowait(encode_event(kind, payload))
+
+    async def start(self, port: int, metrics_port: int, stop: asyncio.Event) -> None:  # Порты воркера — супервизору; он начинает слать обновления
+        peers.subscribe(self)
+        self._tasks = [asyncio.create_task(self._publish()), asyncio.create_task(self._watch_parent(stop))]
+        hello = json.dumps({"worker": self.index, "pid": os.getpid(), "port": port, "metrics_port": metrics_port}).encode()
+        if not await self._post(HELLO_PATH, hello):
+            raise RuntimeError(f"Supervisor did not accept worker {self.index}")
+        logger.info("Worker {} ready (pid {}, port {})", self.index, os.getpid(), port)
+
+    async def stop(self, timeout: float = 5.0) -> None:  # Последние изменения — соседям
+        peers.unsubscribe(self)
+        with suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(self._events.join(), timeout)
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.client.close()
+
+    def stats(self) -> dict[str, int]:
+        return {"published": self.published, "dropped": self.dropped, "pending": self._events.qsize()}
+
+    async def _publish(self) -> None:
+        while True:
+            body = await self._events.get()
+            try:
+                if await self._post(PEER_PATH, body, {WORKER_HEADER: str(self.index)}):
+                    self.published += 1
+                else:
+                    self.dropped += 1
+                    logger.warning("Worker {}: change not delivered to peers", self.index)
+            finally:
+                self._events.task_done()
+
+    async def _post(self, path: str, body: bytes, headers: dict[str, str] | None = None) -> bool:  # С повторами: супервизор мог быть занят
+        for attempt in range(PEER_ATTEMPTS):
+            try:
+                status, _ = await self.client.request("POST", path, body, headers)
+                if status == 200:
+                    return True
+                if status != 429:
+                    return False
+            except LINK_ERRORS:
+                pass
+            await asyncio.sleep(RETRY_DELAY * 2 ** attempt)
+        return False
+
+    async def _watch_parent(self, stop: asyncio.Event) -> None:  # Супервизор убит без дренажа — воркер не остаётся сиротой
+        parent = os.getppid()
+        while os.getppid() == parent:
+            await asyncio.sleep(1)
+        logger.warning("Worker {}: supervisor is gone, stopping", self.index)
+        stop.set()
+
+
+class _Worker:  # Процесс-воркер глазами супервизора
+    def __init__(self, index: int):
+        self.index = index  # Номер: обновления пользователей с user_id % N == index
+        self.process: asyncio.subprocess.Process | None = None
+        self.client: LocalClient | None = None  # Приём обновлений (после регистрации)
+        self.metrics_port = 0  # /metrics воркера (после регистрации)
+        self.ready = asyncio.Event()  # Зарегистрировался и принимает обновления
+        self.queue: asyncio.Queue[tuple[str, bytes]] = asyncio.Queue()  # (путь, тело) по порядку поступления
+        self.updates = 0  # Обновлений в очереди (изменения соседей не считаются)
+        self.forwarded = 0  # Доставлено обновлений
+        self.restarts = 0  # Перезапусков
+        self.failures = 0  # Непройденных проверок подряд
+        self.started_at = 0.0  # Когда запущен текущий процесс
+        self.metrics_text = ""  # Последний снятый /metrics
+
+    @property
+    def up(self) -> bool:
+        return self.ready.is_set() and not self.failures
+
+
+class _FrontServer(WebhookServer):  # Вебхук Telegram в супервизоре: обновление не разбирается в Update, а уходит воркеру как есть
+    def __init__(self, supervisor: Supervisor, path: str, secret: str | None, host: str, port: int):
+        super().__init__(None, path, secret, host, port)
+        self.supervisor = supervisor
+
+    def deliver(self, data: object, body: bytes) -> int:
+        if not isinstance(data, dict):
+            return 400
+        if not self.supervisor.route_nowait(data, body):  # Очередь воркера полна — Telegram повторит позже
+            self.rejected += 1
+            return 429
+        self.accepted += 1
+        return 200
+
+
+class _ControlServer(WebhookServer):  # Служебные запросы воркеров: регистрация и изменения для соседей
+    def __init__(self, supervisor: Supervisor):
+        super().__init__(None, PEER_PATH, supervisor.secret, "127.0.0.1", 0)
+        self.supervisor = supervisor
+
+    def _accept(self, method: str, target: str, headers: dict[str, str], body: bytes) -> int:
+        path = target.split("?", 1)[0]
+        if path not in (PEER_PATH, HELLO_PATH):
+            return 404
+        if method != "POST":
+            return 405
+        if not self._authorized(headers):
+            return 403
+        if path == PEER_PATH:
+            origin = headers.get(WORKER_HEADER, "")
+            if not origin.isdigit():
+                return 400
+            self.supervisor.relay(int(origin), body)
+            return 200
+        try:
+            return 200 if self.supervisor.register(json_loads(body)) else 409
+        except Exception:
+            return 400
+
+
+class Supervisor:  # N процессов с одним набором хендлеров; обновление — воркеру по хэшу пользователя, чтобы его состояние жило в одном процессе
+    def __init__(
+        self,
+        workers: int,
+        command: Sequence[str],
+        env: dict[str, str] | None = None,
+        queue_size: int = 1000,
+        health_interval: float = 5.0,
+        drain_timeout: float = 30.0,
+    ):
+        self.workers = [_Worker(i) for i in range(max(1, workers))]
+        self.command = list(command)  # Запуск воркера (python -m bot)
+        self.env = dict(os.environ if env is None else env)  # Окружение воркеров (плюс номер, порт и секрет)
+        self.queue_size = queue_size  # Недоставленных обновлений на воркер; больше — 429 вебхуку, ожидание поллингу
+        self.health_interval = health_interval  # Период проверки /metrics воркеров
+        self.drain_timeout = drain_timeout  # Сколько ждать доставки очередей и выхода воркеров при остановке
+        self.secret = secrets.token_urlsafe(32)  # Внутренний трафик принимается только от процессов этого супервизора
+        self.control = _ControlServer(self)
+        self.rejected = 0  # Обновлений, отклонённых из-за полной очереди
+        self._offset = 0  # Следующий update_id для getUpdates
+        self._stopping = False
+        self._tasks: list[asyncio.Task] = []
+
+    async def start(self) -> None:  # Служебный сервер, воркеры, пересылка и проверки
+        await self.control.start()
+        for worker in self.workers:
+            await self._spawn(worker)
+        self._tasks = [
+            *(asyncio.create_task(self._forward(worker)) for worker in self.workers),
+            *(asyncio.create_task(self._watch(worker)) for worker in self.workers),
+            asyncio.create_task(self._health()),
+        ]
+
+    async def stop(self) -> None:  # Дренаж: принятое доходит до воркеров, воркеры дорабатывают и дописывают состояние
+        try:
+            await asyncio.wait_for(asyncio.gather(*(worker.queue.join() for worker in self.workers)), self.drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Drain timeout: {} updates not delivered", sum(worker.updates for worker in self.workers))
+        self._stopping = True
+        running = [worker.process for worker in self.workers if worker.process and worker.process.returncode is None]
+        for process in running:
+            process.terminate()  # Воркер обрабатывает принятые обновления и останавливается как одиночный бот
+        try:
+            await asyncio.wait_for(asyncio.gather(*(process.wait() for process in running)), self.drain_timeout)
+        except asyncio.TimeoutError:
+            for process in running:
+                if process.returncode is None:
+                    logger.warning("Worker pid {} did not stop in time, killing", process.pid)
+                    process.kill()
+            await asyncio.gather(*(process.wait() for process in running))
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for worker in self.workers:
+            if worker.client:
+                worker.client.close()
+        await self.control.stop()
+
+    def route_nowait(self, data: dict[str, Any], body: bytes) -> bool:  # В очередь воркера пользователя; False — очередь полна
+        worker = self.workers[shard_of(data, len(self.workers))]
+        if worker.updates >= self.queue_size:
+            self.rejected += 1
+            return False
+        worker.updates += 1
+        worker.queue.put_nowait((UPDATE_PATH, body))
+        return True
+
+    async def route(self, data: dict[str, Any], body: bytes) -> None:  # То же с ожиданием места (поллинг не теряет обновления)
+        worker = self.workers[shard_of(data, len(self.workers))]
+        while worker.updates >= self.queue_size:
+            await asyncio.sleep(RETRY_DELAY)
+        worker.updates += 1
+        worker.queue.put_nowait((UPDATE_PATH, body))
+
+    def relay(self, origin: int, body: bytes) -> None:  # Изменение воркера — остальным, в общей очереди с обновлениями
+        for worker in self.workers:
+            if worker.index != origin:
+                worker.queue.put_nowait((PEER_PATH, body))
+
+    def register(self, data: dict[str, Any]) -> bool:  # Воркер запущен и слушает порт
+        index = data.get("worker")
+        if not isinstance(index, int) or not 0 <= index < len(self.workers):
+            return False
+        worker = self.workers[index]
+        if worker.process is None or worker.process.pid != data.get("pid"):  # Запоздавшая регистрация уже заменённого процесса
+            return False
+        if worker.client:
+            worker.client.close()
+        worker.client = LocalClient(data["port"], self.secret)
+        worker.metrics_port = data["metrics_port"]
+        worker.failures = 0
+        worker.ready.set()
+        return True
+
+    async def poll(self, bot: Bot) -> None:  # Фронт long polling: getUpdates -> очереди воркеров; offset подтверждает разосланное
+        await bot.delete_webhook(drop_pending_updates=True)
+        while True:
+            try:
+                batch = await bot.get_updates(self._offset, timeout=POLL_TIMEOUT, read_timeout=POLL_TIMEOUT + 10, allowed_updates=Update.ALL_TYPES)
+            except RetryAfter as exc:
+                await asyncio.sleep(exc.retry_after)
+                continue
+            except TelegramError as exc:  # Сеть или Bot API — повторяем с паузой
+                logger.warning("getUpdates failed: {}", exc)
+                await asyncio.sleep(1)
+                continue
+            for update in batch:
+                data = update.to_dict()
+                await self.route(data, json.dumps(data).encode())
+                self._offset = update.update_id + 1
+
+    async def confirm(self, bot: Bot) -> None:  # Подтвердить разосланные обновления, чтобы Telegram не прислал их снова
+        if self._offset:
+            with suppress(TelegramError):
+                await bot.get_updates(self._offset, timeout=0, limit=1)
+
+    def render(self) -> str:  # /metrics супервизора: его гейджи и последние метрики воркеров с меткой worker
+        lines = []
+        gauges = [
+            ("bot_shard_up", "gauge", lambda w: int(w.up)),
+            ("bot_shard_pid", "gauge", lambda w: w.process.pid if w.process else 0),
+            ("bot_shard_queued", "gauge", lambda w: w.updates),
+            ("bot_shard_forwarded_total", "counter", lambda w: w.forwarded),
+            ("bot_shard_restarts_total", "counter", lambda w: w.restarts),
+        ]
+        for name, kind, value in gauges:
+            lines.append(f"# TYPE {name} {kind}")
+            lines += [f'{name}{{worker="{worker.index}"}} {value(worker)}' for worker in self.workers]
+        lines += ["# TYPE bot_shard_rejected_total counter", f"bot_shard_rejected_total {self.rejected}"]
+        lines += merge_metrics({worker.index: worker.metrics_text for worker in self.workers})
+        return "\n".join(lines) + "\n"
+
+    async def _spawn(self, worker: _Worker) -> None:
+        env = {
+            **self.env,
+            "SHARD_INDEX": str(worker.index),
+            "SHARD_CONTROL_PORT": str(self.control.port),
+            "SHARD_SECRET": self.secret,
+        }
+        worker.ready.clear()
+        worker.failures = 0
+        worker.started_at = monotonic()
+        worker.process = await asyncio.create_subprocess_exec(*self.command, env=env, start_new_session=True)  # Ctrl+C — только супервизору, он остановит воркеры по порядку
+        logger.info("Worker {} started (pid {})", worker.index, worker.process.pid)
+
+    async def _watch(self, worker: _Worker) -> None:  # Перезапуск упавшего воркера; его очередь ждёт новый процесс
+        crashes = 0
+        while True:
+            code = await worker.process.wait()
+            if self._stopping:
+                return
+            worker.ready.clear()
+            crashes = crashes + 1 if monotonic() - worker.started_at < STABLE_UPTIME else 1
+            delay = min(RESTART_DELAY_MAX, RESTART_DELAY * 2 ** (crashes - 1))
+            logger.error("Worker {} exited with code {}, restarting in {:.1f}s", worker.index, code, delay)
+            await asyncio.sleep(delay)
+            if self._stopping:
+                return
+            worker.restarts += 1
+            await self._spawn(worker)
+
+    async def _forward(self, worker: _Worker) -> None:  # Доставка очереди воркера по одному запросу: порядок пользователя сохраняется
+        while True:
+            path, body = await worker.queue.get()
+            try:
+                await self._deliver(worker, path, body)
+            finally:
+                if path == UPDATE_PATH:
+                    worker.updates -= 1
+                worker.queue.task_done()
+
+    async def _deliver(self, worker: _Worker, path: str, body: bytes) -> None:  # Повторяем до приёма: воркер перезапускается или занят
+        while True:
+            await worker.ready.wait()
+            try:
+                status, _ = await worker.client.request("POST", path, body)
+            except LINK_ERRORS:  # Воркер упал — доставим новому процессу
+                status = None
+            if status == 200:
+                if path == UPDATE_PATH:
+                    worker.forwarded += 1
+                return
+            if status is not None and status != 429:  # Воркер не принял тело — повтор не поможет
+                logger.warning("Worker {} rejected {} with {}", worker.index, path, status)
+                return
+            await asyncio.sleep(RETRY_DELAY)
+
+    async def _health(self) -> None:
+        while True:
+            await asyncio.sleep(self.health_interval)
+            await asyncio.gather(*(self._check(worker) for worker in self.workers))
+
+    async def _check(self, worker: _Worker) -> None:  # Снять /metrics; не отвечает несколько раз подряд — убить (перезапустит _watch)
+        process = worker.process
+        if process is None or process.returncode is not None:
+            return
+        if not worker.ready.is_set():
+            if monotonic() - worker.started_at > STARTUP_TIMEOUT:
+                logger.error("Worker {} did not register in {:.0f}s, killing", worker.index, STARTUP_TIMEOUT)
+                process.kill()
+            return
+        client = LocalClient(worker.metrics_port, timeout=self.health_interval)
+        try:
+            status, body = await client.request("GET", "/metrics")
+        except LINK_ERRORS:
+            status, body = None, b""
+        finally:
+            client.close()
+        if status == 200:
+            worker.metrics_text = body.decode()
+            worker.failures = 0
+            return
+        worker.failures += 1
+        if worker.failures >= HEALTH_FAILURES:
+            logger.error("Worker {} is not responding, killing", worker.index)
+            process.kill()
+
+
+def stop_event() -> asyncio.Event:  # Событие остановки по SIGTERM/SIGINT
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        with suppress(NotImplementedError):  # Windows
+            loop.add_signal_handler(signum, stop.set)
+    return stop
+
+
+async def supervise() -> None:  # Точка входа при WORKERS > 1: миграции, воркеры, фронт (вебхук или поллинг), метрики
+    if not settings.bot_token:
+        raise RuntimeError("BOT_TOKEN is not set")
+    webhook = settings.update_mode == "webhook"
+    if webhook and not settings.webhook_url:
+        raise RuntimeError("WEBHOOK_URL is not set")
+    await init_models()  # Один раз до воркеров — они схему не трогают
+    supervisor = Supervisor(
+        settings.workers,
+        [sys.executable, "-m", "bot"],
+        queue_size=settings.shard_queue_size,
+        health_interval=settings.shard_health_interval,
+        drain_timeout=settings.shard_drain_timeout,
+    )
+    stop = stop_event()
+    await supervisor.start()
+    metrics_server = MetricsServer(supervisor, settings.metrics_listen, settings.metrics_port) if settings.metrics_port else None  # Сводные метрики всех воркеров
+    if metrics_server:
+        await metrics_server.start()
+    bot = Bot(settings.bot_token, base_url=settings.bot_api_url)  # Фронту нужны только getUpdates/setWebhook
+    await bot.initialize()
+    server = poller = None
+    try:
+        if webhook:
+            secret = settings.webhook_secret or secrets.token_urlsafe(32)
+            server = _FrontServer(supervisor, urlsplit(settings.webhook_url).path or "/", secret, settings.webhook_listen, settings.webhook_port)
+            await server.start()
+            await bot.set_webhook(settings.webhook_url, secret_token=secret, allowed_updates=Update.ALL_TYPES, drop_pending_updates=True)
+        else:
+            poller = asyncio.create_task(supervisor.poll(bot))
+        logger.info("Supervisor running {} workers", len(supervisor.workers))
+        await stop.wait()
+    finally:
+        logger.info("Supervisor stopping...")
+        if server:  # Новые обновления Telegram придержит и доставит повторно
+            await server.stop()
+        if poller:
+            poller.cancel()
+            await asyncio.gather(poller, return_exceptions=True)
+            await supervisor.confirm(bot)
+        await supervisor.stop()
+        if metrics_server:
+            await metrics_server.stop()
+        await bot.shutdown()
+
@@ -0,0 +1,90 @@
+from __future__ import annotations  # Отложенная оценка аннотаций
+
+import asyncio  # Семафор и блокировки
+from collections import deque  # Окно последних времён ожидания
+from contextlib import nullcontext  # Обновления без пользователя не упорядочиваем
+from statistics import quantiles  # Перцентили ожидания
+from time import monotonic  # Замер ожидания
+from typing import Any, Awaitable  # Типизация корутин
+
+from telegram import Update  # Тип обновления
+from telegram.ext import BaseUpdateProcessor  # Точка расширения PTB для параллельной обработки
+
+WAIT_WINDOW = 1024  # По скольким последним обновлениям считать перцентили ожидания
+
+
+def update_key(update: object) -> int | None:  # Ключ упорядочивания: пользователь, иначе чат
+    if not isinstance(update, Update):
+        return None
+    if update.effective_user:
+        return update.effective_user.id
+    return update.effective_chat.id if update.effective_chat else None
+
+
+class UserOrderedUpdateProcessor(BaseUpdateProcessor):  # Разные пользователи — параллельно, один пользователь — строго по порядку
+    def __init__(self, max_concurrent_updates: int, max_pending: int = 10000):  # Параллелизм и предел обновлений в обработке и ожидании
+        super().__init__(max(max_pending, max_concurrent_updates))  # Семафор базового класса ограничивает только ожидающих
+        self.limit = max_concurrent_updates  # Сколько обработчиков выполняется одновременно
+        self._slots = asyncio.Semaphore(max_concurrent_updates)  # Берётся после очереди пользователя: его серия не занимает слоты
+        self._locks: dict[int, tuple[asyncio.Lock, int]] = {}  # Ключ -> (блокировка, сколько обновлений её ждут/держат)
+        self._waits: deque[float] = deque(maxlen=WAIT_WINDOW)  # Ожидание последних обновлений (сек)
+        self.waiting = 0  # Гейдж: обновлений в очереди (ждут свою очередь пользователя или свободный слот)
+        self.active = 0  # Гейдж: обновлений в обработке
+        self.processed = 0  # Счётчик обработанных
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:  # Обработка одного обновления
+        key = update_key(update)
+        queued_at = monotonic()  # Начало ожидания
+        self.waiting += 1
+        started = False
+        try:
+            async with self._lock(key):  # asyncio.Lock отдаёт блокировку в порядке ожидания — порядок обновлений сохраняется
+                async with self._slots:
+                    self.waiting -= 1
+                    started = True
+                    self._waits.append(monotonic() - queued_at)
+                    self.active += 1
+                    try:
+                        await coroutine
+                    finally:
+                        self.active -= 1
+                        self.processed += 1
+        finally:
+            if not started:  # Отменено в очереди
+                self.waiting -= 1
+            self._release(key)
+
+    def _lock(self, key: int | None):  # Блокировка ключа (создаётся по требованию)
+        if key is None:
+            return nullcontext()
+        lock, users = self._locks.get(key) or (asyncio.Lock(), 0)
+        self._locks[key] = (lock, users + 1)
+        return lock
+
+    def _release(self, key: int | None) -> None:  # Освободить блокировку ключа: последнюю удаляем, словарь не растёт
+        if key is None:
+            return
+        lock, users = self._locks[key]
+        if users == 1:
+            del self._locks[key]
+        else:
+            self._locks[key] = (lock, users - 1)
+
+    def stats(self) -> dict[str, float]:  # Гейджи очереди и времени ожидания
+        waits = list(self._waits)
+        cuts = quantiles(waits, n=100) if len(waits) > 1 else (waits or [0.0]) * 99
+        return {
+            "waiting": self.waiting,
+            "active": self.active,
+            "keys": len(self._locks),
+            "processed": self.processed,
+            "wait_p50_ms": round(cuts[49] * 1000, 2),
+            "wait_p95_ms": round(cuts[94] * 1000, 2),
+            "wait_max_ms": round(max(waits, default=0.0) * 1000, 2),
+        }
+
+    async def initialize(self) -> None:  # Ресурсов нет
+        pass
+
+    async def shutdown(self) -> None:  # Ресурсов нет
+        pass
@@ -0,0 +1,151 @@
+from __future__ import annotations  # Отложенная оценка аннотаций
+
+import asyncio  # Сервер на потоках asyncio
+import hmac  # Сравнение секрета за постоянное время
+import json  # Запасной разбор JSON
+
+from telegram import Update  # Тип обновления
+from telegram.ext import Application, ExtBot  # Приложение бота
+
+from .logger import logger  # Логгер
+
+try:  # orjson заметно быстрее разбирает обновления; без него — стандартный json
+    from orjson import loads as json_loads
+except ImportError:
+    json_loads = json.loads
+
+MAX_HEADER = 16 * 1024  # Предел строки запроса и заголовков
+MAX_BODY = 1024 * 1024  # Предел тела запроса (обновления Telegram намного меньше)
+SECRET_HEADER = "x-telegram-bot-api-secret-token"  # Заголовок с секретом, заданным в setWebhook
+REASONS = {
+    200: "OK", 400: "Bad Request", 403: "Forbidden", 404: "Not Found", 405: "Method Not Allowed",
+    409: "Conflict", 413: "Payload Too Large", 429: "Too Many Requests", 431: "Request Header Fields Too Large",
+}  # Поддерживаемые коды ответа
+
+
+class HTTPError(Exception):  # Запрос, после которого соединение закрывается
+    def __init__(self, status: int):
+        super().__init__(status)
+        self.status = status  # Код ответа
+
+
+async def read_request(reader: asyncio.StreamReader) -> tuple[str, str, dict[str, str], bytes] | None:  # Один запрос HTTP/1.1 или None, если клиент закрыл соединение
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")  # Строка запроса и заголовки
+    except asyncio.IncompleteReadError:  # Соединение закрыто между запросами
+        return None
+    except asyncio.LimitOverrunError:
+        raise HTTPError(431) from None
+    request_line, *lines = head[:-4].decode("latin-1").split("\r\n")
+    try:
+        method, target, _ = request_line.split(" ", 2)
+    except ValueError:
+        raise HTTPError(400) from None
+    headers = {}
+    for line in lines:
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+    if "transfer-encoding" in headers:  # Telegram присылает Content-Length; chunked не поддерживаем
+        raise HTTPError(400)
+    length = headers.get("content-length", "0")
+    if not length.isdigit():
+        raise HTTPError(400)
+    if int(length) > MAX_BODY:
+        raise HTTPError(413)
+    body = await reader.readexactly(int(length)) if int(length) else b""
+    return method, target, headers, body
+
+
+def write_response(writer: asyncio.StreamWriter, status: int, body: bytes = b"", keep_alive: bool = True, headers: dict[str, str] | None = None) -> None:  # Ответ HTTP/1.1
+    lines = [f"HTTP/1.1 {status} {REASONS.get(status, 'Unknown')}", f"Content-Length: {len(body)}"]
+    lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+    if not keep_alive:
+        lines.append("Connection: close")
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+
+
+class WebhookServer:  # Приём обновлений Telegram: POST -> проверка секрета -> Update -> очередь приложения
+    def __init__(self, app: Application | None, path: str, secret_token: str | None, host: str = "0.0.0.0", port: int = 8443):
+        self.app = app  # Приложение: обновления кладём в его update_queue (ограниченную — это и есть backpressure)
+        self.path = path  # Путь вебхука
+        self.secret_token = secret_token.encode() if secret_token else None  # Секрет из setWebhook
+        self.host = host  # Адрес прослушивания
+        self.port = port  # Порт (0 — любой свободный)
+        self.accepted = 0  # Принято обновлений
+        self.rejected = 0  # Отклонено с 429 (очередь полна)
+        self._server: asyncio.Server | None = None  # Слушающий сокет
+        self._connections: set[asyncio.StreamWriter] = set()  # Открытые соединения (Telegram держит keep-alive)
+
+    async def start(self) -> None:  # Начать приём соединений
+        self._server = await asyncio.start_server(self._handle, self.host, self.port, limit=MAX_HEADER)
+        self.port = self._server.sockets[0].getsockname()[1]  # Фактический порт
+        logger.info("Webhook server listening on {}:{}{}", self.host, self.port, self.path)
+
+    async def stop(self) -> None:  # Закрыть сокет и соединения
+        if self._server is None:
+            return
+        self._server.close()
+        for writer in list(self._connections):
+            writer.close()
+        await self._server.wait_closed()
+        self._server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:  # Одно соединение: запросы по очереди
+        self._connections.add(writer)
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except HTTPError as exc:  # Запрос не разобран — отвечаем и закрываем соединение
+                    write_response(writer, exc.status, keep_alive=False)
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                method, target, headers, body = request
+                status = self._accept(method, target, headers, body)
+                keep_alive = headers.get("connection", "").lower() != "close"
+                write_response(writer, status, keep_alive=keep_alive, headers={"Retry-After": "1"} if status == 429 else None)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):  # Клиент оборвал соединение посреди запроса
+            pass
+        finally:
+            self._connections.discard(writer)
+            writer.close()
+
+    def _accept(self, method: str, target: str, headers: dict[str, str], body: bytes) -> int:  # Код ответа на запрос
+        if target.split("?", 1)[0] != self.path:
+            return 404
+        if method != "POST":
+            return 405
+        if not self._authorized(headers):
+            return 403
+        try:
+            data = json_loads(body)
+        except Exception:  # Некорректный JSON
+            logger.debug("Webhook: malformed update")
+            return 400
+        return self.deliver(data, body)
+
+    def _authorized(self, headers: dict[str, str]) -> bool:  # Секрет совпал (или не задан)
+        return not self.secret_token or hmac.compare_digest(headers.get(SECRET_HEADER, "").encode("latin-1"), self.secret_token)
+
+    def deliver(self, data: object, body: bytes) -> int:  # Разобранное обновление -> очередь приложения; код ответа
+        try:
+            update = Update.de_json(data, self.app.bot)
+        except Exception:  # Не обновление
+            logger.debug("Webhook: malformed update")
+            return 400
+        if update is None:
+            return 400
+        if isinstance(self.app.bot, ExtBot):  # Произвольные callback_data, если включены
+            self.app.bot.insert_callback_data(update)
+        try:
+            self.app.update_queue.put_nowait(update)
+        except asyncio.QueueFull:  # Обработка не успевает — Telegram повторит доставку позже
+            self.rejected += 1
+            return 429
+        self.accepted += 1
+        return 200
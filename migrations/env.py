@@ -0,0 +1,64 @@
+from __future__ import annotations  # Отложенная оценка аннотаций
+
+import asyncio  # Асинхронный движок для онлайн-миграций
+from logging.config import fileConfig  # Логирование из alembic.ini
+
+from alembic import context  # Контекст Alembic
+from sqlalchemy import pool  # NullPool для разового подключения
+from sqlalchemy.engine import Connection  # Синхронное соединение внутри run_sync
+from sqlalchemy.ext.asyncio import create_async_engine  # Асинхронный движок
+
+from bot.config import settings  # DATABASE_URL
+from bot.database import Base  # Метаданные моделей
+from bot import models  # noqa: F401  # Регистрация моделей в метаданных
+
+config = context.config  # Конфигурация Alembic
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):  # Логи только при запуске из CLI
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata  # Цель для autogenerate
+
+
+def include_name(name, type_, parent_names) -> bool:  # Служебные таблицы FTS5 создаются миграцией, а не моделями
+    return not (type_ == "table" and name.startswith("products_fts"))
+
+
+def _url() -> str:  # URL: явно переданный в конфиг или из настроек приложения
+    return config.get_main_option("sqlalchemy.url") or settings.database_url
+
+
+def run_migrations_offline() -> None:  # Генерация SQL без подключения (alembic upgrade --sql)
+    context.configure(
+        url=_url(), target_metadata=target_metadata, literal_binds=True, render_as_batch=True, include_name=include_name
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def do_run_migrations(connection: Connection) -> None:  # Прогон миграций на синхронном соединении
+    context.configure(
+        connection=connection, target_metadata=target_metadata, render_as_batch=True, include_name=include_name
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+async def run_async_migrations() -> None:  # Онлайн-миграции через асинхронный драйвер
+    engine = create_async_engine(_url(), poolclass=pool.NullPool)
+    async with engine.connect() as connection:
+        await connection.run_sync(do_run_migrations)
+    await engine.dispose()
+
+
+def run_migrations_online() -> None:  # Онлайн-режим: соединение от приложения (init_models) или собственное
+    connection = config.attributes.get("connection")
+    if connection is None:
+        asyncio.run(run_async_migrations())
+    else:
+        do_run_migrations(connection)
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,87 @@
+"""initial schema
+
+Revision ID: 0001_initial
+Revises:
+Create Date: 2026-10-18
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001_initial"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    existing = set(sa.inspect(op.get_bind()).get_table_names())  # Базы, созданные раньше через create_all, уже содержат таблицы
+    if "users" not in existing:
+        op.create_table(
+            "users",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("tg_id", sa.Integer(), nullable=False),
+            sa.Column("name", sa.String(255), nullable=True),
+            sa.Column("phone", sa.String(32), nullable=True),
+            sa.Column("address", sa.String(512), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+        )
+        op.create_index("ix_users_tg_id", "users", ["tg_id"], unique=True)
+    if "categories" not in existing:
+        op.create_table(
+            "categories",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("name", sa.String(255), nullable=False),
+        )
+        op.create_index("ix_categories_name", "categories", ["name"], unique=True)
+    if "products" not in existing:
+        op.create_table(
+            "products",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("title", sa.String(255), nullable=False),
+            sa.Column("description", sa.String(2048), nullable=False),
+            sa.Column("price_cents", sa.Integer(), nullable=False),
+            sa.Column("photo_url", sa.String(1024), nullable=True),
+            sa.Column("is_active", sa.Boolean(), nullable=False),
+            sa.Column("category_id", sa.Integer(), sa.ForeignKey("categories.id", ondelete="SET NULL"), nullable=True),
+        )
+        op.create_index("ix_products_title", "products", ["title"])
+    if "orders" not in existing:
+        op.create_table(
+            "orders",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="SET NULL"), nullable=True),
+            sa.Column("total_cents", sa.Integer(), nullable=False),
+            sa.Column("delivery_method", sa.String(64), nullable=False),
+            sa.Column("status", sa.String(32), nullable=False),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+            sa.Column("customer_name", sa.String(255), nullable=False),
+            sa.Column("customer_phone", sa.String(32), nullable=False),
+            sa.Column("customer_address", sa.String(512), nullable=False),
+            sa.Column("order_number", sa.String(32), nullable=False),
+        )
+        op.create_index("ix_orders_order_number", "orders", ["order_number"], unique=True)
+    if "cart_items" not in existing:
+        op.create_table(
+            "cart_items",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+            sa.Column("product_id", sa.Integer(), sa.ForeignKey("products.id", ondelete="CASCADE"), nullable=False),
+            sa.Column("quantity", sa.Integer(), nullable=False),
+            sa.UniqueConstraint("user_id", "product_id", name="uq_cart_user_product"),
+        )
+    if "order_items" not in existing:
+        op.create_table(
+            "order_items",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("order_id", sa.Integer(), sa.ForeignKey("orders.id", ondelete="CASCADE"), nullable=False),
+            sa.Column("product_id", sa.Integer(), sa.ForeignKey("products.id", ondelete="SET NULL"), nullable=True),
+            sa.Column("quantity", sa.Integer(), nullable=False),
+            sa.Column("price_cents", sa.Integer(), nullable=False),
+        )
+
+
+def downgrade() -> None:
+    for table in ("order_items", "cart_items", "orders", "products", "categories", "users"):
+        op.drop_table(table)
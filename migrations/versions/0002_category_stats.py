@@ -0,0 +1,35 @@
+"""category_stats counters
+
+Revision ID: 0002_category_stats
+Revises: 0001_initial
+Create Date: 2026-10-18
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002_category_stats"
+down_revision = "0001_initial"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if not sa.inspect(op.get_bind()).has_table("category_stats"):
+        op.create_table(
+            "category_stats",
+            sa.Column("category_id", sa.Integer(), sa.ForeignKey("categories.id", ondelete="CASCADE"), primary_key=True),
+            sa.Column("active_products", sa.Integer(), nullable=False),
+        )
+    op.execute(
+        "INSERT INTO category_stats (category_id, active_products) "
+        "SELECT category_id, count(*) FROM products "
+        "WHERE is_active AND category_id IS NOT NULL "
+        "AND category_id NOT IN (SELECT category_id FROM category_stats) "
+        "GROUP BY category_id"
+    )  # Первичное заполнение счётчиков
+
+
+def downgrade() -> None:
+    op.drop_table("category_stats")
@@ -0,0 +1,32 @@
+"""hot path composite and covering indexes
+
+Revision ID: 0003_hot_path_indexes
+Revises: 0002_category_stats
+Create Date: 2026-10-18
+"""
+from __future__ import annotations
+
+from alembic import op
+
+revision = "0003_hot_path_indexes"
+down_revision = "0002_category_stats"
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("ix_products_category_active_title", "products", ["category_id", "is_active", "title", "id"]),  # list_products (keyset)
+    ("ix_cart_items_user_product_qty", "cart_items", ["user_id", "product_id", "quantity"]),  # get_cart без чтения таблицы
+    ("ix_orders_status_created", "orders", ["status", "created_at", "id"]),  # list_orders по статусу
+    ("ix_orders_created", "orders", ["created_at", "id"]),  # list_orders без фильтра
+    ("ix_order_items_order_id", "order_items", ["order_id"]),  # Позиции заказа
+]
+
+
+def upgrade() -> None:
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, if_not_exists=True)
+
+
+def downgrade() -> None:
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,63 @@
+"""sales rollup tables
+
+Revision ID: 0004_sales_rollups
+Revises: 0003_hot_path_indexes
+Create Date: 2026-10-18
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004_sales_rollups"
+down_revision = "0003_hot_path_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "sales_daily",
+        sa.Column("day", sa.Date(), primary_key=True),
+        sa.Column("orders", sa.Integer(), nullable=False),
+        sa.Column("revenue_cents", sa.Integer(), nullable=False),
+    )
+    op.create_table(
+        "order_status_counts",
+        sa.Column("status", sa.String(32), primary_key=True),
+        sa.Column("orders", sa.Integer(), nullable=False),
+    )
+    op.create_table(
+        "product_sales",
+        sa.Column("product_id", sa.Integer(), sa.ForeignKey("products.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("units", sa.Integer(), nullable=False),
+        sa.Column("revenue_cents", sa.Integer(), nullable=False),
+    )
+    op.create_index("ix_product_sales_units", "product_sales", ["units"])
+    op.create_table(
+        "category_sales",
+        sa.Column("category_id", sa.Integer(), sa.ForeignKey("categories.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("units", sa.Integer(), nullable=False),
+        sa.Column("revenue_cents", sa.Integer(), nullable=False),
+    )
+    op.create_index("ix_category_sales_units", "category_sales", ["units"])
+    op.create_table(
+        "rollup_state",
+        sa.Column("name", sa.String(64), primary_key=True),
+        sa.Column("last_id", sa.Integer(), nullable=False),
+        sa.Column("upto_id", sa.Integer(), nullable=False),
+    )
+    op.execute(
+        "INSERT INTO rollup_state (name, last_id, upto_id) "
+        "SELECT 'sales', 0, max(id) FROM orders HAVING count(*) > 0"
+    )  # Уже существующие заказы досчитываются в фоне пачками, новые — при создании
+
+
+def downgrade() -> None:
+    op.drop_table("rollup_state")
+    op.drop_index("ix_category_sales_units", table_name="category_sales")
+    op.drop_table("category_sales")
+    op.drop_index("ix_product_sales_units", table_name="product_sales")
+    op.drop_table("product_sales")
+    op.drop_table("order_status_counts")
+    op.drop_table("sales_daily")
@@ -0,0 +1,26 @@
+"""products.sku for catalog import upserts
+
+Revision ID: 0005_product_sku
+Revises: 0004_sales_rollups
+Create Date: 2026-10-18
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005_product_sku"
+down_revision = "0004_sales_rollups"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("products", sa.Column("sku", sa.String(64), nullable=True))
+    op.create_index("ix_products_sku", "products", ["sku"], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_products_sku", table_name="products")
+    with op.batch_alter_table("products") as batch:
+        batch.drop_column("sku")
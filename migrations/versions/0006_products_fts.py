@@ -0,0 +1,45 @@
+"""products_fts full-text index (SQLite FTS5)
+
+Revision ID: 0006_products_fts
+Revises: 0005_product_sku
+Create Date: 2026-10-18
+"""
+from __future__ import annotations
+
+from alembic import op
+
+revision = "0006_products_fts"
+down_revision = "0005_product_sku"
+branch_labels = None
+depends_on = None
+
+STATEMENTS = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5("
+    "title, description, content='products', content_rowid='id', "
+    "prefix='2 3', tokenize='unicode61 remove_diacritics 2')",
+    "INSERT INTO products_fts(products_fts, rank) VALUES ('rank', 'bm25(10.0, 1.0)')",
+    "CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products WHEN new.is_active BEGIN "
+    "INSERT INTO products_fts(rowid, title, description) VALUES (new.id, new.title, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products WHEN old.is_active BEGIN "
+    "INSERT INTO products_fts(products_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE OF title, description, is_active ON products BEGIN "
+    "INSERT INTO products_fts(products_fts, rowid, title, description) "
+    "SELECT 'delete', old.id, old.title, old.description WHERE old.is_active; "
+    "INSERT INTO products_fts(rowid, title, description) SELECT new.id, new.title, new.description WHERE new.is_active; END",
+    "INSERT INTO products_fts(rowid, title, description) SELECT id, title, description FROM products WHERE is_active",  # Уже существующие товары
+]
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != "sqlite":  # FTS5 есть только в SQLite; на других СУБД поиск работает через LIKE
+        return
+    for statement in STATEMENTS:
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    for trigger in ("products_fts_ai", "products_fts_ad", "products_fts_au"):
+        op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    op.execute("DROP TABLE IF EXISTS products_fts")
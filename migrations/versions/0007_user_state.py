@@ -0,0 +1,28 @@
+"""user_state table for persisted conversation state
+
+Revision ID: 0007_user_state
+Revises: 0006_products_fts
+Create Date: 2026-10-18
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0007_user_state"
+down_revision = "0006_products_fts"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "user_state",
+        sa.Column("user_id", sa.Integer(), primary_key=True),
+        sa.Column("data", sa.LargeBinary(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("user_state")
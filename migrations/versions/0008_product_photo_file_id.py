@@ -0,0 +1,24 @@
+"""products.photo_file_id: Telegram file_id of the product photo
+
+Revision ID: 0008_product_photo_file_id
+Revises: 0007_user_state
+Create Date: 2026-10-18
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0008_product_photo_file_id"
+down_revision = "0007_user_state"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("products", sa.Column("photo_file_id", sa.String(255), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("products") as batch:
+        batch.drop_column("photo_file_id")
@@ -0,0 +1,19 @@
+import pytest
+
+from bot.query_budget import query_budget as _query_budget
+from bot.services.catalog_service import catalog_cache
+from bot.services.cart_service import user_id_cache
+
+
+@pytest.fixture(autouse=True)
+def _reset_process_caches():
+    catalog_cache.clear()
+    user_id_cache.clear()
+    yield
+    catalog_cache.clear()
+    user_id_cache.clear()
+
+
+@pytest.fixture
+def query_budget():  # with query_budget(engine, 2, "label"): ... — не больше 2 SQL-запросов в блоке
+    return _query_budget
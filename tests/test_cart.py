@@ -1,9 +1,10 @@
 import pytest
+from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 
 from bot.database import Base
-from bot.models import Product
-from bot.services.cart_service import CartService
+from bot.models import Product, User
+from bot.services.cart_service import CartService, user_id_cache
 
 @pytest.mark.asyncio
 async def test_add_and_change_cart():
@@ -28,4 +29,143 @@ async def test_add_and_change_cart():
         user = await cart.ensure_user(1)
         items = await cart.get_cart(user)
         assert items[0][1] == 3
-        assert cart.calculate_total(items) == 7500 
\ No newline at end of file
+        assert cart.calculate_total(items) == 7500 
+
+
+@pytest.mark.asyncio
+async def test_resolve_user_id_upserts_once_and_caches_after_commit():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    Session = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+
+    async with Session() as session:
+        await CartService(session).resolve_user_id(7)
+        await session.rollback()
+    assert 7 not in user_id_cache
+
+    async with Session() as session:
+        user_id = await CartService(session).resolve_user_id(7)
+        assert await CartService(session).resolve_user_id(7) == user_id
+        await session.commit()
+    assert user_id_cache.get(7) == user_id
+
+    user_id_cache.clear()
+    async with Session() as session:
+        assert await CartService(session).resolve_user_id(7) == user_id
+        assert (await session.execute(select(func.count()).select_from(User))).scalar_one() == 1
+        await session.commit()
+    assert user_id_cache.get(7) == user_id
+
+
+@pytest.mark.asyncio
+async def test_atomic_mutations_return_new_quantity():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    Session = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+
+    async with Session() as session:
+        session.add(Product(title="T", description="D", price_cents=100, is_active=True))
+        await session.commit()
+
+    async with Session() as session:
+        cart = CartService(session)
+        user_id = await cart.resolve_user_id(1)
+        assert await cart.add_to_cart(user_id, 1) == 1
+        assert await cart.add_to_cart(user_id, 1, 2) == 3
+        assert await cart.change_qty(user_id, 1, -1) == 2
+        assert await cart.change_qty(user_id, 1, -5) == 0
+        assert await cart.change_qty(user_id, 1, 1) == 0
+        assert await cart.get_cart(user_id) == []
+
+
+@pytest.mark.asyncio
+async def test_write_buffer_coalesces_presses_into_one_flush():
+    import asyncio
+    from bot.services.cart_buffer import CartWriteBuffer
+
+    flushed = []
+
+    async def flush(key, deltas, payload):
+        flushed.append((key, deltas, payload))
+
+    buffer = CartWriteBuffer(0.05, flush)
+    for delta in (1, 1, -1, 1):
+        await buffer.add(5, 10, delta, payload=delta)
+    await buffer.add(5, 11, -1, payload="a")
+    await buffer.add(5, 11, 1, payload="b")
+    await asyncio.sleep(0.1)
+    assert flushed == [(5, {10: (2, 0), 11: (0, -1)}, "b")]
+
+    await buffer.add(5, 10, 1)
+    await buffer.flush(5)
+    await asyncio.sleep(0.1)
+    assert len(flushed) == 2 and buffer.stats()["pending_users"] == 0
+
+
+@pytest.mark.asyncio
+async def test_change_qty_series_through_zero_removes_item():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    Session = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+
+    async with Session() as session:
+        session.add(Product(title="T", description="D", price_cents=100, is_active=True))
+        await session.commit()
+
+    async with Session() as session:
+        cart = CartService(session)
+        user_id = await cart.resolve_user_id(1)
+        await cart.add_to_cart(user_id, 1)
+        assert await cart.change_qty(user_id, 1, 0, low=-1) == 0
+        assert await cart.get_cart(user_id) == []
+
+
+@pytest.mark.asyncio
+async def test_cart_button_under_photo_card_sends_cart_as_new_message(monkeypatch):
+    import json
+    from telegram import Bot, Update
+    from telegram.request import BaseRequest
+    from bot.handlers import cart as cart_h
+    from bot.services.write_queue import WriteQueue
+
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    Session = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    async with Session() as session:
+        session.add(Product(title="Кепка", description="D", price_cents=2500, is_active=True))
+        cart = CartService(session)
+        await cart.add_to_cart(await cart.resolve_user_id(7), 1, 2)
+        await session.commit()
+    monkeypatch.setattr(cart_h, "ReadSessionLocal", Session)
+    monkeypatch.setattr(cart_h, "write_queue", WriteQueue(Session))
+
+    calls = []
+
+    class _Request(BaseRequest):  # Bot API: правка текста у фото — ошибка, как в Telegram
+        async def initialize(self):
+            pass
+
+        async def shutdown(self):
+            pass
+
+        async def do_request(self, url, method, request_data=None, *args, **kwargs):
+            name = url.rsplit("/", 1)[-1]
+            calls.append((name, request_data.parameters.get("text") if request_data else None))
+            if name == "editMessageText":
+                return 400, b'{"ok": false, "error_code": 400, "description": "Bad Request: there is no text in the message to edit"}'
+            chat = {"id": 7, "type": "private"}
+            return 200, json.dumps({"ok": True, "result": {"message_id": 2, "date": 0, "chat": chat, "text": "x"} if name == "sendMessage" else True}).encode()
+
+    card = {
+        "message_id": 1, "date": 0, "chat": {"id": 7, "type": "private"}, "caption": "Кепка",
+        "photo": [{"file_id": "AgAC", "file_unique_id": "u", "width": 800, "height": 800}],
+    }
+    query = {"id": "q", "chat_instance": "7", "data": "cart:view", "from": {"id": 7, "is_bot": False, "first_name": "U"}, "message": card}
+    update = Update.de_json({"update_id": 1, "callback_query": query}, Bot("1:x", request=_Request()))
+    await cart_h.cb_cart_view(update, None)
+    assert calls == [("answerCallbackQuery", None), ("sendMessage", "Ваша корзина. Итого: 50.00 ₽")]
+    await engine.dispose()
@@ -31,4 +31,99 @@ async def test_list_categories_and_products(tmp_path):
         assert len(cats) == 2
         products, total_pages = await service.list_products(c1.id, page=1)
         assert len(products) == PAGE_SIZE
-        assert total_pages == 2 
\ No newline at end of file
+        assert total_pages == 2 
+
+@pytest.mark.asyncio
+async def test_catalog_cache_hits_and_admin_invalidation():
+    from bot.services.admin_service import AdminService
+    from bot.services.catalog_service import catalog_cache
+
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    Session = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+
+    async with Session() as session:
+        product = await AdminService(session, []).add_product("Old", "D", 100, "A")
+        await session.commit()
+
+    async with Session() as session:
+        service = CatalogService(session)
+        assert [c.name for c in await service.list_categories()] == ["A"]
+        assert (await service.get_product(product.id)).title == "Old"
+        await service.list_products(product.category_id)
+    misses = catalog_cache.stats()["misses"]
+
+    async with Session() as session:
+        service = CatalogService(session)
+        await service.list_categories()
+        await service.get_product(product.id)
+        await service.list_products(product.category_id)
+    assert catalog_cache.stats()["misses"] == misses
+    assert catalog_cache.stats()["hits"] == 3
+
+    async with Session() as session:
+        await AdminService(session, []).edit_product(product.id, "title", "New")
+        await session.rollback()
+    async with Session() as session:
+        assert (await CatalogService(session).get_product(product.id)).title == "Old"
+
+    async with Session() as session:
+        await AdminService(session, []).edit_product(product.id, "title", "New")
+        await session.commit()
+    async with Session() as session:
+        service = CatalogService(session)
+        assert (await service.get_product(product.id)).title == "New"
+        products, _ = await service.list_products(product.category_id)
+        assert [p.title for p in products] == ["New"]
+
+    async with Session() as session:  # Страница в кэше хранит полные снимки — цена и фото тоже инвалидируют её
+        await AdminService(session, []).edit_product(product.id, "price", "2.5")
+        await AdminService(session, []).edit_product(product.id, "photo", "https://x/1.jpg")
+        await session.commit()
+    async with Session() as session:
+        products, _ = await CatalogService(session).list_products(product.category_id)
+        assert (products[0].price_cents, products[0].photo_url) == (250, "https://x/1.jpg")
+        assert await CatalogService(session).save_photo_file_id(product.id, "https://x/1.jpg", "AgAC")
+        await session.commit()
+    async with Session() as session:
+        products, _ = await CatalogService(session).list_products(product.category_id)
+        assert products[0].photo_file_id == "AgAC"
+
+
+@pytest.mark.asyncio
+async def test_keyset_pages_and_maintained_counts():
+    from bot.models import CategoryStats
+
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    Session = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+
+    async with Session() as session:
+        cat = Category(name="A")
+        session.add(cat)
+        await session.flush()
+        session.add_all(
+            Product(title=f"P{i:02d}", description="D", price_cents=100, category_id=cat.id, is_active=True)
+            for i in range(PAGE_SIZE * 2 + 1)
+        )
+        await session.commit()
+
+    async with Session() as session:
+        assert (await session.get(CategoryStats, cat.id)).active_products == PAGE_SIZE * 2 + 1
+        service = CatalogService(session)
+        page1, total_pages = await service.list_products(cat.id, 1)
+        page2, _ = await service.list_products(cat.id, 2, after_id=page1[-1].id)
+        page3, _ = await service.list_products(cat.id, 3, after_id=page2[-1].id)
+        back, _ = await service.list_products(cat.id, 2, before_id=page3[0].id)
+        offset2, _ = await service.list_products(cat.id, 2)
+        assert total_pages == 3
+        assert [p.title for p in page2] == [f"P{i:02d}" for i in range(PAGE_SIZE, PAGE_SIZE * 2)]
+        assert [p.title for p in page3] == [f"P{PAGE_SIZE * 2:02d}"]
+        assert back == page2 == offset2
+
+        page1_products = await session.get(Product, page1[0].id)
+        page1_products.is_active = False
+        await session.commit()
+        assert await service.count_active_products(cat.id) == PAGE_SIZE * 2
@@ -0,0 +1,108 @@
+import json
+
+import pytest
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+
+from bot.database import Base
+from bot.models import CategoryStats, Product
+from bot.services import import_service
+from bot.services.catalog_service import CatalogService
+from bot.services.import_service import CatalogImporter, iter_csv_rows, iter_json_rows
+from bot.services.write_queue import WriteQueue
+
+
+@pytest.mark.asyncio
+async def test_readers_stream_across_chunk_boundaries(tmp_path, monkeypatch):
+    monkeypatch.setattr(import_service, "READ_CHUNK", 7)
+    csv_path = tmp_path / "feed.csv"
+    csv_path.write_text('SKU;Title;Description\nA1;Чай;"многострочное\nописание; с ""кавычками"""\n\nA2;Кофе;x\n', encoding="utf-8")
+    rows = [row async for row in iter_csv_rows(csv_path)]
+    assert rows == [
+        (1, {"sku": "A1", "title": "Чай", "description": 'многострочное\nописание; с "кавычками"'}),
+        (2, {"sku": "A2", "title": "Кофе", "description": "x"}),
+    ]
+
+    stray_path = tmp_path / "stray.csv"  # Кавычка внутри поля без кавычек не открывает поле — дальше разбор не должен сбиться
+    stray_path.write_text('sku,title\nP1,Pizza 12" big\nP2,"line 1\nline 2, long enough to cross chunks"\nP3,x\n', encoding="utf-8")
+    assert [row async for _, row in iter_csv_rows(stray_path)] == [
+        {"sku": "P1", "title": 'Pizza 12" big'},
+        {"sku": "P2", "title": "line 1\nline 2, long enough to cross chunks"},
+        {"sku": "P3", "title": "x"},
+    ]
+
+    json_path = tmp_path / "feed.json"
+    json_path.write_text(json.dumps([{"title": "Чай", "price": 1.5}, {"title": "Кофе [x]", "price": 2}], ensure_ascii=False))
+    assert [obj["title"] async for _, obj in iter_json_rows(json_path)] == ["Чай", "Кофе [x]"]
+
+    jsonl_path = tmp_path / "feed.jsonl"
+    jsonl_path.write_text('{"title": "A"}\n{"title": "B"}\n{"title": ')
+    with pytest.raises(ValueError):
+        [obj async for _, obj in iter_json_rows(jsonl_path)]
+
+
+@pytest.mark.asyncio
+async def test_import_upserts_by_sku_and_keeps_counters_and_cache(tmp_path):
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    Session = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    queue = WriteQueue(Session)
+
+    first = tmp_path / "first.csv"
+    first.write_text(
+        "sku,title,description,price,category,active\n"
+        "A1,Чай,D,\"1,50\",Напитки,1\n"
+        "A2,Кофе,D,2,Напитки,1\n"
+        ",Без артикула,D,3,Еда,yes\n"
+        "A3,,D,4,Еда,1\n"
+        "A4,Скрытый,D,5,Еда,0\n",
+        encoding="utf-8",
+    )
+    progress = []
+
+    async def on_progress(report):
+        progress.append(report.rows)
+
+    report = await CatalogImporter(queue, batch_size=2).run(first, on_progress)
+    assert (report.rows, report.inserted, report.updated, report.skipped, report.categories) == (5, 4, 0, 1, 2)
+    assert report.errors == ["запись 4: нет title"]
+    assert progress == [2, 5]
+
+    async with Session() as session:
+        catalog = CatalogService(session)
+        drinks = {c.name: c.id for c in await catalog.list_categories()}
+        page, _ = await catalog.list_products(drinks["Напитки"])
+        assert [(p.title, p.price_cents) for p in page] == [("Кофе", 200), ("Чай", 150)]
+
+    second = tmp_path / "second.jsonl"
+    second.write_text(
+        '{"sku": "A1", "title": "Чай зелёный", "price_cents": 170, "category": "Еда"}\n'
+        '{"sku": "A5", "title": "Сок", "price": 3, "category": "Напитки"}\n',
+        encoding="utf-8",
+    )
+    report = await CatalogImporter(queue).run(second)
+    assert (report.inserted, report.updated, report.categories) == (1, 1, 0)
+
+    async with Session() as session:
+        catalog = CatalogService(session)
+        page, _ = await catalog.list_products(drinks["Напитки"])  # Кэш страницы инвалидирован импортом
+        assert [p.title for p in page] == ["Кофе", "Сок"]
+        counters = dict((await session.execute(select(CategoryStats.category_id, CategoryStats.active_products))).all())
+        assert counters == {drinks["Напитки"]: 2, drinks["Еда"]: 2}
+        assert (await session.execute(select(Product.price_cents).where(Product.sku == "A1"))).scalar_one() == 170
+
+    async with Session() as session:  # Фото, уже загруженные в Telegram
+        await session.execute(update(Product).where(Product.sku.in_(["A1", "A2"])).values(photo_file_id="AgAC"))
+        await session.commit()
+    third = tmp_path / "third.jsonl"
+    third.write_text(
+        '{"sku": "A1", "title": "Чай зелёный", "price_cents": 180, "category": "Еда"}\n'
+        '{"sku": "A2", "title": "Кофе", "price": 2, "category": "Напитки", "photo_url": "https://x/2.jpg"}\n',
+        encoding="utf-8",
+    )
+    await CatalogImporter(queue).run(third)
+    async with Session() as session:
+        file_ids = dict((await session.execute(select(Product.sku, Product.photo_file_id).where(Product.sku.in_(["A1", "A2"])))).all())
+    assert file_ids == {"A1": "AgAC", "A2": None}  # URL сменился — file_id сброшен
+    await engine.dispose()
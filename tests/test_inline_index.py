@@ -0,0 +1,72 @@
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+
+from bot.database import Base
+from bot.services import inline_index
+from bot.services.admin_service import AdminService
+from bot.services.catalog_service import ProductCard
+from bot.services.import_service import CatalogImporter
+from bot.services.inline_index import ProductIndex, product_index
+from bot.services.write_queue import WriteQueue
+
+
+def _card(pid, title):
+    return ProductCard(id=pid, title=title, description="D", price_cents=100, photo_url=None, category_id=None)
+
+
+def test_prefix_lookup_and_paging(monkeypatch):
+    index = ProductIndex()
+    index.apply([_card(1, "Кроссовки Nike Air"), _card(2, "Кеды Converse"), _card(3, "Куртка зелёная"), _card(4, "Nike Nike носки")])
+    assert [p.id for p in index.search("кр")[0]] == [1]
+    assert [p.id for p in index.search("nik")[0]] == [4, 1]  # Повтор слова в названии не дублирует результат
+    assert [p.id for p in index.search("air NIK")[0]] == [1]  # Все слова — префиксы, порядок не важен
+    assert [p.id for p in index.search("зеленая")[0]] == [3]  # ё = е
+    assert index.search("!!!") == ([], None)
+
+    page, next_offset = index.search("к", 0, 2)
+    assert ([p.id for p in page], next_offset) == ([2, 1], 2)  # Внутри слова — по алфавиту названия
+    page, next_offset = index.search("к", next_offset, 2)
+    assert ([p.id for p in page], next_offset) == ([3], None)
+
+    index.apply([_card(2, "Ботинки")], removed=[1])  # Переименование и удаление
+    assert [p.id for p in index.search("к")[0]] == [3]
+    assert [p.id for p in index.search("бот")[0]] == [2]
+
+    monkeypatch.setattr(inline_index, "BULK_THRESHOLD", 1)  # Сборка массива срезами даёт тот же результат
+    index.apply([_card(5, "Кепка"), _card(3, "Куртка синяя")], removed=[4])
+    assert index._keys == sorted(entry for entries in index._entries.values() for entry in entries)
+    assert [p.id for p in index.search("к")[0]] == [5, 3]
+    assert index.search("nike") == ([], None)
+
+
+@pytest.mark.asyncio
+async def test_index_follows_committed_admin_changes_and_import(tmp_path):
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    Session = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    async with Session() as session:
+        admin = AdminService(session, [])
+        tea = await admin.add_product("Чай чёрный", "D", 100, "Напитки")
+        hidden = await admin.add_product("Чайник", "D", 900, "Посуда")
+        await admin.edit_product(hidden.id, "active", "0")
+        await session.commit()
+
+    async with Session() as session:
+        await product_index.load(session)
+    assert [p.title for p in product_index.search("чай")[0]] == ["Чай чёрный"]
+
+    async with Session() as session:
+        admin = AdminService(session, [])
+        await admin.edit_product(tea.id, "title", "Чай зелёный")
+        await session.rollback()  # Откат — индекс не меняется
+        await admin.edit_product(tea.id, "price", "2")
+        await admin.edit_product(hidden.id, "active", "1")
+        await session.commit()
+    found, _ = product_index.search("чай")
+    assert [(p.title, p.price_cents) for p in found] == [("Чай чёрный", 200), ("Чайник", 900)]
+
+    feed = tmp_path / "feed.csv"
+    feed.write_text("sku,title,price,active\nT1,Чайный гриб,1,1\nT2,Чай скрытый,1,0\n", encoding="utf-8")
+    await CatalogImporter(WriteQueue(Session)).run(feed)
+    assert [p.title for p in product_index.search("чай")[0]] == ["Чай чёрный", "Чайник", "Чайный гриб"]
@@ -0,0 +1,88 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from telegram.ext import CommandHandler
+from telegram.request import BaseRequest
+
+from bot.metrics import Metrics, TimedRequest
+from bot.services.write_queue import WriteQueue
+
+
+class _FakeRequest(BaseRequest):
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def do_request(self, url, method, request_data=None, *args, **kwargs):
+        return (429 if url.endswith("sendPhoto") else 200), b'{"ok": true, "result": true}'
+
+
+@pytest.mark.asyncio
+async def test_handler_latency_db_and_api_costs_are_attributed_per_handler():
+    registry = Metrics()
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    registry.watch_engine(engine)
+    registry.watch_engine(engine)  # Повторная подписка не удваивает счёт
+    api = TimedRequest(_FakeRequest(), registry)
+
+    async def show(update, context):
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+            await conn.execute(text("SELECT 2"))
+        await api.do_request("https://api.telegram.org/bot1:x/sendMessage", "POST")
+
+    async def broken(update, context):
+        await api.do_request("https://api.telegram.org/bot1:x/sendPhoto", "POST")
+        raise RuntimeError("boom")
+
+    handler = registry.instrument(CommandHandler(["start", "catalog"], show))
+    failing = registry.instrument(CommandHandler("photo", broken))
+    for _ in range(3):
+        await handler.callback(None, None)
+    with pytest.raises(RuntimeError):
+        await failing.callback(None, None)
+    async with engine.connect() as conn:  # Вне хендлера — фоновый запрос
+        await conn.execute(text("SELECT 3"))
+    await engine.dispose()
+
+    stats = registry.handlers["/catalog|/start"]
+    assert (stats.latency.count, stats.queries, stats.api_calls, stats.errors) == (3, 6, 3, 0)
+    assert stats.db_seconds > 0 and registry.background_queries == 1
+    assert registry.handlers["/photo"].errors == 1 and registry.api_errors == {"sendPhoto": 1}
+    assert [row[:2] for row in registry.handler_report()] == [("/catalog|/start", 3), ("/photo", 1)]
+
+    body = registry.render()
+    assert 'bot_handler_seconds_bucket{handler="/catalog|/start",le="+Inf"} 3' in body
+    assert 'bot_db_queries_total{handler="/catalog|/start"} 6' in body
+    assert 'bot_db_queries_total{handler="background"} 1' in body
+    assert 'bot_api_seconds_count{method="sendMessage"} 3' in body
+    assert 'bot_api_errors_total{method="sendPhoto"} 1' in body
+
+
+@pytest.mark.asyncio
+async def test_write_jobs_are_attributed_to_the_submitting_handler(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'shop.db'}")
+    async with engine.begin() as conn:
+        await conn.execute(text("CREATE TABLE t (x INTEGER)"))
+    registry = Metrics()
+    registry.watch_engine(engine)
+    queue = WriteQueue(async_sessionmaker(engine))
+    await queue.start()
+
+    async def write(session):  # Задание выполняется в задаче писателя
+        await session.execute(text("INSERT INTO t VALUES (1)"))
+        await session.execute(text("INSERT INTO t VALUES (2)"))
+
+    async def add(update, context):
+        await queue.submit(write)
+
+    handler = registry.instrument(CommandHandler("add", add))
+    await handler.callback(None, None)
+    await queue.submit(write)  # Вне хендлера — фон
+    await queue.stop()
+    await engine.dispose()
+
+    assert registry.handlers["/add"].queries == 2
+    assert registry.background_queries == 2 + 2 * 2  # Задание вне хендлера и SAVEPOINT/RELEASE обоих заданий
@@ -1,8 +1,11 @@
+from datetime import date, datetime
+
 import pytest
+from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 
 from bot.database import Base
-from bot.models import Product
+from bot.models import Order, OrderItem, Product
 from bot.services.cart_service import CartService
 from bot.services.order_service import OrderService
 
@@ -35,4 +38,79 @@ async def test_create_order_clears_cart_and_generates_number():
         cart = CartService(session)
         user = await cart.ensure_user(42)
         items = await cart.get_cart(user)
-        assert items == [] 
\ No newline at end of file
+        assert items == [] 
+
+@pytest.mark.asyncio
+async def test_create_order_snapshots_prices_and_retries_number_collision(monkeypatch):
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    Session = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+
+    async with Session() as session:
+        session.add_all([
+            Product(title="X", description="D", price_cents=100, is_active=True),
+            Product(title="Y", description="D", price_cents=250, is_active=True),
+        ])
+        await session.commit()
+
+    numbers = iter(["N-1", "N-1", "N-2"])
+    monkeypatch.setattr(OrderService, "_generate_order_number", lambda self: next(numbers))
+
+    async with Session() as session:
+        cart = CartService(session)
+        first = await cart.resolve_user_id(1)
+        second = await cart.resolve_user_id(2)
+        await cart.add_to_cart(first, 1, 2)
+        await cart.add_to_cart(second, 1, 1)
+        await cart.add_to_cart(second, 2, 2)
+        order_service = OrderService(session)
+        await order_service.create_order(first, "A", "+1", "Addr", "Курьер")
+        order = await order_service.create_order(second, "B", "+2", "Addr", "Курьер")
+        await session.commit()
+
+    async with Session() as session:
+        saved = (await session.execute(select(Order).where(Order.id == order.id))).scalar_one()
+        items = (await session.execute(select(OrderItem).where(OrderItem.order_id == order.id))).scalars().all()
+        assert saved.order_number == "N-2"
+        assert saved.total_cents == 600
+        assert sorted((i.product_id, i.quantity, i.price_cents) for i in items) == [(1, 1, 100), (2, 2, 250)]
+
+@pytest.mark.asyncio
+async def test_list_orders_page_keyset_and_filters():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    Session = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+
+    async with Session() as session:
+        session.add(Product(title="X", description="D", price_cents=100, is_active=True))
+        cart = CartService(session)
+        user_id = await cart.resolve_user_id(1)
+        orders = OrderService(session)
+        for i in range(7):
+            await cart.add_to_cart(user_id, 1)
+            order = await orders.create_order(user_id, "N", "+1", "A", "Курьер")
+            await session.execute(
+                update(Order).where(Order.id == order.id).values(
+                    created_at=datetime(2024, 1, 1 + i // 2), status="done" if i % 2 else "new"
+                )
+            )
+        await session.commit()
+
+    async with Session() as session:
+        orders = OrderService(session)
+        first, has_newer, has_older = await orders.list_orders_page(limit=3)
+        assert [o.id for o in first] == [7, 6, 5] and not has_newer and has_older
+        second, has_newer, has_older = await orders.list_orders_page(after_id=first[-1].id, limit=3)
+        assert [o.id for o in second] == [4, 3, 2] and has_newer and has_older
+        last, _, has_older = await orders.list_orders_page(after_id=second[-1].id, limit=3)
+        assert [o.id for o in last] == [1] and not has_older
+        back, has_newer, has_older = await orders.list_orders_page(before_id=second[0].id, limit=3)
+        assert [o.id for o in back] == [7, 6, 5] and not has_newer and has_older
+
+        done, _, _ = await orders.list_orders_page("done", limit=10)
+        assert [o.id for o in done] == [6, 4, 2]
+        day, _, _ = await orders.list_orders_page(date_from=date(2024, 1, 2), date_to=date(2024, 1, 3), limit=10)
+        assert [o.id for o in day] == [6, 5, 4, 3]
+        assert set(first[0]._fields) == {"id", "order_number", "status", "total_cents", "created_at"}
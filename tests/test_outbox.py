@@ -0,0 +1,192 @@
+import asyncio
+from time import monotonic
+
+import pytest
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from telegram.error import Forbidden, RetryAfter
+
+from bot.database import Base
+from bot.models import Broadcast, Order, OutboxMessage, User
+from bot.services.order_service import OrderService
+from bot.services.outbox import OutboxSender, TokenBucket, _Batch, enqueue_message, start_broadcast
+from bot.services.write_queue import WriteQueue
+
+
+class _FakeBot:  # Bot API: первый вызов упирается в лимит, чат 150 заблокировал бота
+    def __init__(self):
+        self.sent: list[tuple[int, str]] = []
+        self.limited = False
+
+    async def send_message(self, chat_id, text):
+        if not self.limited:
+            self.limited = True
+            raise RetryAfter(0)
+        if chat_id == 150:
+            raise Forbidden("Forbidden: bot was blocked by the user")
+        await asyncio.sleep(0.001)
+        self.sent.append((chat_id, text))
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_limits_rate():
+    bucket = TokenBucket(rate=1000)
+    started = monotonic()
+    await asyncio.gather(*(bucket.acquire() for _ in range(1500)))  # 1000 сразу, ещё 500 — за 0,5 с
+    assert monotonic() - started >= 0.45
+
+
+@pytest.mark.asyncio
+async def test_broadcast_resumes_from_cursor_and_status_notification_is_sent(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'outbox.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    Session = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    async with Session() as session:
+        session.add_all(User(id=i, tg_id=i) for i in range(1, 301))
+        session.add(Order(id=1, user_id=5, total_cents=100, delivery_method="Курьер", customer_name="N",
+                          customer_phone="+1", customer_address="A", order_number="N-1"))
+        await session.commit()
+
+    queue = WriteQueue(Session)
+    sender = OutboxSender(queue, Session, rate=1000, chat_interval=0, senders=4, batch_size=50)
+    async with Session() as session:
+        broadcast_id = await start_broadcast(session, "Скидки", admin_chat_id=1000)
+        await session.execute(update(Broadcast).values(last_user_id=100, sent=100))  # Прошлый запуск успел отправить первым 100
+        assert await OrderService(session).set_status(1, "shipped")
+        await session.commit()
+
+    bot = _FakeBot()
+    await sender.start(bot)
+    for _ in range(500):
+        async with Session() as session:
+            done = (await session.execute(select(Broadcast.status).where(Broadcast.id == broadcast_id))).scalar_one() == "done"
+            left = (await session.execute(select(OutboxMessage.id))).first()
+        if done and left is None:
+            break
+        await asyncio.sleep(0.01)
+    await sender.stop()
+
+    promo = sorted(chat for chat, text in bot.sent if text == "Скидки")
+    assert promo == [i for i in range(101, 301) if i != 150]  # Каждому оставшемуся ровно одно сообщение
+    assert (5, "Статус заказа N-1: shipped") in bot.sent
+    assert (1000, f"Рассылка #{broadcast_id} завершена: доставлено 299, не доставлено 1") in bot.sent
+    assert sender.throttled == 1 and sender.failed == 1
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_failed_checkpoint_is_retried_before_broadcast_finishes(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'outbox.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    Session = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    async with Session() as session:
+        session.add_all(User(id=i, tg_id=i) for i in range(1, 4))
+        broadcast_id = await start_broadcast(session, "Скидки", admin_chat_id=1000)
+        await session.commit()
+
+    class _FlakyQueue(WriteQueue):  # Первая запись курсора падает (сбой БД)
+        failed = False
+
+        async def submit(self, job):
+            if "_checkpoint" in job.__qualname__ and not self.failed:
+                self.failed = True
+                raise RuntimeError("database is locked")
+            return await super().submit(job)
+
+    queue = _FlakyQueue(Session)
+    sender = OutboxSender(queue, Session, rate=1000, chat_interval=0, senders=1)
+    bot = _FakeBot()
+    bot.limited = True
+    await sender.start(bot)
+    for _ in range(300):
+        if (1000, f"Рассылка #{broadcast_id} завершена: доставлено 3, не доставлено 0") in bot.sent:
+            break
+        await asyncio.sleep(0.01)
+    await sender.stop()
+
+    assert queue.failed
+    assert (1000, f"Рассылка #{broadcast_id} завершена: доставлено 3, не доставлено 0") in bot.sent
+    async with Session() as session:
+        assert (await session.execute(select(Broadcast.last_user_id).where(Broadcast.id == broadcast_id))).scalar_one() == 3
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_later_checkpoint_saves_batches_of_failed_one_and_cursor_never_moves_back(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'outbox.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    Session = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    async with Session() as session:
+        session.add_all(User(id=i, tg_id=i) for i in range(1, 9))
+        broadcast_id = await start_broadcast(session, "Скидки", admin_chat_id=1000)
+        await session.commit()
+
+    class _FlakyQueue(WriteQueue):  # Запись курсора первой пачки падает, второй — проходит
+        checkpoints = 0
+
+        async def submit(self, job):
+            if "_checkpoint" in job.__qualname__:
+                self.checkpoints += 1
+                if self.checkpoints == 1:
+                    raise RuntimeError("database is locked")
+            return await super().submit(job)
+
+    queue = _FlakyQueue(Session)
+    sender = OutboxSender(queue, Session, rate=1000, chat_interval=0, senders=1)  # capacity 4: пачки 1–4 и 5–8
+    bot = _FakeBot()
+    bot.limited = True
+    await sender.start(bot)
+    for _ in range(300):
+        if (1000, f"Рассылка #{broadcast_id} завершена: доставлено 8, не доставлено 0") in bot.sent:
+            break
+        await asyncio.sleep(0.01)
+    await sender.stop()
+    assert queue.checkpoints == 2  # Вторая запись сохранила обе пачки, отдельного повтора не понадобилось
+    assert (1000, f"Рассылка #{broadcast_id} завершена: доставлено 8, не доставлено 0") in bot.sent
+
+    sender._batches.append(_Batch(broadcast_id, 4, 0))  # Запоздалая запись более ранней пачки
+    await sender._checkpoint()
+    async with Session() as session:
+        assert (await session.execute(select(Broadcast.last_user_id).where(Broadcast.id == broadcast_id))).scalar_one() == 8
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_notification_is_not_resent_when_its_row_delete_fails(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'outbox.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    Session = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    async with Session() as session:
+        enqueue_message(session, 5, "Заказ принят")
+        await session.commit()
+
+    class _FlakyQueue(WriteQueue):  # Первое удаление строки outbox падает
+        failed = False
+
+        async def submit(self, job):
+            if "_done" in job.__qualname__ and not self.failed:
+                self.failed = True
+                raise RuntimeError("database is locked")
+            return await super().submit(job)
+
+    queue = _FlakyQueue(Session)
+    sender = OutboxSender(queue, Session, rate=1000, chat_interval=0, senders=2)
+    bot = _FakeBot()
+    bot.limited = True
+    await sender.start(bot)
+    for _ in range(300):
+        async with Session() as session:
+            left = (await session.execute(select(OutboxMessage.id))).first()
+        if queue.failed and left is None:
+            break
+        await asyncio.sleep(0.01)
+    await asyncio.sleep(0.05)  # Повторная отправка, если бы она была, успела бы случиться
+    await sender.stop()
+
+    assert queue.failed and left is None
+    assert bot.sent == [(5, "Заказ принят")]
+    await engine.dispose()
@@ -0,0 +1,52 @@
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+
+from bot.database import Base
+from bot.models import UserState
+from bot.persistence import DatabasePersistence
+from bot.services.write_queue import WriteQueue
+
+
+@pytest.mark.asyncio
+async def test_user_data_is_loaded_lazily_and_only_changed_users_are_written(query_budget):
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    Session = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+
+    first = DatabasePersistence(WriteQueue(Session), Session)
+    for user_id in range(1, 5):
+        await first.refresh_user_data(user_id, {})  # PTB читает состояние перед обработкой обновления
+    for user_id in range(1, 4):
+        await first.update_user_data(user_id, {"state": "phone", "searches": {user_id: "чай"}})
+    await first.update_user_data(4, {})  # Пустое состояние строки не создаёт
+    await first.flush()
+    assert first.stats()["writes"] == 3
+
+    restarted = DatabasePersistence(WriteQueue(Session), Session)
+    with query_budget(engine, 0, "startup"):
+        assert await restarted.get_user_data() == {}
+    data = {}
+    with query_budget(engine, 1, "first update of user 2"):
+        await restarted.refresh_user_data(2, data)
+    assert data == {"state": "phone", "searches": {2: "чай"}}
+    with query_budget(engine, 0, "next updates of user 2"):
+        await restarted.refresh_user_data(2, data)
+
+    with query_budget(engine, 0, "unchanged user_data"):
+        await restarted.update_user_data(2, dict(data))
+        await restarted.flush()
+    await restarted.refresh_user_data(3, {})
+    await restarted.update_user_data(2, {**data, "state": "address"})
+    await restarted.update_user_data(3, {})  # Диалог завершён — строка удаляется
+    await restarted.flush()
+    assert restarted.stats()["writes"] == 2 and restarted.stats()["flushes"] == 1
+
+    async with Session() as session:
+        rows = (await session.execute(select(UserState.user_id).order_by(UserState.user_id))).scalars().all()
+    assert rows == [1, 2]
+    data = {}
+    await DatabasePersistence(WriteQueue(Session), Session).refresh_user_data(2, data)
+    assert data["state"] == "address"
+    await engine.dispose()
@@ -0,0 +1,101 @@
+from dataclasses import replace
+from datetime import datetime
+
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from telegram import Chat, Message, PhotoSize
+from telegram.error import BadRequest, RetryAfter
+
+from bot.database import Base
+from bot.models import Category, Product
+from bot.services.admin_service import AdminService
+from bot.services.catalog_service import CatalogService
+from bot.services.photo_service import send_product_photo, warm_category_photos
+from bot.services.write_queue import WriteQueue
+
+
+def _photo_message(message_id: int, file_id: str) -> Message:
+    photo = (PhotoSize(file_id + "-s", file_id + "-su", 90, 90), PhotoSize(file_id, file_id + "-u", 800, 800))
+    return Message(message_id, datetime.now(), Chat(1, Chat.PRIVATE), photo=photo)
+
+
+class _FakeBot:  # Bot API для прогрева: один URL битый, первый вызов упирается в лимит
+    def __init__(self):
+        self.sent: list[str] = []
+        self.deleted: list[int] = []
+        self.limited = False
+
+    async def send_photo(self, chat_id, photo, disable_notification=None):
+        if not self.limited:
+            self.limited = True
+            raise RetryAfter(0)
+        if "broken" in photo:
+            raise BadRequest("Failed to get HTTP URL content")
+        self.sent.append(photo)
+        return _photo_message(len(self.sent), f"file-{photo}")
+
+    async def delete_message(self, chat_id, message_id):
+        self.deleted.append(message_id)
+
+
+async def _catalog():  # Категория с товарами: с фото, с битым URL, без фото
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    Session = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    async with Session() as session:
+        session.add(Category(id=1, name="Чай"))
+        session.add_all(
+            Product(id=i, title=f"T{i}", description="D", price_cents=100, category_id=1, photo_url=url, is_active=True)
+            for i, url in [(1, "https://x/1.jpg"), (2, "https://x/broken.jpg"), (3, None), (4, "https://x/4.jpg")]
+        )
+        await session.commit()
+    return engine, Session
+
+
+@pytest.mark.asyncio
+async def test_first_send_stores_file_id_and_later_sends_reuse_it():
+    engine, Session = await _catalog()
+    queue = WriteQueue(Session)
+    sent: list[str] = []
+
+    async def send(photo):
+        sent.append(photo)
+        if photo == "stale":
+            raise BadRequest("Wrong file identifier/http url specified")
+        return _photo_message(len(sent), "AgAC-1")
+
+    async with Session() as session:
+        product = await CatalogService(session).get_product(1)
+    await send_product_photo(product, send, queue)  # Первый показ: URL, file_id запоминается и кэш карточки сбрасывается
+    async with Session() as session:
+        product = await CatalogService(session).get_product(1)
+    assert product.photo_file_id == "AgAC-1"
+    await send_product_photo(product, send, queue)
+    assert sent == ["https://x/1.jpg", "AgAC-1"]
+
+    await send_product_photo(replace(product, photo_file_id="stale"), send, queue)  # Telegram не принял file_id — URL и новый file_id
+    assert sent[-2:] == ["stale", "https://x/1.jpg"]
+
+    async def edit(session):
+        return await AdminService(session, []).edit_product(1, "photo", "https://x/new.jpg")
+
+    await queue.submit(edit)  # Новое фото — старый file_id не годится
+    async with Session() as session:
+        product = await CatalogService(session).get_product(1)
+    assert (product.photo_url, product.photo_file_id) == ("https://x/new.jpg", None)
+    assert not await queue.submit(lambda s: CatalogService(s).save_photo_file_id(1, "https://x/1.jpg", "late"))  # Гонка со сменой URL
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_warm_category_uploads_missing_photos_and_skips_broken():
+    engine, Session = await _catalog()
+    bot = _FakeBot()
+    report = await warm_category_photos(bot, 1, 1, WriteQueue(Session), Session, delay=0)
+    assert (report.total, report.warmed, report.failed) == (3, 2, 1)
+    assert bot.sent == ["https://x/1.jpg", "https://x/4.jpg"] and bot.deleted == [1, 2]
+    async with Session() as session:
+        assert await CatalogService(session).photos_to_warm(1) == [(2, "https://x/broken.jpg")]
+        assert (await CatalogService(session).get_product(4)).photo_file_id == "file-https://x/4.jpg"
+    await engine.dispose()
@@ -0,0 +1,68 @@
+import pytest
+from sqlalchemy import select, text
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+
+from bot.database import Base
+from bot.models import Category, Product
+from bot.query_budget import QueryBudgetExceeded
+from bot.services.cart_service import CartService
+from bot.services.catalog_service import CatalogCache, CatalogService, rebuild_category_stats
+from bot.services.order_service import OrderService
+
+
+async def _shop():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    Session = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    async with Session() as session:
+        session.add(Category(name="C"))
+        await session.flush()
+        session.add_all(Product(title=f"T{i}", description="D", price_cents=100, category_id=1) for i in range(20))
+        await rebuild_category_stats(session)
+        await session.commit()
+    return engine, Session
+
+
+@pytest.mark.asyncio
+async def test_hot_paths_stay_within_query_budget(query_budget):
+    engine, Session = await _shop()
+    async with Session() as session:
+        catalog = CatalogService(session, CatalogCache(100))
+        with query_budget(engine, 2, "list_products"):
+            await catalog.list_products(1, 1)
+        with query_budget(engine, 0, "list_products (cached)"):
+            await catalog.list_products(1, 1)
+        with query_budget(engine, 2, "list_products keyset"):
+            await catalog.list_products(1, 2, after_id=6)
+        with query_budget(engine, 1, "get_product"):
+            await catalog.get_product(3)
+
+    for items in (1, 10):  # Число запросов оформления не зависит от размера корзины
+        async with Session() as session:
+            cart = CartService(session)
+            user_id = await cart.resolve_user_id(100 + items)
+            for product_id in range(1, items + 1):
+                with query_budget(engine, 1, "add_to_cart"):
+                    await cart.add_to_cart(user_id, product_id)
+            with query_budget(engine, 1, "get_cart"):
+                await cart.get_cart(user_id)
+            with query_budget(engine, 7, f"create_order ({items} items)"):
+                await OrderService(session).create_order(user_id, "N", "+70000000000", "A", "Курьер")
+            await session.commit()
+
+    async with Session() as session:
+        with query_budget(engine, 1, "list_orders"):
+            orders = await OrderService(session).list_orders()
+        with pytest.raises(InvalidRequestError):  # raiseload: позиции не подгружаются по одной на заказ
+            orders[0].items
+        products = (await session.execute(select(Product).limit(3))).scalars().all()
+        with pytest.raises(QueryBudgetExceeded) as exc:
+            with query_budget(engine, 1, "per-row lookups"):
+                for product in products:
+                    await session.execute(text("SELECT name FROM categories WHERE id = :id"), {"id": product.category_id})
+    report = str(exc.value)
+    assert report.startswith("per-row lookups: 3 SQL statements, budget 1")
+    assert "SELECT name FROM categories WHERE id = ?  [x3, possible N+1]" in report
+    await engine.dispose()
@@ -0,0 +1,100 @@
+import re
+from datetime import date
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+
+from bot.database import _upgrade_schema
+from bot.services.admin_service import AdminService
+from bot.services.cart_service import CartService
+from bot.services.catalog_service import CatalogService
+from bot.services.import_service import CatalogImporter
+from bot.services.order_service import OrderService
+from bot.services.search_service import SearchService
+from bot.services.stats_service import StatsService
+from bot.services.write_queue import WriteQueue
+
+BAD_PLAN = re.compile(r"^SCAN (?!CONSTANT ROW|anon_)\S+$|USE TEMP B-TREE FOR (?!GROUP BY)")  # Полный проход без индекса или сортировка в памяти
+# GROUP BY во временном B-дереве допустим: вход ограничен диапазоном ключа (полный проход поймает SCAN)
+# Проход по подзапросу (anon_N) допустим: план самого подзапроса проверяется отдельными строками
+
+
+async def _run_service_queries(Session, tmp_path):
+    async with Session() as session:
+        admin = AdminService(session, [])
+        await admin.add_category("Empty")
+        products = [await admin.add_product(f"P{i}", "D", 100 + i, "A") for i in range(10)]
+        await admin.edit_product(products[0].id, "price", "5")
+        await admin.edit_product(products[1].id, "category", "B")
+        await session.commit()
+
+    async with Session() as session:
+        catalog = CatalogService(session)
+        category_id = products[2].category_id
+        await catalog.list_categories()
+        page, _ = await catalog.list_products(category_id, 1)
+        await catalog.list_products(category_id, 2, after_id=page[-1].id)
+        await catalog.list_products(category_id, 1, before_id=page[-1].id)
+        await catalog.list_products(category_id, 2)
+        await catalog.get_product(products[3].id)
+        await SearchService(session).search("P1", 2)
+
+        cart = CartService(session)
+        user_id = await cart.resolve_user_id(1)
+        await cart.add_to_cart(user_id, products[2].id, 2)
+        await cart.add_to_cart(user_id, products[3].id)
+        await cart.change_qty(user_id, products[2].id, 1)
+        await cart.change_qty(user_id, products[3].id, -1)
+        await cart.remove_from_cart(user_id, products[4].id)
+        await cart.get_cart(user_id)
+
+        orders = OrderService(session)
+        order = await orders.create_order(user_id, "N", "+1", "A", "Курьер")
+        await orders.set_status(order.id, "paid")
+        await orders.list_orders()
+        await orders.list_orders("paid")
+        for _ in range(3):
+            await cart.add_to_cart(user_id, products[2].id)
+            await orders.create_order(user_id, "N", "+1", "A", "Курьер")
+        await orders.list_orders_page(limit=2)
+        await orders.list_orders_page(after_id=order.id, limit=2)
+        await orders.list_orders_page(before_id=order.id, limit=2)
+        await orders.list_orders_page("new", date.today(), date.today(), after_id=order.id, limit=2)
+        await orders.list_orders_page(date_from=date.today(), before_id=order.id, limit=2)
+        await StatsService(session).report()
+        await session.commit()
+
+    feed = tmp_path / "feed.csv"
+    feed.write_text("sku,title,description,price,category\nS1,T1,D,1,A\nS2,T2,D,2,New\n,T3,D,3,A\n", encoding="utf-8")
+    await CatalogImporter(WriteQueue(Session)).run(feed)
+    await CatalogImporter(WriteQueue(Session)).run(feed)
+
+
+@pytest.mark.asyncio
+async def test_service_queries_use_indexes(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'plans.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(_upgrade_schema)
+    Session = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+
+    statements = []
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().split(" ", 1)[0].upper() in {"SELECT", "INSERT", "UPDATE", "DELETE"}:
+            statements.append((statement, parameters))
+
+    await _run_service_queries(Session, tmp_path)
+    event.remove(engine.sync_engine, "before_cursor_execute", capture)
+    assert statements
+
+    offenders = []
+    async with engine.connect() as conn:
+        for statement, parameters in statements:
+            plan = await conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)
+            details = [row[-1] for row in plan]
+            if any(BAD_PLAN.search(detail) for detail in details):
+                offenders.append(f"{statement}\n  -> {details}")
+    await engine.dispose()
+    assert not offenders, "\n\n".join(offenders)
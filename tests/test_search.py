@@ -0,0 +1,67 @@
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+
+from bot.database import Base
+from bot.keyboards import PAGE_SIZE
+from bot.services.admin_service import AdminService
+from bot.services.search_service import SearchService, fts_query
+
+
+def test_fts_query_quotes_tokens():
+    assert fts_query('Чай OR "зелёный" -NEAR(') == '"чай" "or" "зелёный" "near"*'
+    assert fts_query("  ?! ") is None
+
+
+@pytest.mark.asyncio
+async def test_search_ranks_and_follows_product_changes():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    Session = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+
+    async with Session() as session:
+        admin = AdminService(session, [])
+        tea = await admin.add_product("Чай зелёный", "Листовой", 100, "Напитки")
+        await admin.add_product("Кружка", "Для чайной церемонии", 200, "Посуда")
+        hidden = await admin.add_product("Чайник", "Стальной", 300, "Посуда")
+        await admin.edit_product(hidden.id, "active", "0")
+        for i in range(PAGE_SIZE + 1):
+            await admin.add_product(f"Ложка {i}", "Чайная", 10, "Посуда")
+        await session.commit()
+
+    async with Session() as session:
+        search = SearchService(session)
+        found, pages = await search.search("чай")
+        assert found[0].title == "Чай зелёный"  # Совпадение в названии выше совпадений в описании
+        assert "Чайник" not in {p.title for p in found}
+        assert pages == 2
+        second, _ = await search.search("чай", 2)
+        assert len(found) + len(second) == PAGE_SIZE + 3
+        assert [p.title for p in (await search.search("ЧАЙ зел"))[0]] == ["Чай зелёный"]
+
+        admin = AdminService(session, [])
+        await admin.edit_product(tea.id, "title", "Улун")
+        await session.commit()
+        assert [p.title for p in (await search.search("улун"))[0]] == ["Улун"]
+        assert (await search.search("зелёный"))[0] == []
+
+
+@pytest.mark.asyncio
+async def test_search_ranks_only_newest_window_for_frequent_words(monkeypatch):
+    from bot.services import search_service
+
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    Session = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    async with Session() as session:
+        admin = AdminService(session, [])
+        for i in range(10):
+            await admin.add_product(f"Чай {i}", "D", 100, "Напитки")
+        await session.commit()
+
+    monkeypatch.setattr(search_service, "RANK_WINDOW", 4)
+    async with Session() as session:
+        found, pages = await SearchService(session).search("чай")
+    assert sorted(p.title for p in found) == ["Чай 6", "Чай 7", "Чай 8", "Чай 9"]
+    assert pages == search_service.MAX_RESULTS // PAGE_SIZE
@@ -0,0 +1,195 @@
+import asyncio
+import json
+import os
+import re
+import signal
+import socket
+import sys
+from pathlib import Path
+from urllib.parse import parse_qs
+
+import pytest
+
+from bot import peers
+from bot.services.catalog_service import ProductCard, catalog_cache, product_tag
+from bot.services.inline_index import product_index
+from bot.sharding import LocalClient, apply_event, encode_event, merge_metrics, shard_of
+from bot.webhook import read_request, write_response
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def _start(update_id: int, user_id: int) -> dict:  # Записанное обновление: /start от пользователя
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id, "date": 0, "text": "/start",
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "U"},
+            "entities": [{"type": "bot_command", "offset": 0, "length": 6}],
+        },
+    }
+
+
+class _FakeBotAPI:  # Bot API на 127.0.0.1: записанные обновления отдаются через getUpdates, ответы бота копятся в sent
+    def __init__(self, updates):
+        self.updates = list(updates)
+        self.sent: list[tuple[int, str]] = []
+        self.port = 0
+        self._new = asyncio.Event()
+        self._server = None
+        self._connections = set()
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self._server.close()
+        for writer in list(self._connections):
+            writer.close()
+        await asyncio.sleep(0)
+
+    def push(self, *updates):
+        self.updates += updates
+        self._new.set()
+
+    async def _handle(self, reader, writer):
+        self._connections.add(writer)
+        try:
+            while (request := await read_request(reader)) is not None:
+                _, target, _, body = request
+                params = {key: values[0] for key, values in parse_qs(body.decode()).items()}
+                result = await self._call(target.rsplit("/", 1)[-1], params)
+                write_response(writer, 200, json.dumps({"ok": True, "result": result}).encode(), headers={"Content-Type": "application/json"})
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._connections.discard(writer)
+            writer.close()
+
+    async def _call(self, method, params):
+        if method == "getMe":
+            return {"id": 42, "is_bot": True, "first_name": "Shop", "username": "shop_bot"}
+        if method == "getUpdates":
+            offset, timeout = int(params.get("offset", 0)), float(params.get("timeout", 0))
+            while True:
+                pending = [update for update in self.updates if update["update_id"] >= offset][: int(params.get("limit", 100))]
+                if pending or timeout <= 0:
+                    return pending
+                self._new.clear()
+                try:
+                    await asyncio.wait_for(self._new.wait(), 1)
+                except asyncio.TimeoutError:
+                    return []
+        if method == "sendMessage":
+            self.sent.append((int(params["chat_id"]), params["text"]))
+            chat = {"id": int(params["chat_id"]), "type": "private"}
+            return {"message_id": len(self.sent), "date": 0, "chat": chat, "text": params["text"]}
+        return True
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _until(condition, timeout: float, what: str, log: Path):  # Ждём условие; при неудаче показываем логи процессов
+    for _ in range(int(timeout / 0.1)):
+        result = condition()
+        if asyncio.iscoroutine(result):
+            result = await result
+        if result:
+            return result
+        await asyncio.sleep(0.1)
+    pytest.fail(f"Timed out waiting for {what}\n{log.read_text()[-4000:]}")
+
+
+def test_shard_key_is_user_then_chat():
+    message = _start(1, 7)
+    callback = {"update_id": 2, "callback_query": {"id": "1", "from": {"id": 8}, "chat_instance": "c", "message": {"chat": {"id": 99}}}}
+    inline = {"update_id": 3, "inline_query": {"id": "1", "from": {"id": 9}, "query": "", "offset": ""}}
+    channel = {"update_id": 4, "channel_post": {"message_id": 1, "date": 0, "chat": {"id": -1001, "type": "channel"}}}
+    assert [shard_of(update, 4) for update in (message, callback, inline, channel)] == [3, 0, 1, -1001 % 4]
+    assert shard_of({"update_id": 5, "poll": {"id": "p"}}, 4) == 0  # Ни пользователя, ни чата
+
+
+def test_merge_metrics_labels_workers_and_keeps_families_together():
+    worker = (
+        "# HELP bot_handler_seconds Handler latency\n# TYPE bot_handler_seconds histogram\n"
+        'bot_handler_seconds_count{handler="/start"} {n}\n# TYPE bot_outbox_sent gauge\nbot_outbox_sent {n}\n'
+    )
+    lines = merge_metrics({0: worker.replace("{n}", "3"), 1: worker.replace("{n}", "5")})
+    assert lines == [
+        "# HELP bot_handler_seconds Handler latency", "# TYPE bot_handler_seconds histogram",
+        'bot_handler_seconds_count{worker="0",handler="/start"} 3', 'bot_handler_seconds_count{worker="1",handler="/start"} 5',
+        "# TYPE bot_outbox_sent gauge", 'bot_outbox_sent{worker="0"} 3', 'bot_outbox_sent{worker="1"} 5',
+    ]
+
+
+def test_peer_events_round_trip_to_local_caches():
+    received = []
+    peers.subscribe(lambda kind, payload: received.append(encode_event(kind, payload)))
+    try:
+        card = ProductCard(5, "Кепка", "D", 100, None, 1, "AgAC")
+        peers.publish(peers.CATALOG, (product_tag(5), "categories"))
+        peers.publish(peers.INDEX, ([card], [6]))
+    finally:
+        peers._subscribers.clear()
+    version = catalog_cache.version(product_tag(5))
+    apply_event(json.loads(received[0]))  # Как у соседнего воркера: теги снова кортежи
+    assert catalog_cache.version(product_tag(5)) == version + 1 and catalog_cache.version("categories") == 1
+    apply_event(json.loads(received[1]))
+    try:
+        assert product_index.search("кеп")[0] == [card]
+    finally:
+        product_index.apply(removed=[5])
+
+
+@pytest.mark.asyncio
+async def test_supervisor_routes_by_user_restarts_crashed_worker_and_drains(tmp_path):
+    api = _FakeBotAPI(_start(i, i) for i in range(1, 7))
+    await api.start()
+    metrics_port = _free_port()
+    env = {
+        **os.environ, "BOT_TOKEN": "123:ABC", "BOT_API_URL": f"http://127.0.0.1:{api.port}/bot", "UPDATE_MODE": "polling",
+        "DATABASE_URL": f"sqlite+aiosqlite:///{tmp_path / 'shop.db'}", "WORKERS": "2", "METRICS_PORT": str(metrics_port),
+        "SHARD_HEALTH_INTERVAL": "0.3", "ADMIN_IDS": "",
+    }
+    log = tmp_path / "bot.log"
+    with log.open("wb") as out:
+        process = await asyncio.create_subprocess_exec(sys.executable, "-m", "bot", cwd=ROOT, env=env, stdout=out, stderr=out)
+    try:
+        async def scrape():
+            client = LocalClient(metrics_port, timeout=2)
+            try:
+                status, body = await client.request("GET", "/metrics")
+            except OSError:
+                return ""
+            finally:
+                client.close()
+            return body.decode() if status == 200 else ""
+
+        async def handled(counts):
+            text = await scrape()
+            return text if all(f'bot_handler_seconds_count{{worker="{w}",handler="/start"}} {n}' in text for w, n in counts) else None
+
+        await _until(lambda: len(api.sent) == 6, 30, "replies to recorded updates", log)
+        text = await _until(lambda: handled([(0, 3), (1, 3)]), 10, "per-worker metrics", log)  # Чётные пользователи — воркеру 0, нечётные — 1
+
+        os.kill(int(re.search(r'bot_shard_pid\{worker="1"\} (\d+)', text).group(1)), signal.SIGKILL)  # Падение воркера
+        api.push(_start(7, 3), _start(8, 5), _start(9, 2))
+        await _until(lambda: len(api.sent) == 9, 30, "replies after restart", log)
+        text = await _until(lambda: handled([(0, 4), (1, 2)]), 10, "metrics of restarted worker", log)  # Новый процесс считает с нуля
+        assert 'bot_shard_restarts_total{worker="1"} 1' in text and 'bot_shard_restarts_total{worker="0"} 0' in text
+        assert sorted(chat for chat, _ in api.sent) == [1, 2, 2, 3, 3, 4, 5, 5, 6]
+
+        process.send_signal(signal.SIGTERM)  # Дренаж: супервизор и воркеры завершаются сами
+        assert await asyncio.wait_for(process.wait(), 30) == 0, log.read_text()[-4000:]
+    finally:
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+        await api.stop()
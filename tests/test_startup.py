@@ -0,0 +1,115 @@
+import asyncio
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+
+from bot import database
+from bot.database import MIGRATIONS_CONFIG, SCHEMA_REVISION, schema_revision
+from bot.services.catalog_service import ProductCard
+from bot.services import inline_index
+from bot.services.inline_index import ProductIndex, load_product_index
+
+LAZY_MODULES = ("phonenumbers", "alembic")  # Нужны не на каждом старте — не должны грузиться при импорте бота
+
+
+def test_schema_revision_matches_alembic_head():  # Новая миграция без правки SCHEMA_REVISION сломала бы быстрый старт
+    assert ScriptDirectory.from_config(Config(str(MIGRATIONS_CONFIG))).get_current_head() == SCHEMA_REVISION
+
+
+@pytest.mark.asyncio
+async def test_fast_init_checks_version_with_one_query(tmp_path, monkeypatch, query_budget):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'shop.db'}")
+    monkeypatch.setattr(database, "engine", engine)
+    monkeypatch.setattr(database, "SessionLocal", async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession))
+    async with engine.connect() as conn:
+        assert await schema_revision(conn) is None  # Пустая БД
+    await database.init_models(fast=True)  # Версии нет — полные миграции
+    async with engine.connect() as conn:
+        assert await schema_revision(conn) == SCHEMA_REVISION
+    with query_budget(engine, 1, "startup on up-to-date schema"):
+        await database.init_models(fast=True)
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_index_applies_changes_committed_during_background_load():
+    index = ProductIndex()
+
+    class _Session:  # Чтение «висит», пока приходят правки
+        async def stream(self, statement):
+            index.apply([ProductCard(2, "Кепка", "D", 100, None, None)], removed=[1])
+            await asyncio.sleep(0)
+            return _rows([(1, "Кеды", "D", 100, None, None), (3, "Куртка", "D", 100, None, None)])
+
+    async def _rows(rows):
+        for row in rows:
+            yield row
+
+    assert not index.loaded
+    waiter = asyncio.create_task(index.wait_loaded())
+    await index.load(_Session())
+    await asyncio.wait_for(waiter, 1)
+    assert [p.id for p in index.search("к")[0]] == [2, 3]  # Снимок чтения со старым товаром 1 поправлен отложенными изменениями
+
+
+@pytest.mark.asyncio
+async def test_failed_index_load_is_retried_without_exposing_half_built_index(monkeypatch):
+    monkeypatch.setattr(inline_index, "LOAD_RETRY_DELAY", 0)
+    index = ProductIndex()
+    attempts = []
+    seen_mid_load = []  # Что видели inline-запросы, пока первое чтение шло
+
+    class _Session:  # Первое чтение обрывается посреди потока
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            return False
+
+        async def stream(self, statement):
+            attempts.append(index.loaded)
+            return _rows(len(attempts) == 1)
+
+    async def _rows(broken):
+        yield (1, "Кеды", "D", 100, None, None)
+        if broken:
+            seen_mid_load.append(index.search("кед"))
+            raise ConnectionError("connection lost")
+        yield (2, "Кепка", "D", 100, None, None)
+
+    await load_product_index(_Session, index)
+    assert attempts == [False, False]  # Повтор, а не «загружен» после ошибки
+    assert seen_mid_load == [([], None)]  # Частично прочитанное не видно
+    assert index.loaded and [p.id for p in index.search("ке")[0]] == [1, 2]
+
+    failing = ProductIndex()
+
+    class _Broken(_Session):
+        async def stream(self, statement):
+            raise ConnectionError("database is down")
+
+    await load_product_index(_Broken, failing)  # Все попытки неудачны — inline-запросы перестают ждать
+    assert failing.loaded and len(failing) == 0
+
+
+def test_importing_bot_skips_lazy_modules():  # -X importtime: что и сколько грузится при старте процесса
+    env = {**os.environ, "BOT_TOKEN": "x", "DATABASE_URL": "sqlite+aiosqlite:///:memory:"}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import bot.main"],
+        cwd=Path(__file__).resolve().parent.parent, env=env, capture_output=True, text=True, check=True,
+    )
+    timings = []  # (мкс собственного времени, модуль)
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line and "self [us]" not in line:
+            own, _, name = line[len("import time:"):].split("|")
+            timings.append((int(own), name.strip()))
+    loaded = {name for _, name in timings}
+    report = "\n".join(f"{us / 1000:8.1f} ms  {name}" for us, name in sorted(timings, reverse=True)[:15])
+    for module in LAZY_MODULES:
+        assert module not in loaded, f"{module} is imported at startup; slowest modules:\n{report}"
@@ -0,0 +1,88 @@
+import pytest
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+
+from bot.database import Base
+from bot.models import CategorySales, OrderStatusCount, ProductSales, RollupState, SalesDaily
+from bot.services.admin_service import AdminService
+from bot.services.cart_service import CartService
+from bot.services.order_service import OrderService
+from bot.services.stats_service import SALES_ROLLUP, StatsService, backfill_sales_rollups
+from bot.services.write_queue import WriteQueue
+
+
+async def _place_orders(Session):
+    async with Session() as session:
+        admin = AdminService(session, [])
+        await admin.add_product("X", "D", 100, "A")
+        await admin.add_product("Y", "D", 250, "B")
+        cart = CartService(session)
+        orders = OrderService(session)
+        user_id = await cart.resolve_user_id(1)
+        ids = []
+        for qty_x, qty_y in [(1, 0), (2, 1), (0, 3), (1, 1), (4, 0)]:
+            if qty_x:
+                await cart.add_to_cart(user_id, 1, qty_x)
+            if qty_y:
+                await cart.add_to_cart(user_id, 2, qty_y)
+            ids.append((await orders.create_order(user_id, "N", "+1", "A", "Курьер")).id)
+        await session.commit()
+    return ids
+
+
+@pytest.mark.asyncio
+async def test_rollups_are_maintained_incrementally():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    Session = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    ids = await _place_orders(Session)
+
+    async with Session() as session:
+        orders = OrderService(session)
+        await orders.set_status(ids[0], "paid")
+        await orders.set_status(ids[1], "paid")
+        await orders.set_status(ids[1], "paid")
+        await session.commit()
+
+    async with Session() as session:
+        report = await StatsService(session).report()
+    assert [(orders, revenue) for _, orders, revenue in report.daily] == [(5, 100 + 450 + 750 + 350 + 400)]
+    assert report.statuses == [("new", 3), ("paid", 2)]
+    assert report.top_products == [("X", 8, 800), ("Y", 5, 1250)]
+    assert report.top_categories == [("A", 8, 800), ("B", 5, 1250)]
+    assert not report.backfill_pending
+
+
+@pytest.mark.asyncio
+async def test_backfill_counts_existing_orders_in_batches():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    Session = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    ids = await _place_orders(Session)
+
+    async with Session() as session:  # Как после миграции: история есть, сводок нет
+        for model in (SalesDaily, OrderStatusCount, ProductSales, CategorySales):
+            await session.execute(delete(model))
+        session.add(RollupState(name=SALES_ROLLUP, last_id=0, upto_id=ids[-1]))
+        await session.commit()
+
+    async with Session() as session:
+        stats = StatsService(session)
+        assert not await stats.backfill_batch(2)
+        assert (await stats.report()).backfill_pending
+        await OrderService(session).set_status(ids[4], "paid")  # Ещё не учтён — счётчики не трогаем
+        await OrderService(session).set_status(ids[0], "paid")  # Уже учтён — переносим
+        await session.commit()
+
+    await backfill_sales_rollups(WriteQueue(Session), batch_size=2, pause=0)
+
+    async with Session() as session:
+        report = await StatsService(session).report()
+        state = await session.get(RollupState, SALES_ROLLUP)
+    assert state.last_id == ids[-1]
+    assert not report.backfill_pending
+    assert report.statuses == [("new", 3), ("paid", 2)]
+    assert report.top_products == [("X", 8, 800), ("Y", 5, 1250)]
+    assert sum(orders for _, orders, _ in report.daily) == 5
@@ -0,0 +1,51 @@
+import asyncio
+
+import pytest
+from telegram import Update
+
+from bot.update_processor import UserOrderedUpdateProcessor, update_key
+
+
+def _update(update_id, user_id):
+    return Update.de_json(
+        {
+            "update_id": update_id,
+            "callback_query": {
+                "id": str(update_id), "chat_instance": "c", "data": "qty:1:1",
+                "from": {"id": user_id, "is_bot": False, "first_name": "U"},
+            },
+        },
+        None,
+    )
+
+
+@pytest.mark.asyncio
+async def test_users_run_in_parallel_but_each_in_order():
+    processor = UserOrderedUpdateProcessor(max_concurrent_updates=2)
+    log = []
+    running = 0
+    peak = 0
+
+    async def handle(update, delay):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        log.append(("start", update.update_id))
+        await asyncio.sleep(delay)
+        log.append(("end", update.update_id))
+        running -= 1
+
+    updates = [(_update(1, 10), 0.05), (_update(2, 10), 0.0), (_update(3, 20), 0.01), (_update(4, 30), 0.01), (_update(5, 10), 0.0)]
+    tasks = [asyncio.create_task(processor.process_update(u, handle(u, d))) for u, d in updates]
+    await asyncio.sleep(0)
+    assert processor.stats()["waiting"] + processor.stats()["active"] == 5
+    await asyncio.gather(*tasks)
+
+    user_10 = [event for event in log if event[1] in (1, 2, 5)]
+    assert user_10 == [("start", 1), ("end", 1), ("start", 2), ("end", 2), ("start", 5), ("end", 5)]  # Строго по порядку
+    assert log.index(("end", 3)) < log.index(("end", 1))  # Другой пользователь не ждал медленное обновление
+    assert peak == 2  # Предел параллелизма
+    stats = processor.stats()
+    assert (stats["waiting"], stats["active"], stats["keys"], stats["processed"]) == (0, 0, 0, 5)
+    assert stats["wait_max_ms"] >= 40  # Обновление 2 ждало окончания 1
+    assert update_key(updates[2][0]) == 20 and update_key(object()) is None
@@ -0,0 +1,57 @@
+import asyncio
+import json
+
+import pytest
+from telegram import Update
+from telegram.ext import ApplicationBuilder
+
+from bot.webhook import WebhookServer
+
+
+def _update(update_id):
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id, "date": 0, "text": "/start",
+            "chat": {"id": 1, "type": "private"}, "from": {"id": 1, "is_bot": False, "first_name": "A"},
+        },
+    }
+
+
+async def _post(reader, writer, body: bytes, secret="s3cret", path="/tg"):
+    headers = f"POST {path} HTTP/1.1\r\nHost: x\r\nContent-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+    if secret is not None:
+        headers += f"X-Telegram-Bot-Api-Secret-Token: {secret}\r\n"
+    writer.write((headers + "\r\n").encode() + body)
+    head = await reader.readuntil(b"\r\n\r\n")
+    length = int(head.split(b"Content-Length: ")[1].split(b"\r\n")[0])
+    await reader.readexactly(length)
+    return int(head.split(b" ")[1])
+
+
+@pytest.mark.asyncio
+async def test_webhook_accepts_verified_updates_with_backpressure():
+    app = ApplicationBuilder().token("123:ABC").updater(None).update_queue(asyncio.Queue(maxsize=2)).build()
+    server = WebhookServer(app, "/tg", "s3cret", "127.0.0.1", 0)
+    await server.start()
+    try:
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.port)  # Одно keep-alive соединение
+        assert await _post(reader, writer, json.dumps(_update(1)).encode()) == 200
+        assert await _post(reader, writer, json.dumps(_update(2)).encode(), secret="wrong") == 403
+        assert await _post(reader, writer, json.dumps(_update(3)).encode(), secret=None) == 403
+        assert await _post(reader, writer, b"{not json") == 400
+        assert await _post(reader, writer, json.dumps(_update(4)).encode(), path="/other") == 404
+        assert await _post(reader, writer, json.dumps(_update(5)).encode()) == 200
+        assert await _post(reader, writer, json.dumps(_update(6)).encode()) == 429  # Очередь полна
+        first = app.update_queue.get_nowait()
+        assert isinstance(first, Update) and first.message.text == "/start" and first.update_id == 1
+        assert await _post(reader, writer, json.dumps(_update(6)).encode()) == 200  # Повтор после освобождения места
+        assert [app.update_queue.get_nowait().update_id for _ in range(2)] == [5, 6]
+        assert (server.accepted, server.rejected) == (3, 1)
+
+        writer.write(b"GET /tg HTTP/1.1\r\nContent-Length: 99999999\r\n\r\n")  # Слишком большое тело — ответ и закрытие
+        assert b" 413 " in await reader.readuntil(b"\r\n\r\n")
+        assert await reader.read() == b""
+        writer.close()
+    finally:
+        await server.stop()
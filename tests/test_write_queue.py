@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+
+from bot.database import Base, call_after_commit, use_sqlite_transactions
+from bot.models import Product
+from bot.services.cart_service import CartService, user_id_cache
+from bot.services.write_queue import WriteQueue
+
+
+@pytest.mark.asyncio
+async def test_group_commit_batches_jobs_and_isolates_failures():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    use_sqlite_transactions(engine)  # Как у движка записи бота: SAVEPOINT внутри настоящей транзакции
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    Session = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+
+    async with Session() as session:
+        session.add(Product(title="T", description="D", price_cents=100, is_active=True))
+        await session.commit()
+
+    queue = WriteQueue(Session, max_batch=100, max_delay=0.01)
+    await queue.start()
+
+    calls = []  # Запуски заданий: упавшее не должно перезапускать соседей
+    committed = []  # Колбэки after_commit
+
+    async def add(session, tg_id):
+        calls.append(tg_id)
+        call_after_commit(session, lambda: committed.append(tg_id))
+        cart = CartService(session)
+        return await cart.add_to_cart(await cart.resolve_user_id(tg_id), 1)
+
+    async def broken(session):
+        await add(session, 999)
+        raise ValueError("boom")
+
+    jobs = [queue.submit(lambda s, i=i: add(s, i % 5)) for i in range(20)]
+    jobs.insert(7, queue.submit(broken))
+    results = await asyncio.gather(*jobs, return_exceptions=True)
+    await queue.stop()
+
+    assert isinstance(results.pop(7), ValueError)
+    assert sorted(results) == sorted(n for n in range(1, 5) for _ in range(5))
+    assert queue.stats()["jobs"] == 20 and queue.stats()["batches"] < 5
+    assert len(calls) == 21  # Каждое задание выполнено ровно один раз
+    assert sorted(committed) == sorted(i % 5 for i in range(20))  # Колбэки упавшего задания отменены вместе с его SAVEPOINT
+    assert user_id_cache.get(999) is None
+
+    async with Session() as session:
+        cart = CartService(session)
+        assert await cart.get_cart(await cart.resolve_user_id(999)) == []
+        assert (await cart.get_cart(await cart.resolve_user_id(0)))[0][1] == 4